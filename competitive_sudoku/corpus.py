@@ -0,0 +1,182 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+A packed binary corpus of sudoku boards, for benchmarks and tournaments over many start positions.
+
+The file starts with the bytes b'SDKC', a version byte and the record size as a 4 byte little endian integer.
+Then follow fixed-size records: m, n and the N*N squares of the board, one byte each, padded with zeros to the
+record size. Since all records have the same size, record k can be found without parsing the records before it,
+and the file can be memory mapped.
+
+Usage:
+
+  python -m competitive_sudoku.corpus pack corpus.sdkc boards/*.txt   (convert text boards to a corpus)
+  python -m competitive_sudoku.corpus list corpus.sdkc                (print the boards of a corpus)
+"""
+
+import mmap
+import struct
+from typing import Iterable
+
+from competitive_sudoku.sudoku import SudokuBoard, load_sudoku
+
+MAGIC = b'SDKC'
+VERSION = 1
+HEADER = struct.Struct('<4sBI')
+
+
+class BoardView(SudokuBoard):
+    """
+    A read-only SudokuBoard whose squares are a slice of a memory mapped corpus, so nothing is copied.
+    Use copy() to get a normal board that can be changed.
+    """
+
+    def __init__(self, m: int, n: int, squares: memoryview):
+        self.m = m
+        self.n = n
+        self.N = m * n
+        self.squares = squares
+
+    def put(self, i: int, j: int, value: int) -> None:
+        raise TypeError('A BoardView is read-only, use copy() to get a board that can be changed')
+
+    def copy(self) -> SudokuBoard:
+        """
+        @return: A SudokuBoard with the same squares.
+        """
+        board = SudokuBoard(self.m, self.n)
+        board.squares = list(self.squares)
+        return board
+
+
+def pack_boards(filename: str, boards: Iterable[SudokuBoard], record_size: int = None) -> int:
+    """
+    Writes boards to a corpus file.
+    @param filename: The corpus file.
+    @param boards: The boards, of any geometry.
+    @param record_size: The size of a record, at least 2 + N * N for the largest board. If it is given, the boards
+    are written while they are generated, otherwise they are collected first to find the largest one.
+    @return: The number of boards written.
+    """
+    if record_size is None:
+        boards = list(boards)
+        record_size = 2 + max((board.N * board.N for board in boards), default=0)
+    count = 0
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, record_size))
+        for board in boards:
+            record = bytes([board.m, board.n]) + bytes(board.squares)
+            if len(record) > record_size:
+                raise RuntimeError(f'A board with {board.m}x{board.n} regions does not fit in records of size {record_size}')
+            f.write(record.ljust(record_size, b'\0'))
+            count += 1
+    return count
+
+
+def record_size(m: int, n: int) -> int:
+    """
+    @return: The record size needed for boards with regions of size m x n.
+    """
+    N = m * n
+    return 2 + N * N
+
+
+class BoardCorpus(object):
+    """
+    A memory mapped corpus file. Indexing and iterating give BoardView objects.
+    """
+
+    def __init__(self, filename: str):
+        """
+        @param filename: A corpus file, written by pack_boards.
+        """
+        self.file = open(filename, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.record_size = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            self.data.close()
+            self.file.close()
+            raise RuntimeError(f'"{filename}" is not a board corpus file')
+        self.view = memoryview(self.data)[HEADER.size:]
+
+    def __len__(self) -> int:
+        return len(self.view) // self.record_size if self.record_size else 0
+
+    def __getitem__(self, k: int) -> BoardView:
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError('board index out of range')
+        offset = k * self.record_size
+        m, n = self.view[offset], self.view[offset + 1]
+        N = m * n
+        return BoardView(m, n, self.view[offset + 2:offset + 2 + N * N])
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def close(self) -> None:
+        """
+        Closes the mapping and then the file. The BoardView objects of the corpus share the mapping, so they must be
+        gone by then, otherwise BufferError is raised; use copy() for the boards that are needed after the close.
+        """
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def is_corpus_file(filename: str) -> bool:
+    """
+    @param filename: A file name.
+    @return: True if the file starts like a corpus file.
+    """
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load_corpus(filename: str) -> BoardCorpus:
+    """
+    Loads a corpus file by memory mapping it.
+    @param filename: A corpus file.
+    @return: The corpus.
+    """
+    return BoardCorpus(filename)
+
+
+def main():
+    import argparse
+
+    cmdline_parser = argparse.ArgumentParser(description='Convert and inspect packed board corpus files.')
+    subparsers = cmdline_parser.add_subparsers(dest='command', required=True)
+    pack = subparsers.add_parser('pack', help='convert text boards to a corpus file')
+    pack.add_argument('corpus', help='the corpus file to write')
+    pack.add_argument('boards', nargs='+', help='text files in the format of SudokuBoard.__str__')
+    show = subparsers.add_parser('list', help='print the boards of a corpus file')
+    show.add_argument('corpus')
+    args = cmdline_parser.parse_args()
+
+    if args.command == 'pack':
+        count = pack_boards(args.corpus, (load_sudoku(filename) for filename in args.boards))
+        print(f'Wrote {count} boards to {args.corpus}')
+    else:
+        with load_corpus(args.corpus) as corpus:
+            # no view may be left when the corpus is closed
+            for k in range(len(corpus)):
+                print(corpus[k])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Round-trip check of the compact encoding of game states and boards.
+
+GameState.encode/decode and the __getstate__/__setstate__ methods of GameState and SudokuBoard are used by pickle,
+and also by copy.deepcopy, which the players use on hot paths. For the start position of every board file, and for
+the positions of a random game played from it (with scores and some taboo moves), this check verifies that
+  - GameState.decode(state.encode()) gives the same game state,
+  - a pickle round trip gives the same game state and board,
+  - copy.deepcopy gives the same game state and board, with squares lists that are new lists: changing the copy
+    does not change the original.
+
+Example:
+
+  python -m competitive_sudoku.encodecheck                                  (all boards in boards/)
+  python -m competitive_sudoku.encodecheck boards/random-4x4.txt
+
+The exit status is 1 if any check failed.
+"""
+
+import argparse
+import copy
+import pickle
+import random
+import sys
+from pathlib import Path
+from typing import List
+
+from competitive_sudoku.solver import legal_moves
+from competitive_sudoku.sudoku import GameState, SudokuBoard, TabooMove, load_sudoku
+
+BOARDS_DIR = Path(__file__).resolve().parent.parent / 'boards'
+
+
+def move_tuples(moves) -> list:
+    return [(type(move).__name__, move.i, move.j, move.value) for move in moves]
+
+
+def board_differences(board: SudokuBoard, other: SudokuBoard) -> List[str]:
+    """
+    @return: The names of the attributes in which the boards differ.
+    """
+    differences = [name for name in ('m', 'n', 'N') if getattr(board, name) != getattr(other, name)]
+    if not isinstance(other.squares, list) or other.squares != list(board.squares):
+        differences.append('squares')
+    return differences
+
+
+def game_state_differences(game_state: GameState, other: GameState) -> List[str]:
+    """
+    @return: The names of the attributes in which the game states differ.
+    """
+    differences = [f'initial_board.{name}' for name in board_differences(game_state.initial_board, other.initial_board)]
+    differences += [f'board.{name}' for name in board_differences(game_state.board, other.board)]
+    for name in ('moves', 'taboo_moves'):
+        if move_tuples(getattr(game_state, name)) != move_tuples(getattr(other, name)):
+            differences.append(name)
+    if list(game_state.scores) != list(other.scores):
+        differences.append('scores')
+    return differences
+
+
+def independence_differences(game_state: GameState, copied: GameState) -> List[str]:
+    """
+    Changes the copy and checks that the original did not change.
+    @return: The names of the attributes that are shared between the original and the copy.
+    """
+    differences = []
+    for name in ('initial_board', 'board'):
+        board, copied_board = getattr(game_state, name), getattr(copied, name)
+        if copied_board.squares is board.squares:
+            differences.append(f'{name}.squares')
+        elif copied_board.squares:
+            before = list(board.squares)
+            copied_board.squares[0] = (copied_board.squares[0] + 1) % (board.N + 1)
+            if board.squares != before:
+                differences.append(f'{name}.squares')
+    for name in ('moves', 'taboo_moves', 'scores'):
+        if getattr(copied, name) is getattr(game_state, name):
+            differences.append(name)
+    return differences
+
+
+def snapshot(game_state: GameState) -> GameState:
+    """
+    @return: A copy of the game state that is built field by field, so it does not depend on the code under test.
+    """
+    boards = []
+    for board in (game_state.initial_board, game_state.board):
+        copied = SudokuBoard(board.m, board.n)
+        copied.squares = list(board.squares)
+        boards.append(copied)
+    return GameState(boards[0], boards[1], list(game_state.taboo_moves), list(game_state.moves),
+                     list(game_state.scores))
+
+
+def game_states(board: SudokuBoard, rng: random.Random, count: int = 8) -> List[GameState]:
+    """
+    @return: The start position and count positions of a random game from board, with scores and taboo moves.
+    """
+    game_state = snapshot(GameState(board, board, [], [], [0, 0]))
+    states = [snapshot(game_state)]
+    empty = game_state.board.squares.count(SudokuBoard.empty)
+    for step in range(empty):
+        moves = legal_moves(game_state.board, game_state.taboo_moves)
+        if not moves:
+            break
+        move = rng.choice(moves)
+        if rng.random() < 0.2:
+            taboo_move = TabooMove(move.i, move.j, move.value)
+            game_state.moves.append(taboo_move)
+            game_state.taboo_moves.append(taboo_move)
+        else:
+            game_state.board.put(move.i, move.j, move.value)
+            game_state.moves.append(move)
+            game_state.scores[(len(game_state.moves) - 1) % 2] += rng.choice([0, 1, 3, 7])
+        if (step + 1) % max(empty // count, 1) == 0:
+            states.append(snapshot(game_state))
+    return states
+
+
+def check_board_file(filename: str, rng: random.Random) -> int:
+    """
+    @return: The number of positions of the board file that failed a check.
+    """
+    failures = 0
+    for game_state in game_states(load_sudoku(filename), rng):
+        problems = []
+        differences = game_state_differences(game_state, GameState.decode(game_state.encode()))
+        if differences:
+            problems.append(f'decode(encode()): {", ".join(differences)} differ')
+        differences = game_state_differences(game_state, pickle.loads(pickle.dumps(game_state)))
+        differences += [f'pickled board.{name}' for name in
+                        board_differences(game_state.board, pickle.loads(pickle.dumps(game_state.board)))]
+        if differences:
+            problems.append(f'pickle: {", ".join(differences)} differ')
+        copied = copy.deepcopy(game_state)
+        differences = game_state_differences(game_state, copied)
+        copied_board = copy.deepcopy(game_state.board)
+        differences += [f'copied board.{name}' for name in board_differences(game_state.board, copied_board)]
+        if differences:
+            problems.append(f'deepcopy: {", ".join(differences)} differ')
+        differences = independence_differences(game_state, copied)
+        if copied_board.squares is game_state.board.squares:
+            differences.append('copied board.squares')
+        if differences:
+            problems.append(f'deepcopy: {", ".join(differences)} are shared with the original')
+        if problems:
+            failures += 1
+            if failures == 1:
+                print(f'  after {len(game_state.moves)} moves: {"; ".join(problems)}')
+    return failures
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Checks the encoding, pickling and deep copying of game states.')
+    cmdline_parser.add_argument('files', nargs='*', help='the start boards (default: all boards in boards/)')
+    cmdline_parser.add_argument('--seed', type=int, default=0, help='the seed of the random games (default: 0)')
+    args = cmdline_parser.parse_args()
+
+    files = args.files or sorted(str(path) for path in BOARDS_DIR.glob('*.txt'))
+    total = 0
+    for filename in files:
+        failures = check_board_file(filename, random.Random(args.seed))
+        print(f'{Path(filename).name}: {failures} positions failed')
+        total += failures
+    print(f'{total} positions failed')
+    sys.exit(1 if total else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,8 @@ import os
 from pathlib import Path
 import tempfile
 
+from competitive_sudoku.oraclecache import default_cache
+
 
 def execute_command(command: str) -> str:
     import subprocess
@@ -19,11 +21,27 @@ def execute_command(command: str) -> str:
 def solve_sudoku(solve_sudoku_path: str, board_text: str, options: str='') -> str:
     """
     Execute the solve_sudoku program.
+    If the SUDOKU_ORACLE_CACHE environment variable is set, the output is looked up in and stored in the oracle
+    cache, see competitive_sudoku/oraclecache.py.
     @param solve_sudoku_path: The location of the solve_sudoku executable.
     @param board_text: A string representation of a sudoku board.
     @param options: Additional command line options.
     @return: The output of solve_sudoku.
     """
+    cache = default_cache()
+    if cache is not None and cache.cacheable(options):
+        output = cache.get(board_text, options)
+        if output is None:
+            output = run_solve_sudoku(solve_sudoku_path, board_text, options)
+            cache.put(board_text, options, output)
+        return output
+    return run_solve_sudoku(solve_sudoku_path, board_text, options)
+
+
+def run_solve_sudoku(solve_sudoku_path: str, board_text: str, options: str='') -> str:
+    """
+    Execute the solve_sudoku program, without the oracle cache.
+    """
     if not os.path.exists(solve_sudoku_path):
         raise RuntimeError(f'No oracle found at location "{solve_sudoku_path}"')
     filename = tempfile.NamedTemporaryFile(prefix='solve_sudoku_').name
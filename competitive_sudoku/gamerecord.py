@@ -0,0 +1,256 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+A compact, append-only binary format for recording games.
+
+A file starts with the bytes b'SDKR' and a version byte, followed by a stream of chunks. Each chunk is a tag byte,
+the length of the payload as a varint, and the payload:
+
+  'G'  start of a game: m, n, the N*N squares of the initial board (one byte each) and the player names
+  'M'  a move: square index, value, flags (1 = taboo), reward and think time
+  'E'  end of a game: the scores of both players and the winner (0 for a draw)
+
+Chunks are written as soon as they are known, so a game can be recorded while it is played, and a file can contain
+any number of games. Unknown chunk tags are skipped by the reader.
+"""
+
+import io
+import struct
+from typing import List, Optional
+
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, TabooMove
+
+MAGIC = b'SDKR'
+VERSION = 1
+
+GAME_TAG = b'G'
+MOVE_TAG = b'M'
+END_TAG = b'E'
+
+TABOO_FLAG = 1
+
+
+def write_varint(out, value: int) -> None:
+    """
+    Writes a non-negative integer in 7 bits per byte, least significant group first.
+    """
+    while value >= 0x80:
+        out.write(bytes([value & 0x7F | 0x80]))
+        value >>= 7
+    out.write(bytes([value]))
+
+
+def read_varint(stream) -> Optional[int]:
+    """
+    Reads an integer written by write_varint.
+    @return: The integer, or None at the end of the stream.
+    """
+    result = 0
+    shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            if shift:
+                raise RuntimeError('Unexpected end of the game record')
+            return None
+        result |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return result
+        shift += 7
+
+
+def zigzag(value: int) -> int:
+    """Maps a signed integer to a non-negative one, so small negative values stay short as varint."""
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value: int) -> int:
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+def write_string(out, text: str) -> None:
+    data = text.encode('utf-8')
+    write_varint(out, len(data))
+    out.write(data)
+
+
+def read_string(stream) -> str:
+    length = read_varint(stream)
+    return stream.read(length).decode('utf-8')
+
+
+class RecordedMove(object):
+    """A move of a recorded game."""
+
+    def __init__(self, i: int, j: int, value: int, taboo: bool, reward: int, think_time: float):
+        """
+        @param i: A row value in the range [0, ..., N)
+        @param j: A column value in the range [0, ..., N)
+        @param value: A value in the range [1, ..., N]
+        @param taboo: True if the oracle declared the move taboo.
+        @param reward: The number of points the move scored.
+        @param think_time: The time in seconds from the start of the player's turn until it proposed the move.
+        """
+        self.i = i
+        self.j = j
+        self.value = value
+        self.taboo = taboo
+        self.reward = reward
+        self.think_time = think_time
+
+    def move(self) -> Move:
+        """
+        @return: The move as a Move, or a TabooMove if it was declared taboo.
+        """
+        return TabooMove(self.i, self.j, self.value) if self.taboo else Move(self.i, self.j, self.value)
+
+
+class GameRecord(object):
+    """A recorded game."""
+
+    def __init__(self, initial_board: SudokuBoard, players: List[str]):
+        self.initial_board = initial_board
+        self.players = players
+        self.moves: List[RecordedMove] = []
+        self.scores: Optional[List[int]] = None  # None if the game was not finished
+        self.winner: Optional[int] = None        # 1 or 2, or 0 for a draw
+
+    def game_states(self):
+        """
+        Replays the game.
+        @return: A generator of (GameState, RecordedMove) pairs, with the state before each move.
+        """
+        import copy
+        game_state = GameState(self.initial_board, copy.deepcopy(self.initial_board), [], [], [0, 0])
+        for recorded in self.moves:
+            yield game_state, recorded
+            game_state = copy.deepcopy(game_state)
+            move = recorded.move()
+            if recorded.taboo:
+                game_state.taboo_moves.append(move)
+            else:
+                game_state.board.put(recorded.i, recorded.j, recorded.value)
+            game_state.moves.append(move)
+            player = len(game_state.moves) % 2  # 1 for the first player, 0 for the second
+            game_state.scores[1 - player] += recorded.reward
+
+
+class GameRecordWriter(object):
+    """
+    Appends games to a game record file. Every call writes one chunk, no boards are rendered.
+    """
+
+    def __init__(self, filename: str):
+        """
+        @param filename: The file to append to. It is created if it does not exist.
+        """
+        self.file = open(filename, 'ab')
+        self.board_size = 0  # N of the game that was started last
+        if self.file.tell() == 0:
+            self.file.write(MAGIC + bytes([VERSION]))
+
+    def write_chunk(self, tag: bytes, payload: bytes) -> None:
+        self.file.write(tag)
+        write_varint(self.file, len(payload))
+        self.file.write(payload)
+
+    def start_game(self, initial_board: SudokuBoard, players: List[str] = ()) -> None:
+        """
+        @param initial_board: The initial position of the game.
+        @param players: The names of the players.
+        """
+        self.board_size = initial_board.N
+        out = io.BytesIO()
+        out.write(bytes([initial_board.m, initial_board.n]))
+        out.write(bytes(initial_board.squares))
+        write_varint(out, len(players))
+        for player in players:
+            write_string(out, player)
+        self.write_chunk(GAME_TAG, out.getvalue())
+
+    def add_move(self, i: int, j: int, value: int, taboo: bool, reward: int, think_time: float) -> None:
+        """
+        Records a move of the game that was started last. See RecordedMove for the parameters.
+        @param i: A row value in the range [0, ..., N)
+        @param j: A column value in the range [0, ..., N)
+        """
+        N = self.board_size
+        out = io.BytesIO()
+        write_varint(out, N * i + j)
+        write_varint(out, value)
+        out.write(bytes([TABOO_FLAG if taboo else 0]))
+        write_varint(out, zigzag(reward))
+        out.write(struct.pack('<f', think_time))
+        self.write_chunk(MOVE_TAG, out.getvalue())
+
+    def end_game(self, scores: List[int], winner: int) -> None:
+        """
+        @param scores: The final scores of both players.
+        @param winner: The winning player (1 or 2), or 0 for a draw.
+        """
+        out = io.BytesIO()
+        write_varint(out, zigzag(scores[0]))
+        write_varint(out, zigzag(scores[1]))
+        out.write(bytes([winner]))
+        self.write_chunk(END_TAG, out.getvalue())
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_game_records(filename: str):
+    """
+    Reads the games of a game record file lazily: a game is only parsed when the iterator gets to it.
+    @param filename: A game record file.
+    @return: A generator of GameRecord objects.
+    """
+    with open(filename, 'rb') as stream:
+        header = stream.read(len(MAGIC) + 1)
+        if header[:len(MAGIC)] != MAGIC:
+            raise RuntimeError(f'"{filename}" is not a game record file')
+        game = None
+        while True:
+            tag = stream.read(1)
+            if not tag:
+                break
+            length = read_varint(stream)
+            payload = io.BytesIO(stream.read(length))
+            if tag == GAME_TAG:
+                if game is not None:
+                    yield game
+                game = parse_game(payload)
+            elif tag == MOVE_TAG:
+                game.moves.append(parse_move(payload, game.initial_board.N))
+            elif tag == END_TAG:
+                game.scores = [unzigzag(read_varint(payload)), unzigzag(read_varint(payload))]
+                game.winner = payload.read(1)[0]
+                yield game
+                game = None
+        if game is not None:
+            yield game
+
+
+def parse_game(payload) -> GameRecord:
+    m, n = payload.read(2)
+    board = SudokuBoard(m, n)
+    board.squares = list(payload.read(board.N * board.N))
+    players = [read_string(payload) for _ in range(read_varint(payload))]
+    return GameRecord(board, players)
+
+
+def parse_move(payload, N: int) -> RecordedMove:
+    k = read_varint(payload)
+    value = read_varint(payload)
+    flags = payload.read(1)[0]
+    reward = unzigzag(read_varint(payload))
+    think_time = struct.unpack('<f', payload.read(4))[0]
+    return RecordedMove(k // N, k % N, value, bool(flags & TABOO_FLAG), reward, think_time)
@@ -0,0 +1,89 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Generates random start positions and writes them to a packed board corpus.
+
+A start position is made by computing a random full solution with the in-process solver, and then emptying random
+squares until the target fill rate is reached. The positions are generated in parallel by a pool of processes.
+
+Usage:
+
+  python -m competitive_sudoku.generate --geometry 2x2 2x3 3x3 3x4 4x4 --count 1000 --fill-rate 0.3 corpus.sdkc
+"""
+
+import argparse
+import multiprocessing
+import random
+
+from competitive_sudoku.corpus import pack_boards, record_size
+from competitive_sudoku.solver import has_solution, solve
+from competitive_sudoku.sudoku import SudokuBoard
+
+
+def generate_board(m: int, n: int, fill_rate: float, seed: int) -> SudokuBoard:
+    """
+    Generates a random start position.
+    @param m: The number of rows in a region.
+    @param n: The number of columns in a region.
+    @param fill_rate: The fraction of the squares that is filled, in the range [0, 1].
+    @param seed: The seed of the random generator, the same seed gives the same board.
+    @return: A solvable board with round(fill_rate * N * N) filled squares.
+    """
+    rng = random.Random(seed)
+    solution = solve(SudokuBoard(m, n), rng)
+    N = solution.N
+    squares = list(range(N * N))
+    rng.shuffle(squares)
+    board = SudokuBoard(m, n)
+    for k in squares[:round(fill_rate * N * N)]:
+        board.squares[k] = solution.squares[k]
+    # emptying squares of a solution can not make it unsolvable, this only guards against solver bugs
+    assert has_solution(board)
+    return board
+
+
+def generate_task(arguments) -> SudokuBoard:
+    return generate_board(*arguments)
+
+
+def generate_boards(geometries, count: int, fill_rate: float, seed: int = 0, processes: int = None):
+    """
+    Generates start positions in parallel.
+    @param geometries: A list of (m, n) region sizes.
+    @param count: The number of boards per geometry.
+    @param fill_rate: The fraction of the squares that is filled.
+    @param seed: The boards get the seeds seed, seed + 1, ...
+    @param processes: The number of processes, all cores by default.
+    @return: A generator of boards, in a deterministic order.
+    """
+    tasks = [(m, n, fill_rate, seed + k) for m, n in geometries for k in range(count)]
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap(generate_task, tasks, chunksize=max(1, min(64, count // 16)))
+
+
+def parse_geometry(text: str):
+    m, n = text.lower().split('x')
+    return int(m), int(n)
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Generate random start positions in a board corpus.')
+    cmdline_parser.add_argument('corpus', help='the corpus file to write')
+    cmdline_parser.add_argument('--geometry', nargs='+', default=['3x3'], help='region sizes m x n (default: 3x3)')
+    cmdline_parser.add_argument('--count', type=int, default=100, help='the number of boards per geometry (default: 100)')
+    cmdline_parser.add_argument('--fill-rate', type=float, default=0.3, help='the fraction of filled squares (default: 0.3)')
+    cmdline_parser.add_argument('--seed', type=int, default=0, help='the first random seed (default: 0)')
+    cmdline_parser.add_argument('--processes', type=int, default=None, help='the number of processes (default: all cores)')
+    args = cmdline_parser.parse_args()
+
+    geometries = [parse_geometry(text) for text in args.geometry]
+    size = max(record_size(m, n) for m, n in geometries)
+    boards = generate_boards(geometries, args.count, args.fill_rate, args.seed, args.processes)
+    count = pack_boards(args.corpus, boards, size)
+    print(f'Wrote {count} boards to {args.corpus}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Verbosity control for the game framework, on top of the standard logging module.
+
+Messages are passed as a format string with arguments, so a message that is not emitted is never formatted.
+Expensive renderings like print_board are wrapped in Lazy, which only calls the rendering function when a handler
+actually writes the message.
+"""
+
+import logging
+import sys
+
+# Verbosity levels, as used by set_verbosity
+QUIET = 0     # only errors and the result of a game
+NORMAL = 1    # moves, rewards and boards
+VERBOSE = 2   # also the debug output of the players
+
+LEVELS = {QUIET: logging.WARNING, NORMAL: logging.INFO, VERBOSE: logging.DEBUG}
+
+
+class Lazy(object):
+    """
+    Defers a rendering until the message is formatted, e.g. logger.info('%s', Lazy(print_board, board)).
+    """
+
+    __slots__ = ('function', 'args')
+
+    def __init__(self, function, *args):
+        """
+        @param function: The rendering function.
+        @param args: The arguments of the rendering function.
+        """
+        self.function = function
+        self.args = args
+
+    def __str__(self):
+        return str(self.function(*self.args))
+
+
+def set_verbosity(verbosity: int = NORMAL, stream=None) -> None:
+    """
+    Configures the root logger to write plain messages to stream.
+    The configuration is inherited by the processes that compute the moves.
+    @param verbosity: One of QUIET, NORMAL or VERBOSE.
+    @param stream: The stream to write to, standard output by default.
+    """
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.addHandler(handler)
+    root.setLevel(LEVELS[verbosity])
@@ -0,0 +1,433 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+A match server that plays many games at the same time in one asyncio event loop.
+
+Every player of a game runs in a worker process that is connected to the server with a pipe. A worker is started when its game starts,
+and it reports that it is ready once the player's module has been imported, so the start of the process does not
+count against the time of the first move. The server sends the game state to the worker (as one buffer, see
+GameState.encode), and the worker sends every move that the player proposes back. The deadline of a move is the
+timeout of the wait on the pipe: when the player returns before the deadline the worker is kept for its next move, and
+when it is still computing at the deadline the last proposed move is played and the worker is replaced. Moves are
+judged by an Oracle (see competitive_sudoku/oracle.py) in a process pool.
+
+The pipes are waited on in threads of the default executor (Connection.poll), so the server runs with the event loop
+of any platform.
+
+Example:
+
+  python -m competitive_sudoku.matchserver --first team5_A2 --second random_player --games 20 --board boards/empty-3x3.txt
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import copy
+import importlib
+import logging
+import multiprocessing
+import os
+import platform
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from competitive_sudoku.corpus import is_corpus_file, load_corpus
+from competitive_sudoku.gamerecord import GameRecordWriter
+from competitive_sudoku.log import NORMAL, QUIET, set_verbosity
+from competitive_sudoku.oracle import ExternalOracle, ILLEGAL, INVALID, LocalOracle, Oracle, TABOO
+from competitive_sudoku.sprt import H0, SPRT
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, TabooMove, load_sudoku_from_text
+
+logger = logging.getLogger('matchserver')
+
+# The players that call the solve_sudoku program themselves
+PLAYERS_WITH_ORACLE = ('random_player', 'greedy_player')
+# The time in seconds that a worker may take to start and import its player
+STARTUP_TIMEOUT = 60.0
+
+
+class ProposalChannel(object):
+    """
+    Replaces the best_move list of a player in a worker. SudokuAI.propose_move assigns the row, column and value in
+    that order, so the move is sent to the server when the value is assigned.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.values = [0, 0, 0]
+
+    def __setitem__(self, index: int, value: int) -> None:
+        self.values[index] = value
+        if index == 2:
+            self.connection.send(('propose', *self.values))
+
+    def __getitem__(self, index: int) -> int:
+        return self.values[index]
+
+
+def worker_main(module_name: str, connection, move_time: float, solve_sudoku_path: str) -> None:
+    """
+    The main function of a worker process. It loads the player and reports that it is ready, then it computes a move
+    for every game state that it receives, until the connection is closed.
+    """
+    # let the player know how much time it has, as in simulate_game
+    os.environ['SUDOKU_MOVE_TIME'] = str(move_time)
+    try:
+        module = importlib.import_module(module_name + '.sudokuai')
+        player = module.SudokuAI()
+    except Exception as err:
+        connection.send(('error', repr(err)))
+        return
+    if module_name in PLAYERS_WITH_ORACLE:
+        player.solve_sudoku_path = solve_sudoku_path
+    player.best_move = ProposalChannel(connection)
+    connection.send(('ready',))
+    while True:
+        try:
+            game_state = GameState.decode(connection.recv_bytes())
+        except EOFError:
+            return
+        try:
+            player.compute_best_move(game_state)
+        except Exception as err:
+            connection.send(('error', repr(err)))
+        else:
+            connection.send(('done',))
+
+
+class PlayerWorker(object):
+    """
+    The server side of the worker process of a player.
+    """
+
+    def __init__(self, module_name: str, move_time: float, solve_sudoku_path: str):
+        """
+        @param module_name: The module of the player's SudokuAI class, e.g. team5_A2.
+        @param move_time: The time in seconds for computing a move.
+        @param solve_sudoku_path: The location of the solve_sudoku executable, for the players that use it.
+        """
+        self.module_name = module_name
+        self.move_time = move_time
+        self.solve_sudoku_path = solve_sudoku_path
+        self.process = None
+        self.connection = None
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None
+
+    async def start(self) -> bool:
+        """
+        Starts the worker process and waits until it has loaded the player.
+        @return: True if the player is ready, False if it could not be loaded.
+        """
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, daemon=True,
+                                               args=(self.module_name, child_connection, self.move_time,
+                                                     self.solve_sudoku_path))
+        self.process.start()
+        child_connection.close()
+        connection = self.connection
+
+        def wait_until_ready():
+            try:
+                if not connection.poll(STARTUP_TIMEOUT):
+                    return ('timeout',)
+                return connection.recv()
+            except (EOFError, OSError):
+                return ('exit',)
+
+        message = await asyncio.get_running_loop().run_in_executor(None, wait_until_ready)
+        if message[0] == 'ready':
+            return True
+        if message[0] == 'error':
+            logger.warning('Error: %s could not be loaded.\n %s', self.module_name, message[1])
+        else:
+            logger.warning('Error: the worker of %s did not start (%s).', self.module_name, message[0])
+        await self.stop()
+        return False
+
+    async def stop(self) -> None:
+        if self.process is None:
+            return
+        self.connection.close()
+        self.process.terminate()
+        await asyncio.get_running_loop().run_in_executor(None, self.process.join)
+        self.process = None
+        self.connection = None
+
+    async def compute_move(self, game_state: GameState) -> Tuple[Optional[Move], float]:
+        """
+        The worker is started first if it is not running, the deadline starts when it is ready.
+        @param game_state: The game state.
+        @return: The last move that the player proposed before the deadline, or None, and the time in seconds from
+        the start of the turn until that proposal.
+        """
+        if not self.running and not await self.start():
+            return None, 0.0
+        loop = asyncio.get_running_loop()
+        connection = self.connection
+        proposal = None
+        message = None
+        start = loop.time()
+        think_time = 0.0
+        try:
+            connection.send_bytes(game_state.encode())
+            deadline = start + self.move_time
+            # the pipe is waited on in a thread of the default executor, because the event loops of some platforms
+            # (the proactor loop on Windows) can not watch a pipe with add_reader
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0 or not await loop.run_in_executor(None, connection.poll, remaining):
+                    break
+                message = connection.recv()
+                if message[0] != 'propose':
+                    break
+                proposal = Move(*message[1:])
+                think_time = loop.time() - start
+                message = None
+            if message is None:
+                # collect the proposals that were sent before the deadline
+                while connection.poll():
+                    message = connection.recv()
+                    if message[0] != 'propose':
+                        break
+                    proposal = Move(*message[1:])
+                    think_time = self.move_time
+                    message = None
+        except (EOFError, OSError):
+            message = ('exit',)
+        if message is None or message[0] != 'done':
+            if message is not None and message[0] == 'error':
+                logger.warning('Error: an exception occurred in %s.\n %s', self.module_name, message[1])
+            await self.stop()
+        return proposal, think_time
+
+
+class GameResult(object):
+    """
+    The outcome of a game.
+    """
+
+    def __init__(self, players: List[str], scores: List[int], winner: int, reason: str, moves: int):
+        """
+        @param players: The module names of the first and the second player.
+        @param scores: The final scores of both players.
+        @param winner: The winning player (1 or 2), or 0 for a draw.
+        @param reason: Why the game ended, e.g. 'finished' or 'no move'.
+        @param moves: The number of moves that were played, including taboo moves.
+        """
+        self.players = players
+        self.scores = scores
+        self.winner = winner
+        self.reason = reason
+        self.moves = moves
+
+    def __str__(self):
+        result = 'draw' if self.winner == 0 else f'{self.players[self.winner - 1]} wins'
+        return f'{self.players[0]} - {self.players[1]}: {self.scores[0]}-{self.scores[1]}, {result} ({self.reason})'
+
+
+class MatchServer(object):
+    """
+    Plays games concurrently.
+    """
+
+    def __init__(self, oracle: Oracle, move_time: float = 0.5, concurrency: int = None, solve_sudoku_path: str = None,
+                 record: GameRecordWriter = None):
+        """
+        @param oracle: The oracle that judges the moves.
+        @param move_time: The time in seconds for computing a move.
+        @param concurrency: The maximum number of games that are played at the same time, by default the number of
+        processors. At most one player of a game is computing at any time.
+        @param solve_sudoku_path: The location of the solve_sudoku executable, for the players that use it.
+        @param record: If given, the finished games are appended to this game record.
+        """
+        self.oracle = oracle
+        self.move_time = move_time
+        self.concurrency = concurrency or os.cpu_count() or 1
+        self.solve_sudoku_path = solve_sudoku_path
+        self.record = record
+        self.executor = None
+
+    async def check_move(self, board: SudokuBoard, move: Move):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.oracle.check_move, board, move)
+
+    async def play_game(self, initial_board: SudokuBoard, first: str, second: str) -> GameResult:
+        """
+        Plays a game, the first move is played by first.
+        @param initial_board: The initial position of the game.
+        @param first: The module name of the first player.
+        @param second: The module name of the second player.
+        """
+        players = [first, second]
+        game_state = GameState(initial_board, copy.deepcopy(initial_board), [], [], [0, 0])
+        workers = [PlayerWorker(name, self.move_time, self.solve_sudoku_path) for name in players]
+        recorded_moves = []
+        winner, reason = None, 'finished'
+        try:
+            await asyncio.gather(*(worker.start() for worker in workers))
+            while SudokuBoard.empty in game_state.board.squares:
+                player_number = 1 if len(game_state.moves) % 2 == 0 else 2
+                worker = workers[player_number - 1]
+                # a worker that was replaced after its previous move (or did not start) is started before its clock runs
+                if not worker.running and not await worker.start():
+                    winner, reason = 3 - player_number, 'no move'
+                    break
+                move, think_time = await worker.compute_move(game_state)
+                if move is None or move == Move(0, 0, 0):
+                    winner, reason = 3 - player_number, 'no move'
+                    break
+                i, j, value = move.i, move.j, move.value
+                if TabooMove(i, j, value) in game_state.taboo_moves:
+                    winner, reason = 3 - player_number, 'taboo move'
+                    break
+                verdict = await self.check_move(game_state.board, move)
+                if verdict.status in (INVALID, ILLEGAL):
+                    winner, reason = 3 - player_number, f'{verdict.status} move'
+                    break
+                if verdict.status == TABOO:
+                    game_state.moves.append(TabooMove(i, j, value))
+                    game_state.taboo_moves.append(TabooMove(i, j, value))
+                else:
+                    game_state.board.put(i, j, value)
+                    game_state.moves.append(move)
+                game_state.scores[player_number - 1] += verdict.score
+                recorded_moves.append((i, j, value, verdict.status == TABOO, verdict.score, think_time))
+        finally:
+            for worker in workers:
+                await worker.stop()
+        if winner is None:
+            scores = game_state.scores
+            winner = 1 if scores[0] > scores[1] else 2 if scores[0] < scores[1] else 0
+        result = GameResult(players, game_state.scores, winner, reason, len(game_state.moves))
+        if self.record:
+            # the game is written at once, so the chunks of concurrent games are not interleaved
+            self.record.start_game(initial_board, players)
+            for recorded_move in recorded_moves:
+                self.record.add_move(*recorded_move)
+            self.record.end_game(result.scores, result.winner)
+        logger.info('%s', result)
+        return result
+
+    async def play_games(self, games: List[Tuple[SudokuBoard, str, str]],
+                         on_result: Callable[[GameResult], bool] = None) -> List[GameResult]:
+        """
+        Plays games concurrently.
+        @param games: The initial board, the first player and the second player of every game.
+        @param on_result: If given, it is called with every result as soon as the game has finished. When it returns
+        True, the games that are still being played or waiting are cancelled (e.g. when a sequential test has
+        decided, see competitive_sudoku/sprt.py).
+        @return: The results of the finished games, in the order of the games.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # the workers wait on their pipes in threads of the default executor, at most two per game at a time
+        asyncio.get_running_loop().set_default_executor(concurrent.futures.ThreadPoolExecutor(2 * self.concurrency))
+
+        async def play(index, game):
+            async with semaphore:
+                return index, await self.play_game(*game)
+
+        results = [None] * len(games)
+        with concurrent.futures.ProcessPoolExecutor(self.concurrency) as self.executor:
+            tasks = [asyncio.ensure_future(play(index, game)) for index, game in enumerate(games)]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    index, result = await task
+                    results[index] = result
+                    if on_result and on_result(result):
+                        break
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        return [result for result in results if result is not None]
+
+    def run(self, games: List[Tuple[SudokuBoard, str, str]],
+            on_result: Callable[[GameResult], bool] = None) -> List[GameResult]:
+        """
+        Plays games concurrently in a new event loop, see play_games.
+        """
+        return asyncio.run(self.play_games(games, on_result))
+
+
+def load_boards(filename: Optional[str]) -> List[SudokuBoard]:
+    """
+    @param filename: A text file with a start position, a board corpus file, or None for an empty 3x3 board.
+    @return: The start positions.
+    """
+    if filename is None:
+        return [SudokuBoard(3, 3)]
+    if is_corpus_file(filename):
+        with load_corpus(filename) as corpus:
+            return [corpus[k].copy() for k in range(len(corpus))]
+    return [load_sudoku_from_text(Path(filename).read_text())]
+
+
+def main():
+    solve_sudoku_path = 'bin\\solve_sudoku.exe' if platform.system() == 'Windows' else 'bin/solve_sudoku'
+
+    cmdline_parser = argparse.ArgumentParser(description='Plays many competitive sudoku games at the same time.')
+    cmdline_parser.add_argument('--first', help="the module name of the first player's SudokuAI class (default: random_player)", default='random_player')
+    cmdline_parser.add_argument('--second', help="the module name of the second player's SudokuAI class (default: random_player)", default='random_player')
+    cmdline_parser.add_argument('--games', help="the number of games, the players alternate who moves first (default: 2)", type=int, default=2)
+    cmdline_parser.add_argument('--time', help="the time (in seconds) for computing a move (default: 0.5)", type=float, default=0.5)
+    cmdline_parser.add_argument('--board', metavar='FILE', type=str, help='a text file containing the start position, or a board corpus file whose positions are used in turn (default: an empty 3x3 board)')
+    cmdline_parser.add_argument('--concurrency', help="the number of games that are played at the same time (default: the number of processors)", type=int)
+    cmdline_parser.add_argument('--oracle', help="judge the moves with the solve_sudoku program (external) or in-process (local) (default: external)", choices=['external', 'local'], default='external')
+    cmdline_parser.add_argument('--record', metavar='FILE', type=str, help='append the games to this game record file')
+    cmdline_parser.add_argument('--sprt', metavar=('ELO0', 'ELO1'), type=float, nargs=2, help='stop as soon as a sequential probability ratio test decides whether the first player is elo0 or elo1 Elo stronger than the second; --games is then the maximum number of games')
+    cmdline_parser.add_argument('--alpha', help="the probability that the SPRT accepts elo1 when elo0 is true (default: 0.05)", type=float, default=0.05)
+    cmdline_parser.add_argument('--beta', help="the probability that the SPRT accepts elo0 when elo1 is true (default: 0.05)", type=float, default=0.05)
+    cmdline_parser.add_argument('--quiet', help="only print the summary", action='store_true')
+    args = cmdline_parser.parse_args()
+
+    set_verbosity(QUIET if args.quiet else NORMAL)
+    boards = load_boards(args.board)
+    games = []
+    for k in range(args.games):
+        first, second = (args.first, args.second) if k % 2 == 0 else (args.second, args.first)
+        games.append((boards[k % len(boards)], first, second))
+    oracle = LocalOracle() if args.oracle == 'local' else ExternalOracle(solve_sudoku_path)
+
+    on_result = None
+    if args.sprt:
+        if args.first == args.second:
+            cmdline_parser.error('the SPRT needs two different players')
+        sprt = SPRT(args.sprt[0], args.sprt[1], args.alpha, args.beta)
+
+        def on_result(result):
+            sprt.add(0 if result.winner == 0 else 1 if result.players[result.winner - 1] == args.first else 2)
+            logger.info('%s', sprt)
+            return sprt.status() is not None
+
+    record = GameRecordWriter(args.record) if args.record else None
+    try:
+        server = MatchServer(oracle, args.time, args.concurrency, solve_sudoku_path, record)
+        results = server.run(games, on_result)
+    finally:
+        if record:
+            record.close()
+
+    wins = {args.first: 0, args.second: 0}
+    draws = 0
+    for result in results:
+        if result.winner == 0:
+            draws += 1
+        else:
+            wins[result.players[result.winner - 1]] += 1
+    print(', '.join(f'{name}: {count} wins' for name, count in wins.items()) + f', {draws} draws')
+    if args.sprt:
+        status = sprt.status()
+        if status is None:
+            print(f'SPRT: undecided after {sprt}')
+        else:
+            elo = sprt.elo0 if status == H0 else sprt.elo1
+            print(f'SPRT: {status} accepted ({args.first} - {args.second} = {elo:g} Elo) after {sprt}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+The judgement of moves, as done by the solve_sudoku program with the --move option.
+
+ExternalOracle asks the solve_sudoku program, LocalOracle computes the same verdict in-process with
+competitive_sudoku/solver.py, so games can be played without the program (e.g. on machines where it is not
+available, or in tests).
+"""
+
+import re
+from competitive_sudoku.execute import solve_sudoku
+from competitive_sudoku.solver import has_solution, region_index
+from competitive_sudoku.sudoku import Move, SudokuBoard
+
+# The status of a move
+VALID = 'valid'       # the move is played, and the player gets the score
+TABOO = 'taboo'       # the board has no solution after the move, so it is declared taboo and not played
+INVALID = 'invalid'   # the move is not on an empty square, or the value is out of range; the player loses
+ILLEGAL = 'illegal'   # the value is already used in the row, column or region; the player loses
+
+# The score of a move that completes 0, 1, 2 or 3 regions (rows, columns and blocks)
+REGION_SCORES = (0, 1, 3, 7)
+
+
+def region_points(board: SudokuBoard, i: int, j: int) -> int:
+    """
+    @param board: A sudoku board.
+    @param i: A row value in the range [0, ..., N)
+    @param j: A column value in the range [0, ..., N)
+    @return: The score of a move on the empty square (i, j), from the number of regions that it completes.
+    """
+    N = board.N
+    squares = board.squares
+    region = region_index(board, i, j)
+    top, left = region // board.m * board.m, region % board.m * board.n
+    row = squares[i * N:(i + 1) * N]
+    column = squares[j::N]
+    block = [squares[(top + a) * N + left + b] for a in range(board.m) for b in range(board.n)]
+    # the square itself is the last empty square of a region if the region has exactly one
+    completed = sum(1 for region_squares in (row, column, block) if region_squares.count(SudokuBoard.empty) == 1)
+    return REGION_SCORES[completed]
+
+
+class Verdict(object):
+    """
+    The judgement of a move.
+    """
+
+    __slots__ = ('status', 'score')
+
+    def __init__(self, status: str, score: int = 0):
+        """
+        @param status: One of VALID, TABOO, INVALID or ILLEGAL.
+        @param score: The score of a valid move.
+        """
+        self.status = status
+        self.score = score
+
+    def __str__(self):
+        return f'{self.status} ({self.score})' if self.status == VALID else self.status
+
+
+def parse_oracle_output(output: str) -> Verdict:
+    """
+    @param output: The output of solve_sudoku with the --move option.
+    @return: The verdict of the move.
+    """
+    if 'Invalid move' in output:
+        return Verdict(INVALID)
+    if 'Illegal move' in output:
+        return Verdict(ILLEGAL)
+    if 'has no solution' in output:
+        return Verdict(TABOO)
+    match = re.search(r'The score is ([-\d]+)', output)
+    if match:
+        return Verdict(VALID, int(match.group(1)))
+    raise RuntimeError(f'Unexpected output of sudoku solver: "{output}".')
+
+
+class Oracle(object):
+    """
+    Judges moves.
+    """
+
+    def check_move(self, board: SudokuBoard, move: Move) -> Verdict:
+        """
+        @param board: The board before the move. It is not changed.
+        @param move: The move.
+        @return: The verdict of the move.
+        """
+        raise NotImplementedError
+
+
+class ExternalOracle(Oracle):
+    """
+    Judges moves with the solve_sudoku program.
+    """
+
+    def __init__(self, solve_sudoku_path: str):
+        """
+        @param solve_sudoku_path: The location of the solve_sudoku executable.
+        """
+        self.solve_sudoku_path = solve_sudoku_path
+
+    def check_move(self, board: SudokuBoard, move: Move) -> Verdict:
+        options = f'--move "{board.rc2f(move.i, move.j)} {move.value}"'
+        return parse_oracle_output(solve_sudoku(self.solve_sudoku_path, str(board), options))
+
+
+class LocalOracle(Oracle):
+    """
+    Judges moves in-process, with the same verdicts as the solve_sudoku program.
+    """
+
+    def check_move(self, board: SudokuBoard, move: Move) -> Verdict:
+        N = board.N
+        i, j, value = move.i, move.j, move.value
+        if not (0 <= i < N and 0 <= j < N and 1 <= value <= N) or board.get(i, j) != SudokuBoard.empty:
+            return Verdict(INVALID)
+
+        squares = board.squares
+        region = region_index(board, i, j)
+        top, left = region // board.m * board.m, region % board.m * board.n
+        row = squares[i * N:(i + 1) * N]
+        column = squares[j::N]
+        block = [squares[(top + a) * N + left + b] for a in range(board.m) for b in range(board.n)]
+        if value in row or value in column or value in block:
+            return Verdict(ILLEGAL)
+        if not solvable_after(board, move):
+            return Verdict(TABOO)
+        return Verdict(VALID, region_points(board, i, j))
+
+
+def solvable_after(board: SudokuBoard, move: Move) -> bool:
+    """
+    @param board: A sudoku board. It is not changed.
+    @param move: A legal move.
+    @return: False if the move would be declared taboo, because the board has no solution after it.
+    """
+    after = SudokuBoard(board.m, board.n)
+    after.squares = board.squares.copy()
+    after.put(move.i, move.j, move.value)
+    return has_solution(after)
@@ -0,0 +1,124 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+A persistent cache of the output of the solve_sudoku oracle.
+
+The output of solve_sudoku only depends on the board and the options, so it is stored under the SHA-256 hash of
+the two. Recent entries are kept in memory; all entries are stored as small files in a directory, one per query,
+in subdirectories named after the first two hex digits of the hash. A file is written under a temporary name and
+then renamed, so processes that share the directory (e.g. the players and the game of a tournament) never see a
+partially written entry. Two processes that store the same query write the same output, so it does not matter
+which rename comes last.
+
+The cache is used by solve_sudoku when the SUDOKU_ORACLE_CACHE environment variable names a directory, see
+simulate_game.py --oracle-cache.
+"""
+
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+# Environment variable with the directory of the cache
+ORACLE_CACHE_VARIABLE = 'SUDOKU_ORACLE_CACHE'
+# Changing this invalidates all stored entries
+CACHE_VERSION = 1
+# Options whose output is random, so it must not be cached
+RANDOM_OPTIONS = ('--random',)
+
+
+class OracleCache(object):
+    """
+    Maps (board text, options) to the output of solve_sudoku.
+    """
+
+    def __init__(self, directory: str, capacity: int = 10000):
+        """
+        @param directory: The directory of the stored entries. It is created if needed.
+        @param capacity: The maximum number of entries kept in memory.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.capacity = capacity
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(board_text: str, options: str) -> str:
+        """
+        @return: The hex SHA-256 hash of a query.
+        """
+        data = f'{CACHE_VERSION}\0{board_text}\0{options}'.encode('utf-8')
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def cacheable(options: str) -> bool:
+        """
+        @return: False if the output of the query is random.
+        """
+        return not any(option in options for option in RANDOM_OPTIONS)
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, board_text: str, options: str) -> Optional[str]:
+        """
+        @return: The stored output of the query, or None.
+        """
+        key = self.key(board_text, options)
+        output = self.memory.get(key)
+        if output is None:
+            try:
+                output = self.path(key).read_text(encoding='utf-8')
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            self.remember(key, output)
+        else:
+            self.memory.move_to_end(key)
+        self.hits += 1
+        return output
+
+    def put(self, board_text: str, options: str, output: str) -> None:
+        """
+        Stores the output of a query.
+        """
+        key = self.key(board_text, options)
+        path = self.path(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(output)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.remember(key, output)
+
+    def remember(self, key: str, output: str) -> None:
+        self.memory[key] = output
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+
+_default_cache = None
+
+
+def default_cache() -> Optional[OracleCache]:
+    """
+    @return: The cache in the directory named by SUDOKU_ORACLE_CACHE, or None if it is not set.
+    """
+    global _default_cache
+    directory = os.environ.get(ORACLE_CACHE_VARIABLE)
+    if not directory:
+        return None
+    if _default_cache is None or _default_cache.directory != Path(directory):
+        _default_cache = OracleCache(directory)
+    return _default_cache
@@ -0,0 +1,214 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+An in-process sudoku solver for boards with arbitrary rectangular regions.
+
+The candidates of the rows, columns and regions are kept as bit masks. The search first fills in values that fit in
+only one square of a row, column or region, and otherwise continues with the empty square that has the fewest
+candidates. This is fast enough to solve boards up to 16x16 in a fraction of a
+second in most cases, so tools do not need to start the solve_sudoku program.
+"""
+
+import random
+from typing import List, Optional
+
+from competitive_sudoku.sudoku import Move, SudokuBoard
+
+
+def region_index(board: SudokuBoard, i: int, j: int) -> int:
+    """
+    @param i: A row value in the range [0, ..., N)
+    @param j: A column value in the range [0, ..., N)
+    @return: The index of the m x n region that contains the square (i, j).
+    """
+    return (i // board.m) * board.m + j // board.n
+
+
+class NodeLimitReached(Exception):
+    """Raised by Solver.search when the node limit has been reached."""
+    pass
+
+
+class Solver(object):
+    """
+    Solves a sudoku board with backtracking over bit masks of the values that are used in each row, column and region.
+    Bit v - 1 of a mask is set if value v is used.
+    """
+
+    def __init__(self, board: SudokuBoard, rng: random.Random = None, node_limit: int = None):
+        """
+        @param board: The board to solve. It is not changed.
+        @param rng: If given, the candidates are tried in random order, which gives a random solution.
+        @param node_limit: If given, the search gives up with NodeLimitReached after this many placements.
+        """
+        N = board.N
+        self.board = board
+        self.N = N
+        self.rng = rng
+        self.nodes_left = node_limit
+        self.full = (1 << N) - 1
+        self.squares = list(board.squares)
+        self.rows = [0] * N
+        self.columns = [0] * N
+        self.regions = [0] * N
+        self.consistent = True
+        self.empty = []
+        for k, value in enumerate(self.squares):
+            i, j = divmod(k, N)
+            if value == SudokuBoard.empty:
+                self.empty.append((k, i, j, region_index(board, i, j)))
+                continue
+            bit = 1 << (value - 1)
+            r = region_index(board, i, j)
+            if self.rows[i] & bit or self.columns[j] & bit or self.regions[r] & bit:
+                self.consistent = False
+            self.rows[i] |= bit
+            self.columns[j] |= bit
+            self.regions[r] |= bit
+
+    def candidates(self, i: int, j: int, r: int) -> int:
+        """
+        @return: A bit mask of the values that can still be put on the square (i, j) in region r.
+        """
+        return self.full & ~(self.rows[i] | self.columns[j] | self.regions[r])
+
+    def solve(self) -> Optional[List[int]]:
+        """
+        @return: The squares of a solution, or None if the board has no solution.
+        """
+        if not self.consistent:
+            return None
+        if self.search(self.empty):
+            return self.squares
+        return None
+
+    def choose(self, empty: list):
+        """
+        Chooses the square to continue with. A value that fits in only one square of a row, column or region is
+        forced (a hidden single). Otherwise the square with the fewest candidates is taken.
+        @return: A pair (index in empty, bit mask of the values to try), with an empty mask if the position is lost.
+        """
+        N = self.N
+        masks = []
+        once = [0] * (3 * N)
+        twice = [0] * (3 * N)
+        best = None
+        best_count = N + 1
+        for index, (k, i, j, r) in enumerate(empty):
+            mask = self.candidates(i, j, r)
+            if not mask:
+                return index, 0
+            masks.append(mask)
+            for unit in (i, N + j, 2 * N + r):
+                twice[unit] |= once[unit] & mask
+                once[unit] |= mask
+            count = bin(mask).count('1')
+            if count < best_count:
+                best, best_count = index, count
+        if best_count == 1:
+            return best, masks[best]
+        used = self.rows + self.columns + self.regions
+        for unit in range(3 * N):
+            if (once[unit] | used[unit]) != self.full:
+                # a value that is missing in this unit does not fit anywhere
+                return best, 0
+        for index, (k, i, j, r) in enumerate(empty):
+            # the candidates that fit nowhere else in the row, the column or the region of the square
+            single = masks[index] & ~(twice[i] & twice[N + j] & twice[2 * N + r])
+            if single:
+                # two forced values for one square is a contradiction
+                return index, single if single & (single - 1) == 0 else 0
+        return best, masks[best]
+
+    def search(self, empty: list) -> bool:
+        if not empty:
+            return True
+        best, mask = self.choose(empty)
+        if not mask:
+            return False
+        k, i, j, r = empty[best]
+        rest = empty[:best] + empty[best + 1:]
+        values = [v for v in range(1, self.N + 1) if mask & (1 << (v - 1))]
+        if self.rng is not None:
+            self.rng.shuffle(values)
+        for value in values:
+            if self.nodes_left is not None:
+                self.nodes_left -= 1
+                if self.nodes_left < 0:
+                    raise NodeLimitReached()
+            bit = 1 << (value - 1)
+            self.rows[i] |= bit
+            self.columns[j] |= bit
+            self.regions[r] |= bit
+            self.squares[k] = value
+            if self.search(rest):
+                return True
+            self.rows[i] &= ~bit
+            self.columns[j] &= ~bit
+            self.regions[r] &= ~bit
+            self.squares[k] = SudokuBoard.empty
+        return False
+
+def solve_squares(board: SudokuBoard, rng: random.Random = None) -> Optional[List[int]]:
+    """
+    Solves a sudoku board with randomized restarts. Backtracking sometimes gets stuck for a very long time in a bad
+    part of the search tree (in particular on large boards with few filled squares), so the search is restarted
+    with a new random order and a doubled node limit when it takes too many steps. A search that ends within its
+    limit is complete, so a board without solution is still recognized.
+    @param board: A sudoku board. It is not changed.
+    @param rng: The random generator for the order of the candidates. If None, a fixed seed is used, so the result
+    is deterministic.
+    @return: The squares of a solution, or None if the board has no solution.
+    """
+    if rng is None:
+        rng = random.Random(0)
+    node_limit = 4 * board.N * board.N
+    while True:
+        try:
+            return Solver(board, rng, node_limit).solve()
+        except NodeLimitReached:
+            node_limit *= 2
+
+
+def solve(board: SudokuBoard, rng: random.Random = None) -> Optional[SudokuBoard]:
+    """
+    Solves a sudoku board.
+    @param board: A sudoku board. It is not changed.
+    @param rng: If given, a random solution is returned.
+    @return: A solved copy of the board, or None if the board has no solution.
+    """
+    squares = solve_squares(board, rng)
+    if squares is None:
+        return None
+    result = SudokuBoard(board.m, board.n)
+    result.squares = squares
+    return result
+
+
+def has_solution(board: SudokuBoard) -> bool:
+    """
+    @param board: A sudoku board.
+    @return: True if the board can still be completed.
+    """
+    return solve_squares(board) is not None
+
+
+def legal_moves(board: SudokuBoard, taboo_moves: list = ()) -> List[Move]:
+    """
+    @param board: A sudoku board.
+    @param taboo_moves: The taboo moves of the game.
+    @return: The moves on empty squares with a value that is not used in the row, column or region of the square, and
+    that are not taboo, ordered by square and value.
+    """
+    N = board.N
+    solver = Solver(board)
+    taboo = {(move.i, move.j, move.value) for move in taboo_moves}
+    moves = []
+    for k, i, j, r in solver.empty:
+        mask = solver.candidates(i, j, r)
+        for value in range(1, N + 1):
+            if mask >> (value - 1) & 1 and (i, j, value) not in taboo:
+                moves.append(Move(i, j, value))
+    return moves
@@ -0,0 +1,120 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+A sequential probability ratio test (SPRT) for matches between two players.
+
+The test decides between the hypotheses H0: the Elo difference of player A over player B is elo0, and H1: it is
+elo1, with error rates alpha (accepting H1 while H0 is true) and beta (accepting H0 while H1 is true). After every
+game the log-likelihood ratio (LLR) of the results is compared to the bounds log(beta / (1 - alpha)) and
+log((1 - beta) / alpha); the match stops as soon as one of them is crossed. The LLR uses the usual normal
+approximation for win/draw/loss results:
+
+  LLR = n * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance)
+
+with s0 and s1 the expected scores of elo0 and elo1, and mean and variance the per game score of A.
+"""
+
+import math
+from typing import Optional
+
+# The outcomes of the test
+H0 = 'H0'
+H1 = 'H1'
+
+
+def expected_score(elo: float) -> float:
+    """
+    @param elo: An Elo difference.
+    @return: The expected score per game of the stronger player, between 0 and 1.
+    """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_difference(score: float) -> float:
+    """
+    @param score: The score per game, strictly between 0 and 1.
+    @return: The Elo difference that corresponds to the score.
+    """
+    return -400 * math.log10(1 / score - 1)
+
+
+class SPRT(object):
+    """
+    Tracks the results of player A against player B.
+    """
+
+    def __init__(self, elo0: float = 0.0, elo1: float = 5.0, alpha: float = 0.05, beta: float = 0.05):
+        """
+        @param elo0: The Elo difference of H0.
+        @param elo1: The Elo difference of H1, larger than elo0.
+        @param alpha: The probability of accepting H1 when H0 is true.
+        @param beta: The probability of accepting H0 when H1 is true.
+        """
+        if elo1 <= elo0:
+            raise ValueError(f'elo1 ({elo1}) must be larger than elo0 ({elo0})')
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def add(self, winner: int) -> None:
+        """
+        @param winner: 1 if A won the game, 2 if B won, 0 for a draw.
+        """
+        if winner == 1:
+            self.wins += 1
+        elif winner == 2:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def llr(self) -> float:
+        """
+        @return: The log-likelihood ratio of H1 over H0.
+        """
+        n = self.games
+        if n == 0:
+            return 0.0
+        mean = (self.wins + self.draws / 2) / n
+        # half a win and half a loss are added to the variance, otherwise it is 0 while all games have the same
+        # result (which is common for players of very different strength) and the test would never stop
+        variance = ((self.wins + 0.5 + self.draws / 4) / (n + 1) -
+                    ((self.wins + 0.5 + self.draws / 2) / (n + 1)) ** 2)
+        s0 = expected_score(self.elo0)
+        s1 = expected_score(self.elo1)
+        return n * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance)
+
+    def status(self) -> Optional[str]:
+        """
+        @return: H0 or H1 if the test has decided, otherwise None.
+        """
+        llr = self.llr()
+        if llr <= self.lower:
+            return H0
+        if llr >= self.upper:
+            return H1
+        return None
+
+    def elo(self) -> float:
+        """
+        @return: The Elo difference of A over B according to the results so far.
+        """
+        n = self.games
+        if n == 0:
+            return 0.0
+        score = (self.wins + self.draws / 2) / n
+        score = min(max(score, 0.5 / n), 1 - 0.5 / n)
+        return elo_difference(score)
+
+    def __str__(self):
+        return (f'{self.games} games: +{self.wins} ={self.draws} -{self.losses}, elo {self.elo():.1f}, '
+                f'LLR {self.llr():.2f} [{self.lower:.2f}, {self.upper:.2f}]')
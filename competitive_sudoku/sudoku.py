@@ -2,6 +2,7 @@
 #  Software License, (See accompanying file LICENSE or copy at
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
+import struct
 from typing import List, Tuple, Union
 
 
@@ -61,6 +62,15 @@ class SudokuBoard(object):
         self.N = N     # N = m * n, numbers are in the range [1, ..., N]
         self.squares = [SudokuBoard.empty] * (N * N)  # The N*N squares of the board
 
+    def __getstate__(self):
+        # pickle the squares as one bytes object instead of a list of N*N integers
+        return self.m, self.n, bytes(self.squares)
+
+    def __setstate__(self, state):
+        self.m, self.n, squares = state
+        self.N = self.m * self.n
+        self.squares = list(squares)
+
     def rc2f(self, i: int, j: int):
         """
         Converts row/column coordinates to the corresponding index in the board array.
@@ -270,6 +280,10 @@ def save_sudoku(filename, board: SudokuBoard) -> None:
     Path(filename).write_text(str(board))
 
 
+# The header of an encoded game state: m, n, the scores and the number of moves and taboo moves
+GAME_STATE_HEADER = struct.Struct('<BBiiII')
+
+
 class GameState(object):
     def __init__(self,
                  initial_board: SudokuBoard,
@@ -298,6 +312,58 @@ class GameState(object):
         """
         return 1 if len(self.moves) % 2 == 0 else 2
 
+    def encode(self) -> bytes:
+        """
+        Packs the game state into one small buffer: a header, the squares of both boards (one byte each) and a
+        4 byte code per move and taboo move. It is used for sending game states to other processes, e.g. by pickle.
+        @return: The encoded game state, see decode.
+        """
+        board = self.board
+        N = board.N
+
+        def code(move: Move, taboo: bool) -> int:
+            return ((move.i * N + move.j) * N + move.value - 1) * 2 + taboo
+
+        codes = [code(move, isinstance(move, TabooMove)) for move in self.moves]
+        codes.extend(code(move, True) for move in self.taboo_moves)
+        header = GAME_STATE_HEADER.pack(board.m, board.n, self.scores[0], self.scores[1], len(self.moves),
+                                        len(self.taboo_moves))
+        return b''.join([header, bytes(self.initial_board.squares), bytes(board.squares),
+                         struct.pack(f'<{len(codes)}I', *codes)])
+
+    @staticmethod
+    def decode(data: bytes) -> 'GameState':
+        """
+        @param data: A game state encoded by encode.
+        @return: The game state.
+        """
+        m, n, score1, score2, move_count, taboo_count = GAME_STATE_HEADER.unpack_from(data)
+        N = m * n
+        offset = GAME_STATE_HEADER.size
+        initial_board = SudokuBoard(m, n)
+        initial_board.squares = list(data[offset:offset + N * N])
+        offset += N * N
+        board = SudokuBoard(m, n)
+        board.squares = list(data[offset:offset + N * N])
+        offset += N * N
+        codes = struct.unpack_from(f'<{move_count + taboo_count}I', data, offset)
+
+        def decode_move(code: int) -> Move:
+            move, taboo = divmod(code, 2)
+            square, value = divmod(move, N)
+            i, j = divmod(square, N)
+            return TabooMove(i, j, value + 1) if taboo else Move(i, j, value + 1)
+
+        moves = [decode_move(code) for code in codes[:move_count]]
+        taboo_moves = [decode_move(code) for code in codes[move_count:]]
+        return GameState(initial_board, board, taboo_moves, moves, [score1, score2])
+
+    def __getstate__(self):
+        return self.encode()
+
+    def __setstate__(self, state):
+        self.__dict__.update(GameState.decode(state).__dict__)
+
     def __str__(self):
         import io
         out = io.StringIO()
@@ -0,0 +1,39 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import random
+from competitive_sudoku.oracle import region_points, solvable_after
+from competitive_sudoku.solver import legal_moves
+from competitive_sudoku.sudoku import GameState
+import competitive_sudoku.sudokuai
+
+
+class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
+    """
+    Sudoku AI that computes a move for a given sudoku configuration.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+    # Plays a greedy move like greedy_player, without the solve_sudoku program: a 1 ply deep search for the move with
+    # the highest reward, ties are broken at random. A move that would be declared taboo has no reward, so a scoring
+    # move is only played if the board can still be solved after it.
+    def compute_best_move(self, game_state: GameState) -> None:
+        board = game_state.board
+        moves = legal_moves(board, game_state.taboo_moves)
+        if not moves:
+            return
+        random.shuffle(moves)
+        # propose a move right away, in case the search below takes too long
+        self.propose_move(moves[0])
+        # try the scoring moves from the highest reward down, the sort keeps the random order of equal rewards
+        rewards = [(region_points(board, move.i, move.j), move) for move in moves]
+        rewards.sort(key=lambda reward: reward[0], reverse=True)
+        for reward, move in rewards:
+            if reward == 0:
+                break
+            if solvable_after(board, move):
+                self.propose_move(move)
+                return
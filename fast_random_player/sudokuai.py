@@ -0,0 +1,24 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import random
+from competitive_sudoku.solver import legal_moves
+from competitive_sudoku.sudoku import GameState
+import competitive_sudoku.sudokuai
+
+
+class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
+    """
+    Sudoku AI that computes a move for a given sudoku configuration.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+    # Plays a random move like random_player, without the solve_sudoku program: the move is not taboo and does not
+    # put a duplicate value in a region.
+    def compute_best_move(self, game_state: GameState) -> None:
+        moves = legal_moves(game_state.board, game_state.taboo_moves)
+        if moves:
+            self.propose_move(random.choice(moves))
@@ -6,15 +6,26 @@
 
 import argparse
 import importlib
+import logging
 import multiprocessing
+import os
 import platform
 import re
 import time
 from pathlib import Path
+from competitive_sudoku.corpus import is_corpus_file, load_corpus
 from competitive_sudoku.execute import solve_sudoku
+from competitive_sudoku.gamerecord import GameRecordWriter
+from competitive_sudoku.log import Lazy, NORMAL, QUIET, VERBOSE, set_verbosity
+from competitive_sudoku.oraclecache import ORACLE_CACHE_VARIABLE
 from competitive_sudoku.sudoku import GameState, SudokuBoard, Move, TabooMove, load_sudoku_from_text
 from competitive_sudoku.sudokuai import SudokuAI
 
+logger = logging.getLogger('simulate_game')
+
+# How often (in seconds) the proposed move is read while a player computes, to record when it was proposed
+PROPOSAL_POLL_INTERVAL = 0.01
+
 
 def check_oracle(solve_sudoku_path: str) -> None:
     board_text = '''2 2
@@ -32,7 +43,7 @@ def check_oracle(solve_sudoku_path: str) -> None:
         print(output)
 
 
-def simulate_game(initial_board: SudokuBoard, player1: SudokuAI, player2: SudokuAI, solve_sudoku_path: str, calculation_time: float = 0.5) -> None:
+def simulate_game(initial_board: SudokuBoard, player1: SudokuAI, player2: SudokuAI, solve_sudoku_path: str, calculation_time: float = 0.5, record: GameRecordWriter = None, players=()) -> None:
     """
     Simulates a game between two instances of SudokuAI, starting in initial_board. The first move is played by player1.
     @param initial_board: The initial position of the game.
@@ -40,6 +51,8 @@ def simulate_game(initial_board: SudokuBoard, player1: SudokuAI, player2: Sudoku
     @param player2: The AI of the second player.
     @param solve_sudoku_path: The location of the oracle executable.
     @param calculation_time: The amount of time in seconds for computing the best move.
+    @param record: If given, the game is appended to this game record.
+    @param players: The names of the players, for the game record.
     """
     import copy
     N = initial_board.N
@@ -47,8 +60,12 @@ def simulate_game(initial_board: SudokuBoard, player1: SudokuAI, player2: Sudoku
     game_state = GameState(initial_board, copy.deepcopy(initial_board), [], [], [0, 0])
     move_number = 0
     number_of_moves = initial_board.squares.count(SudokuBoard.empty)
-    print('Initial state')
-    print(game_state)
+    # let the players know how much time they have; the processes inherit the environment
+    os.environ['SUDOKU_MOVE_TIME'] = str(calculation_time)
+    logger.info('Initial state')
+    logger.info('%s', Lazy(str, game_state))
+    if record:
+        record.start_game(initial_board, list(players))
 
     with multiprocessing.Manager() as manager:
         # use a lock to protect assignments to best_move
@@ -62,38 +79,56 @@ def simulate_game(initial_board: SudokuBoard, player1: SudokuAI, player2: Sudoku
 
         while move_number < number_of_moves:
             player, player_number = (player1, 1) if len(game_state.moves) % 2 == 0 else (player2, 2)
-            print(f'-----------------------------\nCalculate a move for player {player_number}')
+            logger.info('-----------------------------\nCalculate a move for player %d', player_number)
             player.best_move[0] = 0
             player.best_move[1] = 0
             player.best_move[2] = 0
+            # the time from the start of the process until the proposed move last changed
+            proposed, think_time = [0, 0, 0], 0.0
             try:
                 process = multiprocessing.Process(target=player.compute_best_move, args=(game_state,))
+                start = time.perf_counter()
                 process.start()
-                time.sleep(calculation_time)
+                deadline = start + calculation_time
+                while time.perf_counter() < deadline:
+                    time.sleep(min(PROPOSAL_POLL_INTERVAL, max(deadline - time.perf_counter(), 0)))
+                    with lock:
+                        current = player.best_move[:]
+                    if current != proposed:
+                        proposed, think_time = current, time.perf_counter() - start
                 lock.acquire()
                 process.terminate()
                 lock.release()
             except Exception as err:
-                print('Error: an exception occurred.\n', err)
+                logger.error('Error: an exception occurred.\n %s', err)
             i, j, value = player.best_move
+            if [i, j, value] != proposed:
+                # proposed after the last look
+                think_time = calculation_time
             best_move = Move(i, j, value)
-            print(f'Best move: {best_move}')
+            logger.info('Best move: %s', best_move)
             player_score = 0
             if best_move != Move(0, 0, 0):
                 if TabooMove(i, j, value) in game_state.taboo_moves:
                     print(f'Error: {best_move} is a taboo move. Player {3-player_number} wins the game.')
+                    if record:
+                        record.end_game(game_state.scores, 3 - player_number)
                     return
                 board_text = str(game_state.board)
                 options = f'--move "{game_state.board.rc2f(i, j)} {value}"'
                 output = solve_sudoku(solve_sudoku_path, board_text, options)
                 if 'Invalid move' in output:
                     print(f'Error: {best_move} is not a valid move. Player {3-player_number} wins the game.')
+                    if record:
+                        record.end_game(game_state.scores, 3 - player_number)
                     return
                 if 'Illegal move' in output:
                     print(f'Error: {best_move} is not a legal move. Player {3-player_number} wins the game.')
+                    if record:
+                        record.end_game(game_state.scores, 3 - player_number)
                     return
                 if 'has no solution' in output:
-                    print(f'The sudoku has no solution after the move {best_move}.')
+                    logger.info('The sudoku has no solution after the move %s.', best_move)
                     player_score = 0
                     game_state.moves.append(TabooMove(i, j, value))
                     game_state.taboo_moves.append(TabooMove(i, j, value))
@@ -108,16 +143,25 @@ def simulate_game(initial_board: SudokuBoard, player1: SudokuAI, player2: Sudoku
                         raise RuntimeError(f'Unexpected output of sudoku solver: "{output}".')
             else:
                 print(f'No move was supplied. Player {3-player_number} wins the game.')
+                if record:
+                    record.end_game(game_state.scores, 3 - player_number)
                 return
             game_state.scores[player_number-1] = game_state.scores[player_number-1] + player_score
-            print(f'Reward: {player_score}')
-            print(game_state)
+            logger.info('Reward: %d', player_score)
+            logger.info('%s', Lazy(str, game_state))
+            if record:
+                record.add_move(i, j, value, isinstance(game_state.moves[-1], TabooMove), player_score, think_time)
         if game_state.scores[0] > game_state.scores[1]:
             print('Player 1 wins the game.')
+            winner = 1
         elif game_state.scores[0] == game_state.scores[1]:
             print('The game ends in a draw.')
+            winner = 0
         elif game_state.scores[0] < game_state.scores[1]:
             print('Player 2 wins the game.')
+            winner = 2
+        if record:
+            record.end_game(game_state.scores, winner)
 
 
 def main():
@@ -128,9 +172,19 @@ def main():
     cmdline_parser.add_argument('--second', help="the module name of the second player's SudokuAI class (default: random_player)", default='random_player')
     cmdline_parser.add_argument('--time', help="the time (in seconds) for computing a move (default: 0.5)", type=float, default=0.5)
     cmdline_parser.add_argument('--check', help="check if the solve_sudoku program works", action='store_true')
-    cmdline_parser.add_argument('--board', metavar='FILE', type=str, help='a text file containing the start position')
+    cmdline_parser.add_argument('--board', metavar='FILE', type=str, help='a text file containing the start position, or a board corpus file')
+    cmdline_parser.add_argument('--board-index', metavar='K', type=int, default=0, help='the index of the start position in a board corpus file (default: 0)')
+    cmdline_parser.add_argument('--record', metavar='FILE', type=str, help='append the game to this game record file')
+    cmdline_parser.add_argument('--oracle-cache', metavar='DIR', type=str, help='cache the answers of the oracle in this directory, shared by all games that use it')
+    cmdline_parser.add_argument('--quiet', help="only print errors and the result of the game", action='store_true')
+    cmdline_parser.add_argument('--verbose', help="also print the debug output of the players", action='store_true')
     args = cmdline_parser.parse_args()
 
+    set_verbosity(QUIET if args.quiet else VERBOSE if args.verbose else NORMAL)
+    if args.oracle_cache:
+        # the players inherit the environment, so their oracle calls use the cache too
+        os.environ[ORACLE_CACHE_VARIABLE] = args.oracle_cache
+
     if args.check:
         check_oracle(solve_sudoku_path)
         return
@@ -141,9 +195,13 @@ def main():
        2   1   .   3
        .   .   .   1
     '''
-    if args.board:
-        board_text = Path(args.board).read_text()
-    board = load_sudoku_from_text(board_text)
+    if args.board and is_corpus_file(args.board):
+        with load_corpus(args.board) as corpus:
+            board = corpus[args.board_index].copy()
+    else:
+        if args.board:
+            board_text = Path(args.board).read_text()
+        board = load_sudoku_from_text(board_text)
 
     module1 = importlib.import_module(args.first + '.sudokuai')
     module2 = importlib.import_module(args.second + '.sudokuai')
@@ -154,7 +212,12 @@ def main():
     if args.second in ('random_player', 'greedy_player'):
         player2.solve_sudoku_path = solve_sudoku_path
 
-    simulate_game(board, player1, player2, solve_sudoku_path=solve_sudoku_path, calculation_time=args.time)
+    if args.record:
+        with GameRecordWriter(args.record) as record:
+            simulate_game(board, player1, player2, solve_sudoku_path=solve_sudoku_path, calculation_time=args.time,
+                          record=record, players=[args.first, args.second])
+    else:
+        simulate_game(board, player1, player2, solve_sudoku_path=solve_sudoku_path, calculation_time=args.time)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,228 @@
+"""
+Micro and macro benchmarks for the hot paths of the team5 AI.
+
+For every board in boards/ this times find_legal_moves, find_actual_moves (fill_board), score_move and
+calc_taboo_prob, and runs a full compute_best_move per time budget to see how deep the search gets.
+The results can be stored as a baseline and later runs are compared against it.
+
+The numbers are timings, so they depend on the machine and on its load, and a baseline is only meaningful on the
+machine that made it. It is therefore not part of the archive (team5_A2/benchmark_baseline.json is ignored by git).
+To measure a change, store a baseline on your machine before making it, and compare after:
+
+  python -m team5_A2.Benchmark --save            (before the change: store the results as the baseline)
+  python -m team5_A2.Benchmark                   (after the change: compare with the baseline)
+  python -m team5_A2.Benchmark --budget 0.5 2 --board boards/random-3x3.txt
+
+Changes smaller than --threshold (relative, 10% by default) are not reported. On a busy machine repeated runs can
+differ by more than that, especially the search numbers; use a larger threshold there, or repeat the run. --save with --board only replaces the
+results of the boards that were run. Machine independent numbers are kept by NodeCountRegression.py.
+"""
+
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import queue
+import tempfile
+import time
+from pathlib import Path
+
+from competitive_sudoku.sudoku import GameState, SudokuBoard, load_sudoku
+from .Helper_Functions import calc_taboo_prob, find_actual_moves, find_legal_moves, retrieve_empty_cells, score_move
+from .SearchStats import STATS_VARIABLE
+
+BOARDS_DIR = Path(__file__).resolve().parent.parent / 'boards'
+BASELINE_FILE = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+
+
+def ops_per_second(function, min_time: float = 0.2) -> float:
+    """
+    Calls function repeatedly for at least min_time seconds.
+
+    :param function: type callable. The function to time, without arguments. It returns the number of operations done.
+    :param min_time: type float. The minimum time in seconds to spend.
+    :return: type float. The number of operations per second.
+    """
+    operations = 0
+    start = time.perf_counter()
+    while True:
+        operations += function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return operations / elapsed
+
+
+def micro_benchmarks(board: SudokuBoard, min_time: float):
+    """
+    Times the helper functions on one board.
+
+    :param board: type SudokuBoard. The start position.
+    :param min_time: type float. The minimum time in seconds to spend on each function.
+    :return: type generator. Yields (name, operations per second) pairs.
+    """
+    game_state = GameState(board, copy.deepcopy(board), [], [], [0, 0])
+
+    yield 'find_legal_moves', ops_per_second(lambda: find_legal_moves(game_state) and 1, min_time)
+
+    def fill():
+        # fill_board changes the board it gets
+        find_actual_moves(copy.deepcopy(board), game_state)
+        return 1
+    yield 'find_actual_moves', ops_per_second(fill, min_time)
+
+    legal_moves = find_legal_moves(game_state)
+    if not legal_moves:
+        return
+
+    def score():
+        for move in legal_moves:
+            score_move(game_state, move, 1)
+        return len(legal_moves)
+    yield 'score_move', ops_per_second(score, min_time)
+
+    # calc_taboo_prob gets the empty cells of the board after the move, like in score_move
+    arguments = []
+    for move in legal_moves:
+        new_board = copy.deepcopy(board)
+        new_board.put(move.i, move.j, move.value)
+        arguments.append((move, retrieve_empty_cells(move.i, move.j, 'row', new_board),
+                          retrieve_empty_cells(move.i, move.j, 'column', new_board),
+                          retrieve_empty_cells(move.i, move.j, 'block', new_board)))
+
+    def taboo_prob():
+        for move, empty_row, empty_col, empty_block in arguments:
+            calc_taboo_prob(move, board, empty_row, empty_col, empty_block)
+        return len(arguments)
+    yield 'calc_taboo_prob', ops_per_second(taboo_prob, min_time)
+
+
+def search_benchmark(board: SudokuBoard, budget: float) -> dict:
+    """
+    Runs one full compute_best_move with the given time budget and collects its search statistics.
+
+    :param board: type SudokuBoard. The start position.
+    :param budget: type float. The time in seconds for computing the move.
+    :return: type dict. The SearchStats record of the move.
+    """
+    from .sudokuai import SudokuAI
+
+    game_state = GameState(board, copy.deepcopy(board), [], [], [0, 0])
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'stats.jsonl')
+        os.environ[STATS_VARIABLE] = filename
+        try:
+            SudokuAI(budget).compute_best_move(game_state)
+        finally:
+            del os.environ[STATS_VARIABLE]
+        return json.loads(Path(filename).read_text().splitlines()[-1])
+
+
+def run_board(filename: str, budgets, min_time: float, results) -> None:
+    """
+    Runs all benchmarks on one board and puts (name, value) pairs on the results queue as they complete.
+    """
+    board = load_sudoku(filename)
+    for name, value in micro_benchmarks(board, min_time):
+        results.put((name, value))
+    for budget in budgets:
+        record = search_benchmark(board, budget)
+        results.put((f'search_depth@{budget}s', record['depth']))
+        results.put((f'search_nodes_per_second@{budget}s', record['nodes_per_second']))
+
+
+def benchmark_board(filename: str, budgets, min_time: float, timeout: float) -> dict:
+    """
+    Runs the benchmarks of one board in a separate process, so a board on which fill_board does not finish
+    does not stop the whole suite.
+
+    :return: type dict. Maps benchmark names to their values, with None for benchmarks that did not finish.
+    """
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_board, args=(filename, budgets, min_time, results))
+    process.start()
+    deadline = time.time() + timeout
+    values = {}
+    while process.is_alive() or not results.empty():
+        try:
+            name, value = results.get(timeout=0.1)
+            values[name] = value
+        except queue.Empty:
+            if time.time() > deadline:
+                process.terminate()
+                break
+    process.join()
+    names = ['find_legal_moves', 'find_actual_moves', 'score_move', 'calc_taboo_prob']
+    names += [f'search_{kind}@{budget}s' for budget in budgets for kind in ('depth', 'nodes_per_second')]
+    for name in names:
+        values.setdefault(name, None)
+    return values
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    """
+    Prints the results next to the baseline.
+
+    :param threshold: type float. Relative change (e.g. 0.1 for 10%) above which a difference is reported.
+    :return: type int. The number of regressions.
+    """
+    regressions = 0
+    for board, values in results.items():
+        print(board)
+        for name, value in values.items():
+            old = baseline.get(board, {}).get(name)
+            line = f'  {name:<40}{format_value(value):>14}{format_value(old):>14}'
+            if value is None and old is not None:
+                line += '  REGRESSION (did not finish)'
+                regressions += 1
+            elif value is not None and old:
+                change = (value - old) / old
+                line += f'  {change:+7.1%}'
+                if change < -threshold:
+                    line += '  REGRESSION'
+                    regressions += 1
+                elif change > threshold:
+                    line += '  improved'
+            print(line)
+    return regressions
+
+
+def format_value(value) -> str:
+    if value is None:
+        return '-'
+    if isinstance(value, int):
+        return str(value)
+    return f'{value:.1f}'
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Benchmarks for the hot paths of the team5 AI.')
+    cmdline_parser.add_argument('--board', metavar='FILE', action='append', help='a board to run (default: all files in boards/)')
+    cmdline_parser.add_argument('--budget', type=float, nargs='+', default=[0.5, 2.0], help='time budgets (in seconds) for the search benchmark (default: 0.5 2)')
+    cmdline_parser.add_argument('--min-time', type=float, default=0.2, help='minimum time (in seconds) per micro benchmark (default: 0.2)')
+    cmdline_parser.add_argument('--timeout', type=float, default=30.0, help='maximum time (in seconds) per board (default: 30)')
+    cmdline_parser.add_argument('--baseline', metavar='FILE', default=str(BASELINE_FILE), help='the baseline to compare with')
+    cmdline_parser.add_argument('--threshold', type=float, default=0.1, help='relative change that is reported (default: 0.1)')
+    cmdline_parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    args = cmdline_parser.parse_args()
+
+    filenames = args.board or sorted(str(path) for path in BOARDS_DIR.glob('*.txt'))
+    results = {}
+    for filename in filenames:
+        results[Path(filename).name] = benchmark_board(filename, args.budget, args.min_time, args.timeout)
+
+    baseline = {}
+    if Path(args.baseline).exists():
+        baseline = json.loads(Path(args.baseline).read_text())['boards']
+    regressions = compare(results, baseline, args.threshold)
+    print(f'{regressions} regressions')
+
+    if args.save:
+        # keep the results of the boards that were not run
+        baseline.update(results)
+        Path(args.baseline).write_text(json.dumps({'boards': baseline}, indent=2) + '\n')
+        print(f'Saved the results to {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,14 @@
-from competitive_sudoku.sudoku import GameState, Move, SudokuBoard
-from .Extra import get_block, get_column, get_row
-import time
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, TabooMove
+from .Helper_Functions import get_block, get_column, get_row
+from .ThreatIndex import ThreatIndex
 
-def endgame(board):
+
+def endgame(game_state: GameState, index: ThreatIndex = None) -> list:
     """
     tries to find a move that will be declared taboo
-    :param board: The current board
-    :return:
+    :param game_state: The current game state
+    :param index: The ThreatIndex of the board, it is built if not given
+    :return: The moves that take away the value of a forced move, except the known taboo moves
     """
 
     # find a region with a forced move (eg. a row with 1 open field)
@@ -22,7 +24,37 @@ def endgame(board):
     #   ╚═════╧═════╩═════╧═════╝
     # eg.: here play (2,1) -> 1, to prevent the forced move on the bottom row
 
-    #finding a forced move:
-    #this probably implemented by rozanne!
+    # the ThreatIndex keeps the regions with one open field and the fields that can take their value
+    if index is None:
+        index = ThreatIndex(game_state.board)
+    return [move for move in index.trap_moves() if TabooMove(move.i, move.j, move.value) not in game_state.taboo_moves]
 
 
+def scan_trap_moves(board: SudokuBoard) -> list:
+    """
+    finds the same moves as ThreatIndex.trap_moves by scanning the board, for checking the index
+    :param board: The current board
+    :return: The moves that take away the value of a forced move
+    """
+    N = board.N
+    values = set(range(1, N + 1))
+    moves = set()
+    for i in range(N):
+        for j in range(N):
+            if board.get(i, j) != SudokuBoard.empty:
+                continue
+            top, left = i - i % board.m, j - j % board.n
+            row_cells = [(i, c) for c in range(N)]
+            column_cells = [(r, j) for r in range(N)]
+            block_cells = [(r, c) for r in range(top, top + board.m) for c in range(left, left + board.n)]
+            for used, cells in ((get_row(i, board), row_cells), (get_column(j, board), column_cells),
+                                (get_block(i, j, board), block_cells)):
+                if len(used) != N - 1:
+                    continue
+                # (i, j) is the only open field of this region, so it needs the missing value
+                value = (values - used).pop()
+                for r, c in set(row_cells + column_cells + block_cells) - set(cells):
+                    if board.get(r, c) == SudokuBoard.empty and value not in get_row(r, board) | \
+                            get_column(c, board) | get_block(r, c, board):
+                        moves.add((r, c, value))
+    return [Move(i, j, value) for i, j, value in sorted(moves)]
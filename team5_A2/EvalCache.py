@@ -0,0 +1,109 @@
+"""
+An LRU cache for the evaluation of moves by score_move.
+
+The expensive part of score_move (the empty cells and calc_taboo_prob) only depends on the board and the move, not on
+the scores or the player, so that part is cached. Boards are identified by a Zobrist hash: the XOR of a random
+64 bit number for the geometry and one for every filled (square, value) pair. It can be updated per move with a
+single XOR, so the nodes of a search tree get their hash from the path without hashing the board.
+
+The cache is a module level object, so it lives as long as the process: across the moves of a search and, when the
+same process computes several moves (the benchmarks, the regression harness, persistent workers), across turns.
+"""
+
+import random
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from competitive_sudoku.sudoku import Move, SudokuBoard
+
+# Default maximum number of cached evaluations, at roughly 200 bytes each
+DEFAULT_CAPACITY = 100000
+
+_zobrist_keys: Dict[Tuple[int, int], List[int]] = {}
+
+
+def zobrist_keys(m: int, n: int) -> List[int]:
+    """
+    :return: type list. The random numbers of the board geometry, indexed by square * N + value - 1, followed by
+    the number of the geometry itself. The same geometry always gets the same numbers, so hashes can be compared
+    between searches, and boards of different geometries (even empty ones) get different hashes.
+    """
+    keys = _zobrist_keys.get((m, n))
+    if keys is None:
+        N = m * n
+        rng = random.Random(f'zobrist {m}x{n}')
+        keys = _zobrist_keys[(m, n)] = [rng.getrandbits(64) for _ in range(N * N * N + 1)]
+    return keys
+
+
+def board_hash(board: SudokuBoard) -> int:
+    """
+    :return: type int. The Zobrist hash of a board.
+    """
+    keys = zobrist_keys(board.m, board.n)
+    N = board.N
+    h = keys[-1]
+    for k, value in enumerate(board.squares):
+        if value != SudokuBoard.empty:
+            h ^= keys[k * N + value - 1]
+    return h
+
+
+def move_key(position_hash: int, board: SudokuBoard, move: Move) -> int:
+    """
+    :return: type int. The cache key of a move in a position: the position hash with the move id appended. The move id
+    gets as many bits as the largest move id N^3 - 1 of the geometry needs, so the two parts never overlap.
+    """
+    N = board.N
+    return (position_hash << (N * N * N - 1).bit_length()) | ((move.i * N + move.j) * N + move.value - 1)
+
+
+class EvalCache(object):
+    """
+    A bounded mapping from keys to evaluations that evicts the least recently used entry when it is full.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        """
+        :param capacity: type int. The maximum number of entries.
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: int) -> Optional[tuple]:
+        """
+        :return: type tuple. The cached evaluation, or None (which counts as a miss).
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: int, value: tuple) -> None:
+        self.entries[key] = value
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def counters(self) -> dict:
+        """
+        :return: type dict. The size of the cache and the hit, miss and eviction counts, for SearchStats records.
+        """
+        return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+# The cache of score_move
+evaluation_cache = EvalCache()
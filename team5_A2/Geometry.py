@@ -0,0 +1,75 @@
+"""
+Precomputed tables of the board geometry, built once per region size (m, n).
+
+The helpers used to compute the row, column and block of a square on every call, with the block orientation spelled
+out again in every place (blocks are m rows high and n columns wide, which is easy to swap on 2x3 or 3x4 boards).
+The tables here are computed once, and all other code looks squares and regions up in them.
+
+Squares are numbered k = i * N + j. Regions are numbered: the rows 0..N-1, the columns N..2N-1 and the blocks
+2N..3N-1, where block b is the (b // m)-th band of blocks from the top and the (b % m)-th stack from the left.
+"""
+
+from typing import Dict, FrozenSet, List, Tuple
+
+
+class Geometry(object):
+    """
+    The tables of one board geometry.
+    """
+
+    def __init__(self, m: int, n: int):
+        """
+        :param m: type int. The number of rows of a block.
+        :param n: type int. The number of columns of a block.
+        """
+        N = m * n
+        self.m, self.n, self.N = m, n, N
+        # per square
+        self.coordinates: List[Tuple[int, int]] = [divmod(k, N) for k in range(N * N)]
+        self.row_of: List[int] = [k // N for k in range(N * N)]
+        self.column_of: List[int] = [k % N for k in range(N * N)]
+        self.block_of: List[int] = [(i // m) * m + j // n for i, j in self.coordinates]
+        self.square_regions: List[Tuple[int, int, int]] = [
+            (self.row_of[k], N + self.column_of[k], 2 * N + self.block_of[k]) for k in range(N * N)]
+        # per block, the row and column of its top left square
+        self.block_topleft: List[Tuple[int, int]] = [(b // m * m, b % m * n) for b in range(N)]
+        # per region, its squares in reading order
+        self.region_squares: List[Tuple[int, ...]] = (
+            [tuple(range(i * N, (i + 1) * N)) for i in range(N)] +
+            [tuple(range(j, N * N, N)) for j in range(N)] +
+            [tuple((top + r) * N + left + c for r in range(m) for c in range(n)) for top, left in self.block_topleft])
+        # per square, the other squares of its row, column and block
+        self.peers: List[FrozenSet[int]] = [
+            frozenset(k for region in self.square_regions[square] for k in self.region_squares[region]) - {square}
+            for square in range(N * N)]
+
+    def row(self, i: int) -> Tuple[int, ...]:
+        """
+        :return: type tuple. The squares of row i.
+        """
+        return self.region_squares[i]
+
+    def column(self, j: int) -> Tuple[int, ...]:
+        """
+        :return: type tuple. The squares of column j.
+        """
+        return self.region_squares[self.N + j]
+
+    def block(self, i: int, j: int) -> Tuple[int, ...]:
+        """
+        :return: type tuple. The squares of the block that contains square (i, j).
+        """
+        return self.region_squares[2 * self.N + self.block_of[i * self.N + j]]
+
+
+_geometries: Dict[Tuple[int, int], Geometry] = {}
+
+
+def geometry(m: int, n: int) -> Geometry:
+    """
+    :return: type Geometry. The tables of the geometry, they are built on the first call.
+    """
+    tables = _geometries.get((m, n))
+    if tables is None:
+        tables = _geometries[(m, n)] = Geometry(m, n)
+    return tables
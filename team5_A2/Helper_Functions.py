@@ -1,7 +1,13 @@
-import itertools
-import math
+import logging
 
 from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, TabooMove, print_board
+from .EvalCache import evaluation_cache, move_key
+from .Geometry import geometry
+from .Weights import weights
+
+logger = logging.getLogger(__name__)
+# Log level for the trace of fill_board, below DEBUG because it logs every recursion step
+TRACE = 5
 
 
 def find_empty_cell(board: SudokuBoard):
@@ -26,24 +32,12 @@ def possible(i: int, j: int, value: int, board: SudokuBoard, game_state: GameSta
     :return: type bool. True if the move is NOT a taboo move, False if it is.
     '''
     if not TabooMove(i, j, value) in game_state.taboo_moves:
-        N = board.N
-        # check row for the value
-        for column in range(N):
-            if board.get(i, column) == value:
-                return False
-        # check column for the value
-        for row in range(N):
-            if board.get(row, j) == value:
-                return False
-
-            # row index of the top left cell of the block
-        start_row = math.floor(i / board.m) * board.m
-        # column index of the top left cell of the block
-        start_col = math.floor(j / board.n) * board.n
-        # check block for the value
-        for row in range(start_row, start_row + board.m):
-            for col in range(start_col, start_col + board.n):
-                if board.get(row, col) == value:
+        squares = board.squares
+        tables = geometry(board.m, board.n)
+        # check the row, column and block of the cell for the value
+        for region in tables.square_regions[i * board.N + j]:
+            for k in tables.region_squares[region]:
+                if squares[k] == value:
                     return False
         return True
     else:
@@ -59,11 +53,9 @@ def get_row(i: int, board: SudokuBoard) -> set:
     
     :return: type set. All values in given row that are not 0.
     '''
-    N = board.N
-    row = set([])
-    for j in range(N):
-        if board.get(i, j) != SudokuBoard.empty:
-            row.add(board.get(i, j))
+    squares = board.squares
+    row = {squares[k] for k in geometry(board.m, board.n).row(i)}
+    row.discard(SudokuBoard.empty)
     return row
 
 
@@ -76,33 +68,24 @@ def get_column(j: int, board: SudokuBoard) -> set:
     
     :return: type set. All values in given column that are not 0.
     '''
-    N = board.N
-    column = set([])
-    for i in range(N):
-        if board.get(i, j) != SudokuBoard.empty:
-            column.add(board.get(i, j))
+    squares = board.squares
+    column = {squares[k] for k in geometry(board.m, board.n).column(j)}
+    column.discard(SudokuBoard.empty)
     return column
 
-def get_block_topleft(i: int, j: int, width: int, height: int) -> tuple:
+def get_block_topleft(i: int, j: int, board: SudokuBoard) -> tuple:
     '''
     gets the position of the topleft cell of the block which contains the given move.
 
     :param i: type int. Row index of the given move.
     :param j: type int. Column index of the given move.
-    :param width: type int. The width of the blocks for the map on which the move is played.
-    :param height: type int. The height of the blocks for the map on which the move is played.
+    :param board: type SudokuBoard. The board on which the move is played, blocks are board.m rows high and board.n
+    columns wide.
 
     :return: type tuple. The position of the topleft cell (row_index, column_index).
     '''
-    #get the distance from the left boarder by dividing the row index by the block width and taking the remainder
-    dist_from_left_border = i % width
-    topleft_row = i - dist_from_left_border
-
-    #get he distance from the top border by dividing the column index by the block height and taking the remainder
-    dist_from_top_border = j % height
-    topleft_col = j - dist_from_top_border
-
-    return topleft_row, topleft_col
+    tables = geometry(board.m, board.n)
+    return tables.block_topleft[tables.block_of[i * board.N + j]]
 
 
 def get_block(i: int, j: int, board: SudokuBoard) -> set:
@@ -115,13 +98,9 @@ def get_block(i: int, j: int, board: SudokuBoard) -> set:
     
     :return: type set. All values in given block that are not 0.
     '''
-    block = set([])
-    start_row, start_col = get_block_topleft(i,j,board.m,board.n)
-
-    for row in range(start_row, start_row + board.m):
-        for col in range(start_col, start_col + board.n):
-            if board.get(row, col) != board.empty:
-                block.add(board.get(row, col))
+    squares = board.squares
+    block = {squares[k] for k in geometry(board.m, board.n).block(i, j)}
+    block.discard(SudokuBoard.empty)
     return block
 
 
@@ -135,26 +114,27 @@ def find_legal_moves(game_state: GameState) -> list:
     '''
     board = game_state.board
     N = board.N
+    tables = geometry(board.m, board.n)
+    squares = board.squares
+    # per region, bit v - 1 is set if value v is used in it
+    used = [0] * (3 * N)
+    for k, value in enumerate(squares):
+        if value != SudokuBoard.empty:
+            for region in tables.square_regions[k]:
+                used[region] |= 1 << (value - 1)
+    taboo = {(move.i, move.j, move.value) for move in game_state.taboo_moves}
     legal_moves = []
-    empty_count = 0
 
-    # loop over all positions on the board
-    for i in range(N):
-        # row = get_row(i, board)
-        for j in range(N):
-            if board.get(i, j) == board.empty:
-                # empty_count += 1
-                # column = get_column(j, board)
-                # block = get_block(i, j, board)
-                for value in range(1, N + 1):
-                    # on each position and for each value, check that the move is not a taboo move
-                    if possible(i, j, value, board, game_state):
-                        # and check that the current value is not already present
-                        # in one of the current board positions regions
-                        # if value in block or value in column or value in row:
-                        #     continue
-                        # else:
-                        legal_moves.append(Move(i, j, value))
+    # loop over all empty positions on the board, a value is legal if no region of the position uses it
+    # and the move is not a taboo move
+    for k, value in enumerate(squares):
+        if value == SudokuBoard.empty:
+            a, b, c = tables.square_regions[k]
+            mask = used[a] | used[b] | used[c]
+            i, j = tables.coordinates[k]
+            for value in range(1, N + 1):
+                if not mask >> (value - 1) & 1 and (i, j, value) not in taboo:
+                    legal_moves.append(Move(i, j, value))
 
     # best_moves = []
     # mediocre_moves = []
@@ -182,8 +162,12 @@ def find_legal_moves(game_state: GameState) -> list:
     return legal_moves
 
 
-def fill_board(board: SudokuBoard, game_state: GameState, in_board={}, recurse_counter = 0):
+def fill_board(board: SudokuBoard, game_state: GameState, in_board=None, recurse_counter = 0):
     N = board.N
+    # a fresh dictionary for every top level call, a default {} would be shared between calls
+    if in_board is None:
+        in_board = {}
+    trace = logger.isEnabledFor(TRACE)
     # actual_moves = []
     # empty_count = 0
 
@@ -204,7 +188,8 @@ def fill_board(board: SudokuBoard, game_state: GameState, in_board={}, recurse_c
                     if not test and not test2:
                         if possible(i, j, value, board, game_state):
                             board.put(i, j, value)
-                            print(recurse_counter * " ", value, recurse_counter)
+                            if trace:
+                                logger.log(TRACE, '%s %d %d', recurse_counter * " ", value, recurse_counter)
                             if fill_board(board, game_state, in_board, recurse_counter + 1):
                                 return True
                             board.put(i, j, SudokuBoard.empty)
@@ -246,31 +231,20 @@ def retrieve_empty_cells(i: int, j: int, region: str, board: SudokuBoard) -> set
 
     :return: type list. A list of tuples (i,j) containing the row index i and column index j of all empty cells in the given region.
     '''
-    empty_pos = set([])
-
+    tables = geometry(board.m, board.n)
     if region=='row':
-        for x in itertools.filterfalse(lambda y: board.get(i,y)!=board.empty, range(board.N)):
-            empty_pos.add((i,x))
-
-        return empty_pos
-
-    if region=='column':
-        for x in itertools.filterfalse(lambda y: board.get(y,j)!=board.empty, range(board.N)):
-            empty_pos.add((x,j))
-
-        return empty_pos
-
-    if region=='block':
-        left_border, top_border = get_block_topleft(i,j,board.m,board.n)
-        block_indices = itertools.product(range(left_border,left_border+board.m),range(top_border,top_border+board.n))
-        for pos in itertools.filterfalse(lambda y: board.get(y[0],y[1])!=board.empty, block_indices):
-            empty_pos.add((pos[0],pos[1]))
-
-        return empty_pos
-
+        region_squares = tables.row(i)
+    elif region=='column':
+        region_squares = tables.column(j)
+    elif region=='block':
+        region_squares = tables.block(i, j)
     else:
         raise ValueError("region attribute should be 'block', 'column', or 'row'. {} given".format(region))
 
+    squares = board.squares
+    coordinates = tables.coordinates
+    return {coordinates[k] for k in region_squares if squares[k] == SudokuBoard.empty}
+
 
 
 def calc_taboo_prob(move: Move, board: SudokuBoard, empty_row: set, empty_col: set, empty_block: set) -> float:
@@ -345,28 +319,17 @@ def calc_taboo_prob(move: Move, board: SudokuBoard, empty_row: set, empty_col: s
     return 1 - max(prob_row, prob_col, prob_block)
 
 
-def score_move(game_state: GameState, move: Move, player_nr: int, opponent: bool=False) -> tuple:
+def evaluate_move(board_state: SudokuBoard, move: Move) -> tuple:
     '''
-    Calculates a score to indicate how likely a move performed in a given GameState may lead to victory, as well as
-    the new score balance if the move were to be executed.
-    
-    :param game_state: type GameState. The gamestate Before the move is executed.
+    Computes the part of score_move that only depends on the board and the move, so it can be cached.
+
+    :param board_state: type SudokuBoard. The board before the move is executed.
     :param move: type Move. The move that is being scored, assumed to be legal.
-    :param player_nr: type int. 1 if our agent is player 1, 2 if our agent is player 2.
-    :param opponent: type bool. if True, the move is assumed to be executed by our opponent. If False, the move is assumed to
-    be executed by our agent.
-    
-    :return: type float. The score given to the move when performed in the current GameState.
-    :return: type list. The new score balance ([score-player1, score-player2]) if the move were to be executed in the current GameState
-    :return type bool. The expected tabooness of the move.
-    '''
-    #first calculate the current difference in scores (our score - opponent's score)
-    if player_nr == 1:
-        current_score_difference = game_state.scores[0] - game_state.scores[1]
-    else: # player_nr == 2:
-        current_score_difference = game_state.scores[1] - game_state.scores[0]
 
-    board_state = game_state.board
+    :return: type float. The position heuristic (formula 1 of the A1 report, averaged over the regions).
+    :return: type int. The points earned by the move.
+    :return: type bool. The expected tabooness of the move. If True, the other values are 0.
+    '''
     #create a copy of the board and apply the move to it
     new_board = SudokuBoard(board_state.m, board_state.n)
     new_board.squares = board_state.squares.copy()
@@ -382,37 +345,38 @@ def score_move(game_state: GameState, move: Move, player_nr: int, opponent: bool
     block_empty_count = len(block_empty_pos)
     
     #calculate the probability that the move we're trying to play will be taboo
-    taboo_prob = calc_taboo_prob(move, game_state.board, row_empty_pos, col_empty_pos, block_empty_pos)
+    taboo_prob = calc_taboo_prob(move, board_state, row_empty_pos, col_empty_pos, block_empty_pos)
     
     #if the move will (almost) certainly be taboo, it will result in no move played at all and there's no point evaluating it further
-    if taboo_prob > 0.8:
-        return current_score_difference, game_state.scores, True #True to indicate the move is likely taboo
+    if taboo_prob > weights.taboo_threshold:
+        return 0, 0, True #True to indicate the move is likely taboo
 
     regions = 0 #variable to keep track of conquered regions
     
-    #compute heuristic values for column, row and block by applying formula 1 from the A1 report to each region
+    #compute heuristic values for column, row and block by applying formula 1 from the A1 report to each region,
+    #the reward and penalty of the parity are weighted (see Weights.py)
     #start with column
     if col_empty_count%2 == 0: #if there's an even number of empty cells
-        col_heur = 1 / (col_empty_count + 1)
+        col_heur = weights.parity_even / (col_empty_count + 1)
         if col_empty_count == 0: #if no empty cells remain in a region, that region is conquered.
             regions += 1
     else: #if there's an uneven number of empty cells
-        col_heur = - (1 / col_empty_count)
+        col_heur = - (weights.parity_odd / col_empty_count)
     
     #repeat for row and block
     if row_empty_count%2 == 0:
-        row_heur = 1 / (row_empty_count + 1)
+        row_heur = weights.parity_even / (row_empty_count + 1)
         if row_empty_count == 0:
             regions += 1
     else:
-        row_heur = - (1 / row_empty_count)
+        row_heur = - (weights.parity_odd / row_empty_count)
         
     if block_empty_count%2 == 0:
-        block_heur = 1 / (block_empty_count + 1)
+        block_heur = weights.parity_even / (block_empty_count + 1)
         if block_empty_count == 0:
             regions += 1
     else:
-        block_heur = - (1 / block_empty_count)
+        block_heur = - (weights.parity_odd / block_empty_count)
 
     position_heur_score = (col_heur+row_heur+block_heur) / 3
 
@@ -423,6 +387,62 @@ def score_move(game_state: GameState, move: Move, player_nr: int, opponent: bool
         points = 3
     elif regions == 3:
         points = 7
+
+    return position_heur_score, points, False
+
+
+def score_pass(game_state: GameState, player_nr: int) -> tuple:
+    '''
+    Scores a move that will be declared taboo, in the same way as score_move: the board and the score balance do not
+    change, so the score is the current difference in scores.
+
+    :param game_state: type GameState. The gamestate Before the move is executed.
+    :param player_nr: type int. 1 if our agent is player 1, 2 if our agent is player 2.
+
+    :return: type tuple. The score, the score balance and True, as score_move returns them for a taboo move.
+    '''
+    if player_nr == 1:
+        current_score_difference = game_state.scores[0] - game_state.scores[1]
+    else: # player_nr == 2:
+        current_score_difference = game_state.scores[1] - game_state.scores[0]
+    return current_score_difference, game_state.scores, True
+
+
+def score_move(game_state: GameState, move: Move, player_nr: int, opponent: bool=False, position_hash: int=None) -> tuple:
+    '''
+    Calculates a score to indicate how likely a move performed in a given GameState may lead to victory, as well as
+    the new score balance if the move were to be executed.
+    
+    :param game_state: type GameState. The gamestate Before the move is executed.
+    :param move: type Move. The move that is being scored, assumed to be legal.
+    :param player_nr: type int. 1 if our agent is player 1, 2 if our agent is player 2.
+    :param opponent: type bool. if True, the move is assumed to be executed by our opponent. If False, the move is assumed to
+    be executed by our agent.
+    :param position_hash: type int. The Zobrist hash of the board (see EvalCache.board_hash). If given, the evaluation
+    of the move is looked up in and stored in the evaluation cache.
+    
+    :return: type float. The score given to the move when performed in the current GameState.
+    :return: type list. The new score balance ([score-player1, score-player2]) if the move were to be executed in the current GameState
+    :return type bool. The expected tabooness of the move.
+    '''
+    #first calculate the current difference in scores (our score - opponent's score)
+    if player_nr == 1:
+        current_score_difference = game_state.scores[0] - game_state.scores[1]
+    else: # player_nr == 2:
+        current_score_difference = game_state.scores[1] - game_state.scores[0]
+
+    if position_hash is None:
+        position_heur_score, points, taboo = evaluate_move(game_state.board, move)
+    else:
+        key = move_key(position_hash, game_state.board, move)
+        evaluation = evaluation_cache.get(key)
+        if evaluation is None:
+            evaluation = evaluate_move(game_state.board, move)
+            evaluation_cache.put(key, evaluation)
+        position_heur_score, points, taboo = evaluation
+
+    if taboo:
+        return current_score_difference, game_state.scores, True #True to indicate the move is likely taboo
     
     # update the score balance based on the points earned
     if (player_nr == 1 and opponent) or (player_nr == 2 and not opponent):
@@ -430,8 +450,8 @@ def score_move(game_state: GameState, move: Move, player_nr: int, opponent: bool
     elif (player_nr == 1 and not opponent) or (player_nr == 2 and opponent):
         new_points = [game_state.scores[0] + points, game_state.scores[1]]
         
-    # the first half of formula 2 of the report
-    final_score = 2*position_heur_score + points
+    # the first half of formula 2 of the report, with the weights of Weights.py (2 and 1 by default)
+    final_score = weights.position*position_heur_score + weights.points*points
     
     # the second half of formula 2 of the report
     if opponent:
@@ -0,0 +1,144 @@
+"""
+Cross-check of the incrementally maintained board structures against a full rescan.
+
+The structures are updated per move instead of being recomputed, so a mistake in an update only shows up as a
+slightly wrong answer much later in a game. This check walks randomly through positions of the start boards,
+filling squares with moves that no region forbids and emptying them again, and after every step compares each
+structure with one that is built from scratch for the same board, and with the scan that the structure replaces:
+
+  threat-index    ThreatIndex.py against a new ThreatIndex, MoveGenerator.region_empty_counts and
+                  Endgame.scan_trap_moves
+
+Run from the root folder of the archive:
+
+  python -m team5_A2.IncrementalCheck                                        (all structures, all boards in boards/)
+  python -m team5_A2.IncrementalCheck --steps 5000 boards/random-3x3.txt    (a longer walk on one board)
+
+The exit status is 1 if any difference was found.
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+from typing import List
+
+from competitive_sudoku.sudoku import GameState, SudokuBoard, load_sudoku
+from .Endgame import scan_trap_moves
+from .Helper_Functions import possible
+from .MoveGenerator import region_empty_counts
+from .ThreatIndex import ThreatIndex
+
+BOARDS_DIR = Path(__file__).resolve().parent.parent / 'boards'
+
+
+class RandomWalk(object):
+    """
+    A random sequence of moves and undos from a start board. Only moves that no region forbids are played, and the
+    undos take back the last move that is still on the board, so the walk suits structures with a stack of moves.
+    """
+
+    def __init__(self, board: SudokuBoard, rng: random.Random, undo_rate: float = 0.4):
+        """
+        :param board: type SudokuBoard. The start board, it is not changed.
+        :param rng: type Random. The source of the moves.
+        :param undo_rate: type float. The probability that a step takes back a move.
+        """
+        self.board = SudokuBoard(board.m, board.n)
+        self.board.squares = board.squares.copy()
+        self.game_state = GameState(board, self.board, [], [], [0, 0])
+        self.rng = rng
+        self.undo_rate = undo_rate
+        self.played = []
+
+    def step(self):
+        """
+        Changes the board by one square.
+
+        :return: type tuple. ('put', i, j, value) or ('undo', i, j).
+        """
+        board, N = self.board, self.board.N
+        moves = []
+        if not self.played or self.rng.random() >= self.undo_rate:
+            moves = [(i, j, value) for i in range(N) for j in range(N) if board.get(i, j) == SudokuBoard.empty
+                     for value in range(1, N + 1) if possible(i, j, value, board, self.game_state)]
+        if moves:
+            i, j, value = self.rng.choice(moves)
+            board.put(i, j, value)
+            self.played.append((i, j))
+            return 'put', i, j, value
+        if not self.played:
+            return None
+        i, j = self.played.pop()
+        board.put(i, j, SudokuBoard.empty)
+        return 'undo', i, j
+
+
+def threat_index_differences(index: ThreatIndex, board: SudokuBoard) -> List[str]:
+    """
+    :return: type list. The names of the parts of the index that differ from a new index for the board,
+    'empty_counts' if its region counts differ from region_empty_counts and 'trap_moves' if its trap moves differ
+    from those found by scan_trap_moves.
+    """
+    fresh = ThreatIndex(board)
+    differences = [name for name in ('squares', 'used', 'empty', 'singles', 'doubles', 'forced', 'missing_in',
+                                     'traps', 'trapped')
+                   if getattr(index, name) != getattr(fresh, name)]
+    if index.empty_counts() != region_empty_counts(board):
+        differences.append('empty_counts')
+    if sorted((move.i, move.j, move.value) for move in index.trap_moves()) != \
+            [(move.i, move.j, move.value) for move in scan_trap_moves(board)]:
+        differences.append('trap_moves')
+    return differences
+
+
+def check_threat_index(board: SudokuBoard, steps: int, rng: random.Random) -> int:
+    """
+    :return: type int. The number of steps after which the index differed.
+    """
+    walk = RandomWalk(board, rng)
+    index = ThreatIndex(board)
+    failures = 0
+    for _ in range(steps):
+        change = walk.step()
+        if change is None:
+            break
+        if change[0] == 'put':
+            index.put(*change[1:])
+        else:
+            index.clear(*change[1:])
+        differences = threat_index_differences(index, walk.board)
+        if differences:
+            failures += 1
+            if failures == 1:
+                print(f'  after {change}: {", ".join(differences)} differ')
+    return failures
+
+
+CHECKS = {
+    'threat-index': check_threat_index,
+}
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Checks the incrementally maintained board structures of the team5 AI against a full rescan.')
+    cmdline_parser.add_argument('files', nargs='*', help='the start boards (default: all boards in boards/)')
+    cmdline_parser.add_argument('--only', choices=sorted(CHECKS), help='check only this structure (default: all)')
+    cmdline_parser.add_argument('--steps', type=int, default=1000, help='the number of moves and undos per board (default: 1000)')
+    cmdline_parser.add_argument('--seed', type=int, default=0, help='the seed of the random walks (default: 0)')
+    args = cmdline_parser.parse_args()
+
+    files = args.files or sorted(str(path) for path in BOARDS_DIR.glob('*.txt'))
+    names = [args.only] if args.only else list(CHECKS)
+    total = 0
+    for name in names:
+        for filename in files:
+            failures = CHECKS[name](load_sudoku(filename), args.steps, random.Random(args.seed))
+            print(f'{name} {Path(filename).name}: {failures} steps with differences')
+            total += failures
+    print(f'{total} steps with differences')
+    sys.exit(1 if total else 0)
+
+
+if __name__ == '__main__':
+    main()
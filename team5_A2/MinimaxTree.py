@@ -1,116 +1,185 @@
-from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, TabooMove
-from .Helper_Functions import find_legal_moves, score_move, find_actual_moves
+from competitive_sudoku.sudoku import GameState, Move
+from .Endgame import endgame
+from .Helper_Functions import score_move, score_pass
+from .NodePool import ACTIVE, EXHAUSTED, MAXIMIZE, TABOO, NodePool
+from .Symmetry import BoardCounts, uses_symmetry
+from .ThreatIndex import ThreatIndex
+from .Weights import weights
+import logging
 import time
 from typing import List
 
+# Half-width of the aspiration window around the previous iteration's score. Scores move in steps of 1/3/7 points
+# plus a fractional heuristic, so a window of one point catches most iterations.
+ASPIRATION_WINDOW = 1
+# Width of the null window used to test whether a move beats the principal variation.
+NULL_WINDOW = 1e-6
+# Default maximum number of nodes in a tree, at about 40 bytes per node
+DEFAULT_NODE_BUDGET = 2000000
+
+logger = logging.getLogger(__name__)
+
 class MinimaxTree():
-    def __init__(self, game_state: GameState, move: Move, score: float, player_nr: int, moves : List[Move], maximize=True):
-        self.game_state = game_state
-        self.move = move
-        self.score = score            # The score for the gamestate on this node
-        self.player_nr = player_nr    # Remains the same for all tree nodes
-        self.children = []            # contains a list of MinimaxTrees showing moves that can be played from here
-        self.moves = moves
+    """
+    A node of a search tree. The node itself only holds its index; the data of all nodes of the tree is kept
+    in a NodePool, so a MinimaxTree object is cheap to create and can be thrown away.
+    """
+    __slots__ = ('pool', 'index')
+
+    # SearchStats of the running search, shared by all nodes. None disables the statistics.
+    stats = None
+
+    def __init__(self, pool: NodePool, index: int = 0):
+        """
+        :param pool: type NodePool. The nodes of the tree.
+        :param index: type int. The index of this node in the pool, 0 for the root.
+        """
+        self.pool = pool
+        self.index = index
+
+    @staticmethod
+    def new_root(game_state: GameState, player_nr: int, moves: List[Move], node_budget: int = DEFAULT_NODE_BUDGET):
+        """
+        Creates a tree with only a root.
 
-        self.maximize = maximize
-        self.active = True            # False if the tree is pruned. No new levels will be added to this
+        :param game_state: type GameState. The position of the root, it is not changed.
+        :param player_nr: type int. Remains the same for all tree nodes.
+        :param moves: type list. The moves that are considered in this position.
+        :param node_budget: type int. The maximum number of nodes, None for no limit.
+        :return: type MinimaxTree. The root.
+        """
+        return MinimaxTree(NodePool(game_state, player_nr, moves, node_budget))
+
+    @property
+    def game_state(self) -> GameState:
+        # rebuilt from the moves on the path from the root
+        return self.pool.get_game_state(self.index)
+
+    @property
+    def move(self) -> Move:
+        return self.pool.get_move(self.index)
+
+    @property
+    def score(self) -> float:
+        # The score for the gamestate on this node
+        return self.pool.score[self.index]
+
+    @score.setter
+    def score(self, value: float):
+        self.pool.score[self.index] = value
+
+    @property
+    def player_nr(self) -> int:
+        return self.pool.player_nr
+
+    @property
+    def children(self) -> list:
+        # a list of MinimaxTrees showing moves that can be played from here
+        first = self.pool.first_child[self.index]
+        return [MinimaxTree(self.pool, child) for child in range(first, first + self.pool.child_count[self.index])]
+
+    @property
+    def moves(self) -> List[Move]:
+        return self.pool.remaining_moves(self.index)
+
+    @property
+    def maximize(self) -> bool:
+        return bool(self.pool.flags[self.index] & MAXIMIZE)
+
+    @property
+    def active(self) -> bool:
+        # False if the tree is pruned. No new levels will be added to this
+        return bool(self.pool.flags[self.index] & ACTIVE)
+
+    @active.setter
+    def active(self, value: bool):
+        if value:
+            self.pool.flags[self.index] |= ACTIVE
+        else:
+            self.pool.flags[self.index] &= ~ACTIVE
 
     def update_score(self):
         """
         Recursively updates child scores then takes them and either maximizes or minimizes score, flipping each layer of the tree.
+        The scores are already kept up to date by backup when the tree grows, so this is only needed after changing
+        scores by hand.
 
         Uses self.maximize: whether to maximize (true) or minimize (false) the score on this node
                should be false for opponent move
         """
+        update_score(self.pool, self.index)
 
-        if not self.children:
-            # recursion base: do nothing (using the score that was decided when the node was made)
-            return
-        else:
-            # recursively update the scores of the current's node's children using this function
-            scores = []
-            for child in self.children:
-                child.update_score()
-                scores.append(child.score)
-                
-            # update the current node's score by replacing it with the maximum or minimum of the children's scores
-            if not self.maximize:
-                self.score = min(scores)
-            else:
-                self.score = max(scores)
-
-    def add_layer_here(self):
+    def get_best_move(self) -> Move:
         """
-        Adds a layer to the tree with moves that can be played now and their scores.
+        Gets the best move: the move made by the active child with the best score.
+        The scores are kept up to date when the tree grows (see backup), so the tree does not have to be updated first.
+        :return: Move
         """
-        # start = time.time()
-        # find legal moves
-        board_copy = SudokuBoard(self.game_state.board.m, self.game_state.board.n)
-        board_copy.squares = self.game_state.board.squares.copy()
-        legal_moves = find_actual_moves(board_copy, self.game_state)
-        if len(legal_moves) == 0:
-            self.active = False
-        # Iterate ove the legal moves and add a child in the new layer for each
-        for move in legal_moves:
-            # score the move and find out what the new point balance would be after the move is made
-            # the score is input for the new MinimaxTree, new_points is input for the new GameState.
-            score, new_points, taboo = score_move(self.game_state, move, self.player_nr, not self.maximize)
-            
-            # create a copy of the SudokuBoard and apply the move to it, this is input for the new GameState
-
-            new_board = SudokuBoard(self.game_state.board.m, self.game_state.board.n)
-            new_board.squares = self.game_state.board.squares.copy()
-
-            if not taboo: #if the move is not taboo, the board will change
-                new_board.put(move.i, move.j, move.value)
-            
-            new_state = GameState(self.game_state.initial_board, new_board,
-                                  self.game_state.taboo_moves.copy(), self.game_state.moves.copy(),
-                                  new_points)
-
-            # add the new MinimaxTree to the children of the current one
-            self.children.append(MinimaxTree(new_state, move, score, self.player_nr, not self.maximize))
+        best_move, best_score = self.best_child()
+        if best_move is None:
+            best_score = -99999999
+        return(best_move, best_score)
 
-    def add_layer(self, indent = ""):
+    def best_child(self):
         """
-        Goes to the bottom of the tree and adds a layer there.
-        Uses A-B Pruning to decrease work
-        """
-        # prune reporting
-        i = 0
-        j = 0
-        start = time.time()
-        # prevent doing unneeded work by ab pruning the tree before adding a layer
-        self.prune()
-        # recursively check if each node has children
-        if len(self.children) > 0:
-            for child in self.children:
-                if child.active: # do not go down pruned branches
-                    child.add_layer(indent + "  ")
-                else: # prune reporting
-                    i += 1
-                j += 1
-            print(f"{indent} {int((time.time()-start)*1000)} ms      {i} out of {j} Pruned") #(i out of j moves are pruned)
-        # when a childless node is reached (the bottom of the tree), add children to it
-        else:
-            self.add_layer_here()
+        Gets the move of the active child with the best score, without updating the scores first.
+        :return: (Move, score), or (None, score) if there is no active child
+        """
+        pool = self.pool
+        best = best_child(pool, self.index, ACTIVE)
+        if best is None:
+            return None, pool.score[self.index]
+        return pool.get_move(best), pool.score[best]
 
-    def get_best_move(self) -> Move:
+    def principal_leaf(self):
         """
-        Gets the best move by updating the score of the entire tree,
-        then suggesting the move made by the child with the best score.
-        :return: Move
+        Follows the best children from this node down to a leaf that can still be expanded.
+        This is the leaf that decides the score of this node, so expanding it is the most useful work.
+        :return: int, the index of the leaf, or None if nothing below this node can be expanded
+        """
+        pool = self.pool
+        while True:
+            index = self.index
+            depth = 0
+            while pool.child_count[index]:
+                child = best_child(pool, index, ACTIVE | EXHAUSTED)
+                if child is None:
+                    break
+                index = child
+                depth += 1
+            if not pool.child_count[index] and not pool.flags[index] & EXHAUSTED:
+                if MinimaxTree.stats is not None:
+                    MinimaxTree.stats.depth = max(MinimaxTree.stats.depth, depth + 1)
+                return index
+            if index == self.index:
+                return None
+            # nothing below this node can be expanded, so try again without it
+            pool.flags[index] |= EXHAUSTED
+
+    def backup(self, index: int) -> None:
         """
-        self.update_score()  # update the scores so children's scores are correct
+        Updates the scores of the ancestors of a node after its score changed, from the bottom up.
+        Stops at the first ancestor whose score stays the same, instead of updating the whole tree.
+        """
+        backup(self.pool, index)
 
-        best_score = -99999999
-        best_move = None
-        # iterate over the children (current possible moves to make) and return the move with the highest score
-        for child in self.children:
-            if child.score > best_score and child.active:
-                best_score = child.score
-                best_move = child.move
-        return(best_move, best_score)
+    def best_first_expand(self, board_states: dict) -> bool:
+        """
+        Best-first minimax: expands the principal leaf below this node and backs up the new score along its path.
+
+        :param board_states: type dict. The boards seen so far, see smart_add_layer_here. Kept between calls.
+        :return: bool, False if nothing could be expanded anymore.
+        """
+        leaf = self.principal_leaf()
+        if leaf is None:
+            return False
+        pool = self.pool
+        MinimaxTree(pool, leaf).smart_add_layer_here(board_states)
+        if pool.child_count[leaf]:
+            return True
+        # the game is over in the leaf (or all its moves lead to known boards), so its score is final
+        pool.flags[leaf] |= EXHAUSTED
+        return True
 
     def prune(self, a=-9999, b=9999, prune_min_dif=1):
         """
@@ -120,141 +189,257 @@ class MinimaxTree():
         Thus prune_min_dif can be used to decide when to not explore moves anymore.
 
         """
-        if len(self.children) == 0:
-            return self.score
-        elif self.maximize:
-            maxEva = -9999
-            for child in self.children:
-                if a < b:
-                    eva = child.prune(a, b)
-                    maxEva = max(maxEva, eva)
-                    a = max(a, eva)
-                elif a + prune_min_dif < b: #if needs to be pruned
-                    child.active = False
-            return maxEva
-        elif not self.maximize:
-            minEva = 9999
-            for child in self.children:
-                if a  < b:
-                    eva = child.prune( a, b)
-                    minEva = min(minEva, eva)
-                    b = min(b, eva)
-                elif a + prune_min_dif < b: #if needs to be pruned
-                    child.active = False
-            return minEva
-        else:
-            raise Exception("How did you get here????")
+        return prune(self.pool, self.index, a, b, prune_min_dif)
+
+    def principal_variation_search(self, a=-9999, b=9999, cut=None):
+        """
+        Principal variation (null-window) search over the part of the tree that has been built so far.
+        The first child (the best one of the previous iteration) is searched with the full window,
+        the other children only with a null window to prove they are not better. Only if that proof fails
+        the child is searched again with the full window.
+
+        :param a: type float. Lower bound of the window.
+        :param b: type float. Upper bound of the window.
+        :param cut: type list. If given, the indices of the children that were cut off are appended to it.
+        :return: type float. The value of this node. A value <= a is an upper bound (fail low),
+        a value >= b is a lower bound (fail high), anything in between is exact.
+        """
+        if cut is None:
+            cut = []
+        return principal_variation_search(self.pool, self.index, a, b, cut)
+
+    def aspiration_search(self, guess: float, window: float = ASPIRATION_WINDOW) -> float:
+        """
+        Searches the tree with a narrow window centred on the score of the previous iteration.
+        When the result falls outside the window (fail high or fail low), the window is widened on that
+        side and the tree is searched again. Branches are only deactivated after a search that did not fail.
+
+        :param guess: type float. The expected score, usually the best score of the previous iteration.
+        :param window: type float. Half-width of the initial window.
+        :return: type float. The minimax value of the tree.
+        """
+        a = max(guess - window, -9999)
+        b = min(guess + window, 9999)
+        while True:
+            cut = []
+            value = self.principal_variation_search(a, b, cut)
+            if value <= a and a > -9999:
+                window *= 2
+                a = max(value - window, -9999)
+            elif value >= b and b < 9999:
+                window *= 2
+                b = min(value + window, 9999)
+            else:
+                break
+            if MinimaxTree.stats is not None:
+                MinimaxTree.stats.researches += 1
+        flags = self.pool.flags
+        for child in cut:
+            flags[child] &= ~ACTIVE
+        if MinimaxTree.stats is not None:
+            MinimaxTree.stats.cutoffs += len(cut)
+        return value
+
+    def count_active_leaves(self) -> int:
+        """
+        Counts the leaves that the next call of smart_add_layer would expand.
+        :return: int
+        """
+        return len(active_leaves(self.pool, self.index))
+
+    def enforce_budget(self) -> bool:
+        """
+        Makes sure the next layer fits in the node budget of the pool. If the active leaves would get more children
+        than there is room for, only the most promising leaves are kept active: the ones with the best score for the
+        player that chose their move.
 
-    def smart_add_layer(self, board_states = {}, indent=""):
+        :return: type bool. False if not a single leaf can be expanded anymore.
+        """
+        pool = self.pool
+        if pool.node_budget is None:
+            return True
+        leaves = active_leaves(pool, self.index)
+        if not leaves:
+            return True
+        # every leaf at the bottom of the tree gets at most one child for each remaining move
+        children_per_leaf = max(1, len(pool.remaining_moves(leaves[0])))
+        room = (pool.node_budget - len(pool)) // children_per_leaf
+        if len(leaves) <= room:
+            return True
+        if room <= 0:
+            return False
+
+        def promise(leaf):
+            score = pool.score[leaf]
+            return score if pool.flags[pool.parent[leaf]] & MAXIMIZE else -score
+        leaves.sort(key=promise, reverse=True)
+        for leaf in leaves[room:]:
+            pool.flags[leaf] &= ~ACTIVE
+        if MinimaxTree.stats is not None:
+            MinimaxTree.stats.evicted += len(leaves) - room
+        return True
+
+    def smart_add_layer(self, board_states = {}, indent="", guess=None, time_manager=None, prune=True,
+                        threats: ThreatIndex = None):
         """
         Goes to the bottom of the tree and adds a layer there.
         Uses A-B Pruning to decrease work,
         as well as preventing going down places where the same board state
         has already been seen with a better score.
+        If guess is given, pruning is done with principal variation search in an aspiration window around it.
+        If time_manager is given, SearchTimeout is raised when its hard limit passes, leaving the layer incomplete.
+        prune=False skips the pruning, for when the tree was already pruned by the caller.
+        threats is the ThreatIndex of the board of this node. It is built if not given, and kept up to date while going
+        down the tree with put and clear, so the nodes do not need to scan their boards.
         """
-        # prune reporting
-        i = 0
-        j = 0
-        k = 0
-        start = time.time()
         # prevent doing unneeded work by ab pruning the tree before adding a layer. Only do it once
-        if board_states == {}:
-            self.prune()
+        if board_states == {} and prune:
+            if guess is None:
+                self.prune()
+            else:
+                self.aspiration_search(guess)
+        pool = self.pool
+        if threats is None:
+            threats = ThreatIndex(pool.board(self.index))
+        count = pool.child_count[self.index]
         # recursively check if each node has children
-        if len(self.children) > 0:
-            for child in self.children:
-                if child.active:  # do not go down pruned branches
-                    try:
-                        board_score = board_states[(tuple(child.game_state.board.squares), child.maximize)]
-                    except KeyError:
-                        board_score = -999999
-
-                    if board_score < child.score:  #do not go down branches where the same board position has already been encountered
-                                                   # but with a better score for us
-                        board_states[(tuple(child.game_state.board.squares), child.maximize)] = child.score
-                        board_states = child.smart_add_layer(board_states, indent + "  ")
+        if count > 0:
+            # prune reporting
+            inactive = 0
+            duplicates = 0
+            first = pool.first_child[self.index]
+            for child in range(first, first + count):
+                if pool.flags[child] & ACTIVE:  # do not go down pruned branches
+                    key = (pool.key(child), bool(pool.flags[child] & MAXIMIZE))
+                    board_score = board_states.get(key, -999999)
+
+                    if board_score < pool.score[child]:  #do not go down branches where the same (or a symmetric) board position has already been encountered
+                                                         # but with a better score for us
+                        board_states[key] = pool.score[child]
+                        # a taboo move does not change the board
+                        taboo = pool.flags[child] & TABOO
+                        if not taboo:
+                            square, value = divmod(pool.move[child], pool.N)
+                            i, j = divmod(square, pool.N)
+                            threats.put(i, j, value + 1)
+                        try:
+                            board_states = MinimaxTree(pool, child).smart_add_layer(
+                                board_states, indent + "  ", time_manager=time_manager, threats=threats)
+                        finally:
+                            if not taboo:
+                                threats.clear(i, j)
                     else:
-                        child.active = False
-                        print(f"{indent} deactivating branch {j}")
-                        k += 1
+                        pool.flags[child] &= ~ACTIVE
+                        duplicates += 1
                 else:  # prune reporting
-                    i += 1
-                j += 1
-            if k + i >= j and j > 0:
+                    inactive += 1
+            if duplicates + inactive >= count:
                 #if all children are invactive, deactivate this branch
                 self.active = False
-            print(f"{indent} {int((time.time() - start) * 1000)} ms      {i} out of {j} Pruned, {k} deactivated as double boards")  # (i out of j moves are pruned)
+            if MinimaxTree.stats is not None:
+                MinimaxTree.stats.duplicate_hits += duplicates
         # when a childless node is reached (the bottom of the tree), add children to it
         else:
-            board_states = self.smart_add_layer_here(board_states)
+            if time_manager is not None:
+                time_manager.check()
+            board_states = self.smart_add_layer_here(board_states, threats)
         return board_states
 
-    def smart_add_layer_here(self, board_states):
+    def smart_add_layer_here(self, board_states, threats: ThreatIndex = None):
         """
         Adds a layer to the tree with moves that can be played now and their scores.
         Returns the board_states, to allow setting certain boards to inactive
+        threats is the ThreatIndex of the board of this node, it is built if not given. The moves are ordered with its
+        region counts, and if none of them is expected to be taboo, a trap move from it is added as a pass, see
+        Endgame.py.
         """
-        # start = time.time()
-        # find legal moves
-        board_copy = SudokuBoard(self.game_state.board.m, self.game_state.board.n)
-        board_copy.squares = self.game_state.board.squares.copy()
-        # if len(self.moves) == 0:
-        #     self.active = False
-        #     # turns off adding a layer to anything that has no legal moves left (finished games, mostly)
-        #     pass
-
-        # Iterate over the legal moves and add a child in the new layer for each
-        for move in self.moves:
+        stats = MinimaxTree.stats
+        if stats is not None:
+            start = time.perf_counter()
+            score_time = 0.0
+        pool = self.pool
+        index = self.index
+        game_state = pool.get_game_state(index)
+        board = game_state.board
+        position_hash = pool.position_hash(index)
+        # boards are keyed up to symmetry only while they are sparse, see Symmetry.uses_symmetry
+        filled = pool.filled(index)
+        key = pool.canonical_key(position_hash, board) if uses_symmetry(board.N, filled) else position_hash
+        child_symmetry = uses_symmetry(board.N, filled + 1)
+        if child_symmetry:
+            counts = BoardCounts.of_board(board)
+        maximize = self.maximize
+        child_flags = ACTIVE if maximize else ACTIVE | MAXIMIZE
+        first = len(pool)
+
+        if threats is None:
+            threats = ThreatIndex(board)
+
+        # Iterate over the legal moves, the most promising first, and add a child in the new layer for each
+        for move in pool.ordered_moves(index, board, threats.empty_counts()):
             # score the move and find out what the new point balance would be after the move is made
-            # the score is input for the new MinimaxTree, new_points is input for the new GameState.
-            score, new_points, taboo = score_move(self.game_state, move, self.player_nr, not self.maximize)
-
-
-            # create a copy of the SudokuBoard and apply the move to it, this is input for the new GameState
-            new_board = SudokuBoard(self.game_state.board.m, self.game_state.board.n)
-            new_board.squares = self.game_state.board.squares.copy()
-            new_taboo = self.game_state.taboo_moves.copy()
-            new_moves_played = self.game_state.moves.copy()
-            if not taboo:  # if the move is not taboo, the board will change
-                new_board.put(move.i, move.j, move.value)
-                new_moves_played.append(move)
-            else:
-                new_taboo.append(TabooMove(move.i, move.j, move.value))
-                new_moves_played.append(TabooMove(move.i, move.j, move.value))
-
-            # only do the move if it does not result in a board_state that has already been seen with the same score or better
-            try:
-                board_score = board_states[(tuple(new_board.squares), not self.maximize)]
-            except:
-                board_score = -999999
-            if score > board_score-10:
-                new_state = GameState(self.game_state.initial_board, new_board,
-                                      new_taboo, new_moves_played,
-                                      new_points)
-                new_moves = self.moves.copy()
-                new_moves.remove(move)
-                #print(move, [str(i) for i in self.moves], [str(i) for i in new_moves])
-                # add the new MinimaxTree to the children of the current one
-                self.children.append(MinimaxTree(new_state, move, score, self.player_nr, new_moves, not self.maximize))
+            # the score and new_points are stored in the new node
+            if stats is not None:
+                score_start = time.perf_counter()
+            score, new_points, taboo = score_move(game_state, move, pool.player_nr, not maximize, position_hash)
+            if stats is not None:
+                score_time += time.perf_counter() - score_start
+
+            move_id = pool.move_id(move)
+            if taboo:
+                new_key = key
+            else:  # if the move is not taboo, the board will change
+                # the move id is also the index of its Zobrist number, see NodePool.position_hash
+                new_key = position_hash ^ pool.zobrist_keys[move_id]
+                if child_symmetry:
+                    board.put(move.i, move.j, move.value)
+                    new_key = pool.canonical_key(new_key, board, counts.after_move(move.i, move.j))
+                    board.put(move.i, move.j, board.empty)
+
+            # only do the move if it does not result in a board_state that has already been seen with the same score or better,
+            # boards that are equal up to symmetry have the same key
+            board_score = board_states.get((new_key, not maximize), -999999)
+            if score > board_score - weights.duplicate_tolerance:
+                # add the new node to the children of the current one, the children of a node are adjacent in the pool
+                pool.add(index, move_id, score, new_points, child_flags | TABOO if taboo else child_flags)
 
                 #update the saved board_score
-                board_states[(tuple(new_board.squares), not self.maximize)] = score
-        # if len(self.children) == 0:
-        #     self.active = False
+                board_states[(new_key, not maximize)] = score
+            elif stats is not None:
+                stats.duplicate_hits += 1
+
+        # a move that takes away the value of a forced move is declared taboo, which passes the turn to the opponent.
+        # All passes lead to the same board, so one is added if none of the moves is one already
+        if not any(pool.flags[child] & TABOO for child in range(first, len(pool))):
+            passes = endgame(game_state, threats)
+            if passes:
+                score, new_points, _ = score_pass(game_state, pool.player_nr)
+                board_score = board_states.get((key, not maximize), -999999)
+                if score > board_score - weights.duplicate_tolerance:
+                    pool.add(index, pool.move_id(passes[0]), score, new_points, child_flags | TABOO)
+                    board_states[(key, not maximize)] = score
+                elif stats is not None:
+                    stats.duplicate_hits += 1
+        pool.first_child[index] = first
+        pool.child_count[index] = len(pool) - first
+        # the node gets the score of its best child, and its ancestors are updated where that changes something
+        if len(pool) > first and set_best_child(pool, index):
+            backup(pool, index)
+        if stats is not None:
+            stats.nodes_expanded += 1
+            stats.nodes_created += len(pool) - first
+            stats.score_move_time += score_time
+            stats.tree_update_time += time.perf_counter() - start - score_time
         return board_states
 
     def print_move_scores(self):
         """
-        Prints the move-score combo of each child move
+        Logs the move-score combo of each child move, at debug level
         :return:
         """
-        max_score = -9999
         for child in self.children:
-            print(f"{child.move} : {child.score}, {child.active}")
-            if child.score > max_score:
-                max_score = child.score
-                best_move = child
-        print(self.print_best_move_path())
+            logger.debug("%s : %s, %s", child.move, child.score, child.active)
+        logger.debug("%s", self.print_best_move_path())
 
     def print_best_move_path(self) -> List[Move]:
         """
@@ -262,33 +447,210 @@ class MinimaxTree():
         (useful for debugging when the AI makes seemingly bad decisions)
         :return: List[move]
         """
-        if not self.children:
-            return [("end", self.score)]
-        if self.maximize:
-            best_score = -99999999
-            best_move = None
-            best_child = None
-            # iterate over the children (current possible moves to make) and return the move with the highest score
-            for child in self.children:
-                if child.score > best_score and child.active:
-                    best_score = child.score
-                    best_move = child.move
-                    best_child = child
-
-        else:
-            best_score = 99999999
-            best_move = None
-            best_child = None
-            # iterate over the children (current possible moves to make) and return the move with the lowest score
-            for child in self.children:
-                if child.score < best_score and child.active:
-                    best_score = child.score
-                    best_move = child.move
-                    best_child = child
-        if best_child != None:
-            return [str(best_move)] + best_child.print_best_move_path()
+        pool = self.pool
+        path = []
+        index = self.index
+        while pool.child_count[index]:
+            child = best_child(pool, index, ACTIVE)
+            if child is None:
+                return path + ["error: reached inactive node"]
+            path.append(str(pool.get_move(child)))
+            index = child
+        return path + [("end", pool.score[index])]
+
+
+def update_score(pool: NodePool, index: int) -> None:
+    """
+    The recursion of MinimaxTree.update_score.
+    """
+    count = pool.child_count[index]
+    if not count:
+        # recursion base: do nothing (using the score that was decided when the node was made)
+        return
+    # recursively update the scores of the current's node's children using this function
+    first = pool.first_child[index]
+    for child in range(first, first + count):
+        update_score(pool, child)
+    # update the current node's score by replacing it with the maximum or minimum of the children's scores
+    set_best_child(pool, index)
+
+
+def set_best_child(pool: NodePool, index: int) -> bool:
+    """
+    Finds the best child of a node with children, and gives the node its score.
+
+    :return: bool, True if the score of the node changed.
+    """
+    scores = pool.score
+    first = pool.first_child[index]
+    best = first
+    if pool.flags[index] & MAXIMIZE:
+        for child in range(first + 1, first + pool.child_count[index]):
+            if scores[child] > scores[best]:
+                best = child
+    else:
+        for child in range(first + 1, first + pool.child_count[index]):
+            if scores[child] < scores[best]:
+                best = child
+    pool.best[index] = best
+    if scores[index] == scores[best]:
+        return False
+    scores[index] = scores[best]
+    return True
+
+
+def backup(pool: NodePool, index: int) -> None:
+    """
+    The score of a node changed: updates the best child and score of its ancestors, as far as they change.
+    A child that was not the best only matters if it is now better than the best; only when the best child itself
+    got worse all children have to be compared again.
+    """
+    scores = pool.score
+    flags = pool.flags
+    while True:
+        parent = pool.parent[index]
+        if parent < 0:
+            return
+        best = pool.best[parent]
+        maximize = flags[parent] & MAXIMIZE
+        score = scores[index]
+        if index == best:
+            if (score < scores[parent]) if maximize else (score > scores[parent]):
+                # the best child got worse, another child may be the best now
+                if not set_best_child(pool, parent):
+                    return
+            elif score == scores[parent]:
+                return
+            else:
+                scores[parent] = score
+        elif (score > scores[best]) if maximize else (score < scores[best]):
+            pool.best[parent] = index
+            scores[parent] = score
         else:
-            return ["error: reached inactive node"]
+            return
+        index = parent
+
+
+def prune(pool: NodePool, index: int, a, b, prune_min_dif) -> float:
+    """
+    The recursion of MinimaxTree.prune.
+    """
+    count = pool.child_count[index]
+    if count == 0:
+        return pool.score[index]
+    first = pool.first_child[index]
+    if pool.flags[index] & MAXIMIZE:
+        maxEva = -9999
+        for child in range(first, first + count):
+            if a < b:
+                eva = prune(pool, child, a, b, 1)
+                maxEva = max(maxEva, eva)
+                a = max(a, eva)
+            elif a + prune_min_dif < b: #if needs to be pruned
+                pool.flags[child] &= ~ACTIVE
+        return maxEva
+    else:
+        minEva = 9999
+        for child in range(first, first + count):
+            if a < b:
+                eva = prune(pool, child, a, b, 1)
+                minEva = min(minEva, eva)
+                b = min(b, eva)
+            elif a + prune_min_dif < b: #if needs to be pruned
+                pool.flags[child] &= ~ACTIVE
+        return minEva
+
+
+def principal_variation_search(pool: NodePool, index: int, a, b, cut: list) -> float:
+    """
+    The recursion of MinimaxTree.principal_variation_search.
+    """
+    first = pool.first_child[index]
+    flags = pool.flags
+    children = [child for child in range(first, first + pool.child_count[index]) if flags[child] & ACTIVE]
+    if not children:
+        return pool.score[index]
+    maximize = flags[index] & MAXIMIZE
+    # search the principal variation of the previous iteration first
+    children.sort(key=pool.score.__getitem__, reverse=bool(maximize))
+    stats = MinimaxTree.stats
+
+    if maximize:
+        best = -9999
+        for position, child in enumerate(children):
+            if position == 0:
+                eva = principal_variation_search(pool, child, a, b, cut)
+            else:
+                mark = len(cut)
+                eva = principal_variation_search(pool, child, a, a + NULL_WINDOW, cut)
+                if a < eva < b:
+                    # the null window failed high: the child may be better, so search it properly
+                    del cut[mark:]
+                    if stats is not None:
+                        stats.researches += 1
+                    eva = principal_variation_search(pool, child, eva, b, cut)
+            best = max(best, eva)
+            a = max(a, eva)
+            if a >= b:
+                cut.extend(children[position + 1:])
+                break
+    else:
+        best = 9999
+        for position, child in enumerate(children):
+            if position == 0:
+                eva = principal_variation_search(pool, child, a, b, cut)
+            else:
+                mark = len(cut)
+                eva = principal_variation_search(pool, child, b - NULL_WINDOW, b, cut)
+                if a < eva < b:
+                    # the null window failed low: the child may be better for the opponent
+                    del cut[mark:]
+                    if stats is not None:
+                        stats.researches += 1
+                    eva = principal_variation_search(pool, child, a, eva, cut)
+            best = min(best, eva)
+            b = min(b, eva)
+            if a >= b:
+                cut.extend(children[position + 1:])
+                break
+    return best
+
+
+def best_child(pool: NodePool, index: int, mask: int):
+    """
+    :param mask: type int. Only children whose flags masked with this equal ACTIVE are considered, so ACTIVE for
+    the active children, and ACTIVE | EXHAUSTED for the active children that can still be expanded.
+    :return: int, the index of the child with the best score for the player to move in the node, or None.
+    """
+    flags = pool.flags
+    # the stored best child is the best of all children, so also of the ones that pass the mask
+    best = pool.best[index]
+    if best >= 0 and flags[best] & mask == ACTIVE:
+        return best
+    scores = pool.score
+    first = pool.first_child[index]
+    maximize = flags[index] & MAXIMIZE
+    best = None
+    for child in range(first, first + pool.child_count[index]):
+        if flags[child] & mask == ACTIVE:
+            if best is None or (scores[child] > scores[best] if maximize else scores[child] < scores[best]):
+                best = child
+    return best
+
+
+def active_leaves(pool: NodePool, index: int) -> List[int]:
+    """
+    :return: type list. The leaves below a node that the next call of smart_add_layer would expand.
+    """
+    count = pool.child_count[index]
+    if not count:
+        return [index]
+    leaves = []
+    first = pool.first_child[index]
+    for child in range(first, first + count):
+        if pool.flags[child] & ACTIVE:
+            leaves.extend(active_leaves(pool, child))
+    return leaves
 
 
 # pruning:
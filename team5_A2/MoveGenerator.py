@@ -0,0 +1,60 @@
+"""
+Ordered move generation for the search tree.
+
+The moves of a node are the moves of the root that have not been played on the path to the node. All nodes of a
+tree share the tuple of root moves; the moves that were played are a bit mask over the positions in that tuple, so
+the moves of a child are those of its parent with one more bit set, and nothing is copied or removed.
+
+ordered_moves lists the moves in the order in which they are most likely to be good: first the moves that complete
+a region (they score points), then by parity value, the number of regions of the square that are left with an even
+number of empty squares (score_move rewards even and penalises odd counts). Every child of a node is scored when
+the node is expanded, so the order does not save work at the node itself; it makes the first children the best
+ones, which is where the pruning of the next layer finds its cutoffs. The classification is one pass over the moves
+with the region counts of the node, without sorting.
+"""
+
+from typing import List, Tuple
+
+from competitive_sudoku.sudoku import Move, SudokuBoard
+from .Geometry import geometry
+
+
+def region_empty_counts(board: SudokuBoard) -> list:
+    """
+    :return: type list. The number of empty squares of every region, numbered as in Geometry.py.
+    """
+    squares = board.squares
+    empty = SudokuBoard.empty
+    return [sum(1 for k in region if squares[k] == empty) for region in geometry(board.m, board.n).region_squares]
+
+
+def ordered_moves(board: SudokuBoard, moves: Tuple[Move, ...], played: int = 0, counts: List[int] = None) \
+        -> List[Move]:
+    """
+    Lists the moves that have not been played, scoring moves first and then by decreasing parity value. Moves in the
+    same class keep their order in moves.
+
+    :param board: type SudokuBoard. The board of the node.
+    :param moves: type tuple. The moves of the root.
+    :param played: type int. Bit p is set if moves[p] has been played on the path to the node.
+    :param counts: type list. The number of empty squares of every region of board, e.g. ThreatIndex.empty_counts().
+    They are counted if not given.
+    """
+    tables = geometry(board.m, board.n)
+    N = board.N
+    if counts is None:
+        counts = region_empty_counts(board)
+    square_regions = tables.square_regions
+    scoring = []
+    # the moves that do not score, by parity value 3, 2, 1 and 0
+    deferred = [[], [], [], []]
+    for position, move in enumerate(moves):
+        if played >> position & 1:
+            continue
+        regions = square_regions[move.i * N + move.j]
+        left = [counts[region] - 1 for region in regions]
+        if 0 in left:
+            scoring.append(move)
+        else:
+            deferred[3 - sum(1 for count in left if count % 2 == 0)].append(move)
+    return scoring + deferred[0] + deferred[1] + deferred[2] + deferred[3]
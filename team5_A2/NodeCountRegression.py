@@ -0,0 +1,258 @@
+"""
+Node-count regression harness for the team5 search.
+
+Wall-clock timings vary with the load of the machine, node counts do not. This harness keeps a corpus of positions,
+searches each of them to a fixed depth and records the number of nodes, the best move and its score. A later run is
+compared with the stored results, and every change in the best move or the score is flagged.
+
+Run from the root folder of the archive:
+
+  python -m team5_A2.NodeCountRegression add-board boards/random-2x3.txt        (add a start position)
+  python -m team5_A2.NodeCountRegression add-game game.log                      (add the positions of a game)
+  python -m team5_A2.NodeCountRegression add-record games.sdkr                  (add the positions of recorded games)
+  python -m team5_A2.NodeCountRegression run                                    (compare with the stored results)
+  python -m team5_A2.NodeCountRegression run --save                             (store the results)
+
+A game log is the output of simulate_game.py, a game record file is written by simulate_game.py --record.
+
+The search to a fixed depth has no time limit, so the stored node counts, best moves and scores (in
+regression/node_counts.json) are the same on every machine, and they are part of the archive. They are compared
+exactly, there is no tolerance: a best move or score that changes is flagged, and a changed node count is shown next
+to the stored one. A change that is meant to alter the search (move order, pruning, evaluation) changes them; check
+the flagged positions, then store the new results with "run --save" and commit node_counts.json with the change.
+"""
+
+import argparse
+import json
+import multiprocessing
+import re
+from pathlib import Path
+from typing import List
+
+from competitive_sudoku.gamerecord import read_game_records
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, TabooMove, load_sudoku, load_sudoku_from_text
+from .MinimaxTree import MinimaxTree
+from .SearchStats import SearchStats
+
+REGRESSION_DIR = Path(__file__).resolve().parent / 'regression'
+CORPUS_FILE = REGRESSION_DIR / 'positions.json'
+RESULTS_FILE = REGRESSION_DIR / 'node_counts.json'
+
+
+def parse_rendered_board(lines: List[str]) -> SudokuBoard:
+    """
+    Parses a board that was rendered by print_board.
+
+    :param lines: type list. The lines of the rendering, starting with the line of column numbers.
+    :return: type SudokuBoard. The board.
+    """
+    rows = []
+    m = None
+    n = None
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('╠') and m is None:
+            m = len(rows)
+        elif re.match(r'\d+ ║', stripped):
+            # the regions are separated by ║ and the squares within a region by │
+            if n is None:
+                n = stripped.split('║')[1].count('│') + 1
+            cells = re.split('[║│]', stripped)[1:-1]
+            rows.append([int(cell) if cell.strip() != '-' else SudokuBoard.empty for cell in cells])
+        if stripped.startswith('╚'):
+            break
+    if m is None:
+        m = len(rows)
+    board = SudokuBoard(m, n)
+    board.squares = [value for row in rows for value in row]
+    return board
+
+
+def positions_from_game_log(text: str, name: str) -> List[dict]:
+    """
+    Extracts the position before every move from the output of simulate_game.py.
+
+    :param text: type str. The output of simulate_game.py.
+    :param name: type str. Used to name the positions.
+    :return: type list. The positions, in the corpus format.
+    """
+    lines = text.splitlines()
+    start = lines.index('Initial state') + 1
+    initial_board = parse_rendered_board(lines[start:])
+    board = SudokuBoard(initial_board.m, initial_board.n)
+    board.squares = initial_board.squares.copy()
+    moves = []
+    scores = [0, 0]
+    positions = []
+    move = None
+    taboo = False
+    for line in lines[start:]:
+        match = re.match(r'Best move: \((\d+),(\d+)\) -> (\d+)', line)
+        if match:
+            move = tuple(int(x) for x in match.groups())
+            taboo = False
+            positions.append(position_record(f'{name}#{len(moves)}', initial_board, board, moves, scores))
+        elif line.startswith('The sudoku has no solution after the move'):
+            taboo = True
+        elif line.startswith('Reward:') and move is not None:
+            player = len(moves) % 2
+            scores[player] += int(line.split()[1])
+            if not taboo:
+                board.put(*move)
+            moves.append(list(move) + [taboo])
+            move = None
+    return positions
+
+
+def positions_from_game_records(filename: str, name: str) -> List[dict]:
+    """
+    Extracts the position before every move from a game record file.
+
+    :param filename: type str. A file written by GameRecordWriter.
+    :param name: type str. Used to name the positions.
+    :return: type list. The positions, in the corpus format.
+    """
+    positions = []
+    for game_number, game in enumerate(read_game_records(filename)):
+        for game_state, _ in game.game_states():
+            moves = [[move.i, move.j, move.value, isinstance(move, TabooMove)] for move in game_state.moves]
+            positions.append(position_record(f'{name}.{game_number}#{len(moves)}', game.initial_board,
+                                             game_state.board, moves, game_state.scores))
+    return positions
+
+
+def position_record(name: str, initial_board: SudokuBoard, board: SudokuBoard, moves: list, scores: list) -> dict:
+    """
+    :return: type dict. A position in the corpus format. Moves are [i, j, value, taboo] lists.
+    """
+    return {'name': name, 'initial_board': str(initial_board), 'board': str(board),
+            'moves': [list(move) for move in moves], 'scores': list(scores)}
+
+
+def game_state_from_record(record: dict) -> GameState:
+    """
+    :param record: type dict. A position in the corpus format.
+    :return: type GameState. The corresponding game state.
+    """
+    moves = [TabooMove(i, j, value) if taboo else Move(i, j, value) for i, j, value, taboo in record['moves']]
+    taboo_moves = [move for move in moves if isinstance(move, TabooMove)]
+    return GameState(load_sudoku_from_text(record['initial_board']), load_sudoku_from_text(record['board']),
+                     taboo_moves, moves, list(record['scores']))
+
+
+def search_position(arguments) -> dict:
+    """
+    Searches one position to a fixed depth. Runs in a worker process.
+
+    :param arguments: type tuple. (record, depth)
+    :return: type dict. The node counts, best move and score.
+    """
+    from .sudokuai import iterative_deepening
+
+    record, depth = arguments
+    stats = SearchStats()
+    MinimaxTree.stats = stats
+    best_move, best_score = None, None
+    for _, best_move, best_score, _ in iterative_deepening(game_state_from_record(record), depth):
+        pass
+    MinimaxTree.stats = None
+    return {'depth': stats.depth, 'nodes_created': stats.nodes_created, 'nodes_expanded': stats.nodes_expanded,
+            'cutoffs': stats.cutoffs, 'duplicate_hits': stats.duplicate_hits,
+            'best_move': None if best_move is None else [best_move.i, best_move.j, best_move.value],
+            'score': best_score}
+
+
+def run(corpus: List[dict], depth: int, processes: int = None) -> dict:
+    """
+    Searches all positions of the corpus in parallel.
+
+    :return: type dict. Maps position names to their results.
+    """
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(search_position, [(record, depth) for record in corpus])
+    return {record['name']: result for record, result in zip(corpus, results)}
+
+
+def compare(results: dict, expected: dict) -> int:
+    """
+    Prints the node counts next to the expected ones and flags changes in the best move or the score.
+
+    :return: type int. The number of positions with a different best move or score.
+    """
+    changes = 0
+    total, expected_total = 0, 0
+    for name, result in results.items():
+        old = expected.get(name)
+        line = f'{name:<30}{result["nodes_created"]:>10}'
+        total += result['nodes_created']
+        if old is None:
+            line += '         -  new position'
+        else:
+            expected_total += old['nodes_created']
+            line += f'{old["nodes_created"]:>10}'
+            if old['best_move'] != result['best_move'] or old['score'] != result['score']:
+                line += f'  CHANGED: {old["best_move"]} {old["score"]} -> {result["best_move"]} {result["score"]}'
+                changes += 1
+        print(line)
+    print(f'{"total":<30}{total:>10}{expected_total:>10}')
+    return changes
+
+
+def load_corpus() -> List[dict]:
+    if CORPUS_FILE.exists():
+        return json.loads(CORPUS_FILE.read_text())
+    return []
+
+
+def save_corpus(corpus: List[dict]) -> None:
+    REGRESSION_DIR.mkdir(exist_ok=True)
+    CORPUS_FILE.write_text(json.dumps(corpus, indent=1) + '\n')
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Node-count regression harness for the team5 search.')
+    subparsers = cmdline_parser.add_subparsers(dest='command', required=True)
+    add_board = subparsers.add_parser('add-board', help='add start positions from board files')
+    add_board.add_argument('files', nargs='+')
+    add_game = subparsers.add_parser('add-game', help='add the positions of games logged by simulate_game.py')
+    add_game.add_argument('files', nargs='+')
+    add_record = subparsers.add_parser('add-record', help='add the positions of games in game record files')
+    add_record.add_argument('files', nargs='+')
+    run_parser = subparsers.add_parser('run', help='search the corpus and compare with the stored results')
+    run_parser.add_argument('--depth', type=int, default=3, help='the number of layers to search (default: 3)')
+    run_parser.add_argument('--processes', type=int, default=None, help='the number of worker processes (default: all cores)')
+    run_parser.add_argument('--save', action='store_true', help='store the results as the expected ones')
+    args = cmdline_parser.parse_args()
+
+    if args.command in ('add-board', 'add-game', 'add-record'):
+        corpus = load_corpus()
+        names = {record['name'] for record in corpus}
+        for filename in args.files:
+            if args.command == 'add-board':
+                board = load_sudoku(filename)
+                records = [position_record(Path(filename).name, board, board, [], [0, 0])]
+            elif args.command == 'add-game':
+                records = positions_from_game_log(Path(filename).read_text(), Path(filename).stem)
+            else:
+                records = positions_from_game_records(filename, Path(filename).stem)
+            corpus += [record for record in records if record['name'] not in names]
+        save_corpus(corpus)
+        print(f'The corpus contains {len(corpus)} positions')
+        return
+
+    results = run(load_corpus(), args.depth, args.processes)
+    expected = {}
+    if RESULTS_FILE.exists():
+        stored = json.loads(RESULTS_FILE.read_text())
+        if stored['depth'] == args.depth:
+            expected = stored['results']
+    changes = compare(results, expected)
+    print(f'{changes} positions with a different best move or score')
+    if args.save:
+        REGRESSION_DIR.mkdir(exist_ok=True)
+        RESULTS_FILE.write_text(json.dumps({'depth': args.depth, 'results': results}, indent=1) + '\n')
+        print(f'Saved the results to {RESULTS_FILE}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Compact storage for the nodes of a MinimaxTree.
+
+Every node is a row in a set of arrays (struct of arrays) instead of an object with its own GameState and move
+list. A node stores its parent, the index range of its children, its best child, its move, its score, the points of both
+players and some flags; about 40 bytes per node. The children of a node are created together, so they are a contiguous
+range. The board and the moves that are still left in a node are rebuilt from the moves on the path from the root.
+"""
+
+from array import array
+from typing import List
+
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, TabooMove
+from .EvalCache import board_hash, zobrist_keys
+from .MoveGenerator import ordered_moves
+from .Symmetry import BoardCounts, canonical_key, uses_symmetry
+
+# Flags of a node
+ACTIVE = 1     # False if the node is pruned. No new levels will be added to it
+MAXIMIZE = 2   # the player of the AI is to move, so the score is maximized
+TABOO = 4      # the move of the node is expected to be declared taboo, so it does not change the board
+EXHAUSTED = 8  # no children can be added below the node anymore, used by the best-first search
+
+# The move id of the root, which has no move
+NO_MOVE = -1
+
+
+class NodePool(object):
+    """
+    The nodes of one search tree. Node 0 is the root.
+    """
+
+    def __init__(self, game_state: GameState, player_nr: int, moves: List[Move], node_budget: int = None):
+        """
+        :param game_state: type GameState. The position of the root. It is not changed.
+        :param player_nr: type int. The player of the AI, the root maximizes for this player.
+        :param moves: type list. The moves that are considered in the root, the children of a node get the moves
+        of their parent except their own move. They are kept in a tuple that all nodes share, see played_mask.
+        :param node_budget: type int. The maximum number of nodes, see MinimaxTree.enforce_budget. None for no limit.
+        """
+        self.game_state = game_state
+        self.player_nr = player_nr
+        self.N = game_state.board.N
+        self.moves = tuple(moves)
+        # the position of each root move in self.moves, by move id
+        self.move_position = {self.move_id(move): position for position, move in enumerate(self.moves)}
+        self.node_budget = node_budget
+        self.zobrist_keys = zobrist_keys(game_state.board.m, game_state.board.n)
+        self.root_hash = board_hash(game_state.board)
+        self.root_filled = self.N * self.N - game_state.board.squares.count(SudokuBoard.empty)
+        # the symmetry-canonical keys of the sparse boards in the tree, by Zobrist hash
+        self.canonical_keys = {}
+        self.parent = array('i')
+        self.first_child = array('i')
+        self.child_count = array('i')
+        self.best = array('i')          # the child with the best score for the player to move, -1 for a leaf
+        self.move = array('i')
+        self.score = array('d')
+        self.points1 = array('i')
+        self.points2 = array('i')
+        self.flags = array('B')
+        self.add(-1, NO_MOVE, 0, game_state.scores, ACTIVE | MAXIMIZE)
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def add(self, parent: int, move: int, score: float, points: List[int], flags: int) -> int:
+        """
+        Adds a node without children.
+
+        :return: type int. The index of the node.
+        """
+        self.parent.append(parent)
+        self.first_child.append(0)
+        self.child_count.append(0)
+        self.best.append(-1)
+        self.move.append(move)
+        self.score.append(score)
+        self.points1.append(points[0])
+        self.points2.append(points[1])
+        self.flags.append(flags)
+        return len(self.parent) - 1
+
+    def move_id(self, move: Move) -> int:
+        """
+        :return: type int. The move as a number: (i * N + j) * N + value - 1.
+        """
+        return (move.i * self.N + move.j) * self.N + move.value - 1
+
+    def get_move(self, index: int) -> Move:
+        """
+        :return: type Move. The move of a node, or TabooMove if it is expected to be taboo. Move(0, 0, 0) for the root.
+        """
+        move = self.move[index]
+        if move == NO_MOVE:
+            return Move(0, 0, 0)
+        square, value = divmod(move, self.N)
+        i, j = divmod(square, self.N)
+        if self.flags[index] & TABOO:
+            return TabooMove(i, j, value + 1)
+        return Move(i, j, value + 1)
+
+    def path(self, index: int) -> List[int]:
+        """
+        :return: type list. The nodes from the child of the root down to the given node.
+        """
+        path = []
+        while index > 0:
+            path.append(index)
+            index = self.parent[index]
+        path.reverse()
+        return path
+
+    def board(self, index: int) -> SudokuBoard:
+        """
+        Rebuilds the board of a node.
+        """
+        root_board = self.game_state.board
+        board = SudokuBoard(root_board.m, root_board.n)
+        board.squares = root_board.squares.copy()
+        N = self.N
+        for node in self.path(index):
+            if not self.flags[node] & TABOO:
+                square, value = divmod(self.move[node], N)
+                board.squares[square] = value + 1
+        return board
+
+    def get_game_state(self, index: int) -> GameState:
+        """
+        Rebuilds the game state of a node, with the taboo moves and moves of the path added.
+        """
+        root = self.game_state
+        taboo_moves = root.taboo_moves.copy()
+        moves = root.moves.copy()
+        for node in self.path(index):
+            move = self.get_move(node)
+            if isinstance(move, TabooMove):
+                taboo_moves.append(move)
+            moves.append(move)
+        return GameState(root.initial_board, self.board(index), taboo_moves, moves,
+                         [self.points1[index], self.points2[index]])
+
+    def position_hash(self, index: int) -> int:
+        """
+        :return: type int. The Zobrist hash of the board of a node, from the hash of the root and the moves on the path.
+        """
+        h = self.root_hash
+        for node in self.path(index):
+            if not self.flags[node] & TABOO:
+                # the move id is also the index of its Zobrist number
+                h ^= self.zobrist_keys[self.move[node]]
+        return h
+
+    def filled(self, index: int) -> int:
+        """
+        :return: type int. The number of filled squares of the board of a node.
+        """
+        return self.root_filled + sum(1 for node in self.path(index) if not self.flags[node] & TABOO)
+
+    def played_mask(self, index: int) -> int:
+        """
+        :return: type int. The root moves that have been played on the path to the node, as a bit mask over the
+        positions in self.moves. Taboo moves count as played, they can not be played again. The passes that the
+        search adds (see MinimaxTree.smart_add_layer_here) are not moves of the root and are skipped.
+        """
+        mask = 0
+        for node in self.path(index):
+            position = self.move_position.get(self.move[node])
+            if position is not None:
+                mask |= 1 << position
+        return mask
+
+    def remaining_moves(self, index: int) -> List[Move]:
+        """
+        :return: type list. The moves of the root that have not been played on the path to the node.
+        """
+        played = self.played_mask(index)
+        if not played:
+            return list(self.moves)
+        return [move for position, move in enumerate(self.moves) if not played >> position & 1]
+
+    def ordered_moves(self, index: int, board: SudokuBoard, counts: List[int] = None) -> List[Move]:
+        """
+        :param board: type SudokuBoard. The board of the node, see MoveGenerator.ordered_moves.
+        :param counts: type list. The number of empty squares of every region of board, if they are known.
+        :return: type list. The moves of the root that have not been played on the path to the node, the most
+        promising first.
+        """
+        return ordered_moves(board, self.moves, self.played_mask(index), counts)
+
+    def key(self, index: int):
+        """
+        :return: type bytes or int. The key of the board of a node for the duplicate detection: the symmetry-canonical
+        key (see Symmetry.canonical_key) if the board is sparse, otherwise its Zobrist hash.
+        """
+        h = self.position_hash(index)
+        if uses_symmetry(self.N, self.filled(index)):
+            return self.canonical_key(h, self.board(index))
+        return h
+
+    def canonical_key(self, position_hash: int, board: SudokuBoard, counts: BoardCounts = None) -> bytes:
+        """
+        :return: type bytes. The symmetry-canonical key of a board in the tree. It is computed once per board, later
+        calls look it up by the Zobrist hash of the board.
+        """
+        key = self.canonical_keys.get(position_hash)
+        if key is None:
+            key = self.canonical_keys[position_hash] = canonical_key(board, counts)
+        return key
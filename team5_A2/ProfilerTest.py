@@ -8,7 +8,7 @@ import copy
 #fun the gamestate on the ai
 
 
-board_text = Path("../boards/hard-3x3.txt").read_text()
+board_text = (Path(__file__).resolve().parent.parent / "boards" / "hard-3x3.txt").read_text()
 board = load_sudoku_from_text(board_text)
 
 
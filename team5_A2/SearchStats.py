@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+import time
+
+# Environment variable that turns the statistics on. Its value is the file the JSON lines are appended to,
+# or '-' for standard output.
+STATS_VARIABLE = 'TEAM5_SEARCH_STATS'
+
+
+class SearchStats():
+    """
+    Counters that are filled during the search for one move, and emitted once per move as a JSON line.
+    The search only touches them through `if stats is not None` checks, so when statistics are disabled
+    (MinimaxTree.stats is None) they cost nothing.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.nodes_expanded = 0       # nodes that got a new layer of children
+        self.nodes_created = 0        # children that were added to the tree
+        self.depth = 0                # number of completed layers
+        self.cutoffs = 0              # children deactivated by alpha-beta (principal variation) search
+        self.researches = 0           # aspiration window and null window searches that had to be repeated
+        self.duplicate_hits = 0       # children skipped because their board was already in board_states
+        self.evicted = 0              # leaves deactivated to stay within the node budget
+        self.find_moves_time = 0.0    # seconds spent in find_actual_moves
+        self.score_move_time = 0.0    # seconds spent in score_move
+        self.tree_update_time = 0.0   # seconds spent building and updating the tree, excluding score_move
+
+    def as_dict(self, **extra) -> dict:
+        """
+        :param extra: Additional fields for the record, such as the move number.
+        :return: type dict. The statistics, with derived values like nodes per second.
+        """
+        elapsed = time.perf_counter() - self.start
+        record = dict(extra)
+        record.update({
+            'nodes_expanded': self.nodes_expanded,
+            'nodes_created': self.nodes_created,
+            'nodes_per_second': round(self.nodes_created / elapsed) if elapsed > 0 else 0,
+            'depth': self.depth,
+            'cutoffs': self.cutoffs,
+            'researches': self.researches,
+            'duplicate_hits': self.duplicate_hits,
+            'evicted': self.evicted,
+            'time': {
+                'find_actual_moves': round(self.find_moves_time, 6),
+                'score_move': round(self.score_move_time, 6),
+                'tree_update': round(self.tree_update_time, 6),
+                'total': round(elapsed, 6),
+            },
+        })
+        return record
+
+    def emit(self, destination: str = None, **extra) -> None:
+        """
+        Writes the statistics as a single JSON line.
+
+        :param destination: type str. A file name to append to, or '-' for standard output.
+        If None, the value of the TEAM5_SEARCH_STATS environment variable is used.
+        :param extra: Additional fields for the record.
+        """
+        if destination is None:
+            destination = os.environ.get(STATS_VARIABLE, '-')
+        line = json.dumps(self.as_dict(**extra)) + '\n'
+        if destination == '-':
+            sys.stdout.write(line)
+            sys.stdout.flush()
+        else:
+            with open(destination, 'a') as f:
+                f.write(line)
+
+
+def stats_from_environment():
+    """
+    :return: type SearchStats. A new SearchStats if the TEAM5_SEARCH_STATS environment variable is set, otherwise None.
+    """
+    if os.environ.get(STATS_VARIABLE):
+        return SearchStats()
+    return None
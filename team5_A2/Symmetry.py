@@ -0,0 +1,151 @@
+"""
+Symmetry-canonical keys for sudoku boards, for the duplicate detection in MinimaxTree.
+
+The following changes of a board do not change the score of any move: relabelling the values, permuting the bands
+(the groups of m rows that share regions), permuting the stacks (the groups of n columns that share regions),
+swapping rows within a band, swapping columns within a stack, and transposing when m == n. Boards that are equal
+up to these changes get the same key here in most cases, so they are searched only once.
+
+Finding the true canonical form would mean trying all permutations. Instead, the rows and columns are ordered by
+invariants that do not depend on the values: the number of filled squares, and then the occupancy pattern of the
+row or column. Only ties that these invariants can not break are broken by the original order, which costs some
+hits but never gives a wrong one: the key is always the squares of an equivalent board.
+The fill counts are the part of the invariants that can be kept up to date per move, see BoardCounts.
+
+Computing the key costs a few hundred microseconds, a thousand times more than the Zobrist hash of EvalCache.py,
+and it only pays off on sparse boards: there many different boards are equal up to symmetry, while on fuller boards
+nearly all duplicates are the same board reached by moves in another order, which the Zobrist hash finds as well.
+So the search only uses the key for boards with few filled squares, see uses_symmetry.
+"""
+
+from typing import List
+
+from competitive_sudoku.sudoku import SudokuBoard
+
+# The largest fraction of filled squares for which duplicates are found up to symmetry
+SYMMETRY_MAX_FILL = 0.2
+
+
+def uses_symmetry(N: int, filled: int) -> bool:
+    """
+    :param N: type int. The number of rows (and columns) of the board.
+    :param filled: type int. The number of filled squares of the board.
+    :return: type bool. True if duplicates of the board are found with canonical_key, False if the Zobrist hash
+    is used.
+    """
+    return filled <= SYMMETRY_MAX_FILL * N * N
+
+
+class BoardCounts(object):
+    """
+    The number of filled squares of every row and column of a board.
+    """
+
+    __slots__ = ('rows', 'columns')
+
+    def __init__(self, rows: List[int], columns: List[int]):
+        self.rows = rows
+        self.columns = columns
+
+    @staticmethod
+    def of_board(board: SudokuBoard) -> 'BoardCounts':
+        """
+        Counts the filled squares of a board.
+
+        :param board: type SudokuBoard.
+        :return: type BoardCounts.
+        """
+        N = board.N
+        rows = [0] * N
+        columns = [0] * N
+        for k, value in enumerate(board.squares):
+            if value != SudokuBoard.empty:
+                rows[k // N] += 1
+                columns[k % N] += 1
+        return BoardCounts(rows, columns)
+
+    def after_move(self, i: int, j: int) -> 'BoardCounts':
+        """
+        :param i: type int. Row index of a move on an empty square.
+        :param j: type int. Column index of the move.
+        :return: type BoardCounts. The counts after the move, this object is not changed.
+        """
+        rows = self.rows.copy()
+        columns = self.columns.copy()
+        rows[i] += 1
+        columns[j] += 1
+        return BoardCounts(rows, columns)
+
+
+def order_lines(keys: list, size: int, count: int) -> List[int]:
+    """
+    Orders the lines (rows or columns) of a board by decreasing key, within each group and then the groups.
+
+    :param keys: type list. A key for each line.
+    :param size: type int. The number of lines in a group (a band or a stack).
+    :param count: type int. The number of groups.
+    :return: type list. The line indices in the new order.
+    """
+    groups = []
+    for group in range(count):
+        lines = sorted(range(group * size, (group + 1) * size), key=keys.__getitem__, reverse=True)
+        groups.append(lines)
+    groups.sort(key=lambda lines: [keys[line] for line in lines], reverse=True)
+    return [line for lines in groups for line in lines]
+
+
+def oriented_key(squares: list, m: int, n: int, rows: List[int], columns: List[int]) -> bytes:
+    """
+    The key of a board without transposition.
+
+    :param squares: type list. The squares of the board.
+    :param rows: type list. The fill count of each row.
+    :param columns: type list. The fill count of each column.
+    :return: type bytes. The relabelled squares of the reordered board.
+    """
+    N = m * n
+    empty = SudokuBoard.empty
+    # bands have m rows, and there are n of them; stacks have n columns, and there are m of them
+    row_order = order_lines(rows, m, n)
+    column_order = order_lines(columns, n, m)
+
+    # break ties between lines with the same count by their occupancy pattern
+    row_keys = [(rows[i], [squares[i * N + j] != empty for j in column_order]) for i in range(N)]
+    row_order = order_lines(row_keys, m, n)
+    column_keys = [(columns[j], [squares[i * N + j] != empty for i in row_order]) for j in range(N)]
+    column_order = order_lines(column_keys, n, m)
+
+    # relabel the values in the order in which they are first seen
+    labels = {empty: empty}
+    result = bytearray(N * N)
+    k = 0
+    for i in row_order:
+        offset = i * N
+        for j in column_order:
+            value = squares[offset + j]
+            label = labels.get(value)
+            if label is None:
+                label = labels[value] = len(labels)
+            result[k] = label
+            k += 1
+    return bytes(result)
+
+
+def canonical_key(board: SudokuBoard, counts: BoardCounts = None) -> bytes:
+    """
+    Computes a key that is the same for most boards that are equal up to symmetry, and that is never the same
+    for boards that are not.
+
+    :param board: type SudokuBoard.
+    :param counts: type BoardCounts. The fill counts of the board, they are computed if not given.
+    :return: type bytes.
+    """
+    if counts is None:
+        counts = BoardCounts.of_board(board)
+    m, n, N = board.m, board.n, board.N
+    squares = board.squares
+    key = oriented_key(squares, m, n, counts.rows, counts.columns)
+    if m == n:
+        transposed = [squares[j * N + i] for i in range(N) for j in range(N)]
+        key = min(key, oriented_key(transposed, m, n, counts.columns, counts.rows))
+    return key
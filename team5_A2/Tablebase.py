@@ -0,0 +1,419 @@
+"""
+Endgame tablebase: exact game values and best moves, computed offline and probed by SudokuAI.
+
+The value of a position is the difference between the points that the player to move and the opponent can still
+get, when both play perfectly. A move that would make the sudoku unsolvable is declared taboo and acts as a pass,
+so the taboo moves that could still be played are part of the position. The values are computed with a memoised
+negamax search over every reachable position; a board is solvable if it agrees with one of the solutions of the
+start position, which are enumerated once.
+
+The number of positions grows about fivefold with every extra empty square (some 50000 positions for 14 empty
+squares), so enumerating every position of an empty board is not feasible, not even for 2x2 boards. The table is
+built from start positions with few empty squares (e.g. boards/easy-2x2.txt) and from the late endgames of recorded
+games. Once few squares remain, SudokuAI solves the position directly with EndgameSolver, which takes a fraction
+of a second for up to ten empty squares.
+
+The table file starts with the bytes b'SDKT', a version byte and the number of slots. Each slot is an 8 byte hash
+of a position, the value (2 bytes) and the best move (square index and value, 2 bytes each); the slots form an open
+addressing hash table, so a probe reads one or a few slots of the memory mapped file. The position key includes the
+region size, so a 2x3 and a 3x2 board with the same squares are different positions.
+
+The table file (team5_A2/tablebase.sdkt) is not part of the archive, it only covers the positions it was built from.
+Without it SudokuAI only solves the endgame with EndgameSolver. Build it from the root folder of the archive:
+
+  python -m team5_A2.Tablebase build boards/easy-2x2.txt               (solve start positions)
+  python -m team5_A2.Tablebase build games.sdkr --max-empty 12          (solve the endgames of recorded games)
+"""
+
+import argparse
+import hashlib
+import logging
+import mmap
+import struct
+import sys
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from competitive_sudoku.gamerecord import MAGIC as RECORD_MAGIC, read_game_records
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, load_sudoku
+from .Geometry import geometry
+from .TimeManager import TimeManager
+
+logger = logging.getLogger(__name__)
+
+TABLEBASE_FILE = Path(__file__).resolve().parent / 'tablebase.sdkt'
+MAGIC = b'SDKT'
+VERSION = 2
+HEADER = struct.Struct('<4sBQ')
+SLOT = struct.Struct('<QhHH')
+# a hash of 0 marks an empty slot
+EMPTY_SLOT = 0
+# the points for completing 0, 1, 2 or 3 regions with one move
+POINTS = [0, 1, 3, 7]
+
+
+def peers_of(m: int, n: int) -> List[FrozenSet[int]]:
+    """
+    :return: type list. For each square, the other squares in its row, column and block.
+    """
+    return geometry(m, n).peers
+
+
+def regions_of(m: int, n: int) -> List[List[Tuple[int, ...]]]:
+    """
+    :return: type list. For each square, the squares of its row, its column and its block.
+    """
+    tables = geometry(m, n)
+    return [[tables.region_squares[region] for region in regions] for regions in tables.square_regions]
+
+
+def enumerate_solutions(board: SudokuBoard, limit: int, time_manager: TimeManager = None) -> Optional[List[bytes]]:
+    """
+    Finds all solutions of a board by backtracking.
+
+    :param board: type SudokuBoard.
+    :param limit: type int. The maximum number of solutions.
+    :param time_manager: type TimeManager. If given, SearchTimeout is raised when its hard limit passes.
+    :return: type list. The squares of the solutions, or None if there are more than limit.
+    """
+    N = board.N
+    peers = peers_of(board.m, board.n)
+    squares = list(board.squares)
+    solutions = []
+
+    def search() -> bool:
+        if time_manager is not None:
+            time_manager.check()
+        # continue with the empty square with the fewest candidates
+        best, best_values = None, None
+        for k, value in enumerate(squares):
+            if value == SudokuBoard.empty:
+                used = {squares[p] for p in peers[k]}
+                values = [v for v in range(1, N + 1) if v not in used]
+                if best is None or len(values) < len(best_values):
+                    best, best_values = k, values
+        if best is None:
+            solutions.append(bytes(squares))
+            return len(solutions) <= limit
+        for value in best_values:
+            squares[best] = value
+            if not search():
+                return False
+        squares[best] = SudokuBoard.empty
+        return True
+
+    if not search():
+        return None
+    return solutions
+
+
+def position_key(m: int, n: int, squares, taboo_moves) -> bytes:
+    """
+    :param m: type int. The number of rows of a block.
+    :param n: type int. The number of columns of a block.
+    :param squares: type list. The squares of the board.
+    :param taboo_moves: type iterable. The taboo moves as square * N + value - 1 codes that can still matter,
+    i.e. their square is empty and their value does not conflict with the board.
+    :return: type bytes. A key that identifies the position.
+    """
+    return bytes((m, n)) + bytes(squares) + b'|' + struct.pack(f'<{len(taboo_moves)}H', *sorted(taboo_moves))
+
+
+def position_hash(key: bytes) -> int:
+    """
+    :return: type int. A non-zero 64 bit hash of a position key.
+    """
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') or 1
+
+
+def relevant_taboo_moves(board: SudokuBoard, taboo_moves) -> List[int]:
+    """
+    Selects the taboo moves that are part of the position: a taboo move on a filled square or with a value that
+    is already in the row, column or block of its square can not be played anyway.
+
+    :param board: type SudokuBoard.
+    :param taboo_moves: type list. TabooMove objects.
+    :return: type list. The codes square * N + value - 1 of the relevant taboo moves, without duplicates.
+    """
+    N = board.N
+    peers = peers_of(board.m, board.n)
+    codes = set()
+    for move in taboo_moves:
+        k = move.i * N + move.j
+        if board.squares[k] == SudokuBoard.empty and all(board.squares[p] != move.value for p in peers[k]):
+            codes.add(k * N + move.value - 1)
+    return sorted(codes)
+
+
+class EndgameSolver(object):
+    """
+    Computes exact values and best moves for all positions that can be reached from a start position.
+    """
+
+    def __init__(self, board: SudokuBoard, solutions: List[bytes], time_manager: TimeManager = None):
+        """
+        :param board: type SudokuBoard. The start position.
+        :param solutions: type list. All solutions of the start position, see enumerate_solutions.
+        :param time_manager: type TimeManager. If given, solve raises SearchTimeout when its hard limit passes.
+        """
+        self.m, self.n, self.N = board.m, board.n, board.N
+        self.board = board
+        self.time_manager = time_manager
+        self.peers = peers_of(board.m, board.n)
+        self.regions = regions_of(board.m, board.n)
+        N = self.N
+        # with_value[k * N + v - 1] is the bit mask of the solutions that have value v in square k
+        self.with_value = [0] * (N * N * N)
+        for index, solution in enumerate(solutions):
+            for k, value in enumerate(solution):
+                self.with_value[k * N + value - 1] |= 1 << index
+        self.all_solutions = (1 << len(solutions)) - 1
+        # maps position keys to (value, square, value of the best move)
+        self.table: Dict[bytes, Tuple[int, int, int]] = {}
+
+    def solve(self, squares: List[int] = None, taboo_moves: List[int] = ()) -> Tuple[int, int, int]:
+        """
+        :param squares: type list. A position that can be reached from the start position, the start position
+        if None.
+        :param taboo_moves: type list. The relevant taboo moves of the position, see relevant_taboo_moves.
+        :return: type tuple. (value, square, value) of the position and its best move.
+        """
+        if squares is None:
+            squares = list(self.board.squares)
+        squares = list(squares)
+        N = self.N
+        solutions = self.all_solutions
+        for k, value in enumerate(squares):
+            if value != SudokuBoard.empty:
+                solutions &= self.with_value[k * N + value - 1]
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, 10000))
+        try:
+            return self.negamax(squares, solutions, frozenset(taboo_moves))
+        finally:
+            sys.setrecursionlimit(limit)
+
+    def points(self, squares: List[int], k: int) -> int:
+        """
+        :return: type int. The points for filling square k, which has just been filled.
+        """
+        completed = 0
+        for region in self.regions[k]:
+            if all(squares[p] != SudokuBoard.empty for p in region):
+                completed += 1
+        return POINTS[completed]
+
+    def negamax(self, squares: List[int], solutions: int, taboo: frozenset) -> Tuple[int, int, int]:
+        key = position_key(self.m, self.n, squares, taboo)
+        result = self.table.get(key)
+        if result is not None:
+            return result
+        if self.time_manager is not None:
+            self.time_manager.check()
+        N = self.N
+        empty = SudokuBoard.empty
+        best = None
+        for k, square in enumerate(squares):
+            if square != empty:
+                continue
+            used = {squares[p] for p in self.peers[k]}
+            for value in range(1, N + 1):
+                code = k * N + value - 1
+                if value in used or code in taboo:
+                    continue
+                remaining = solutions & self.with_value[code]
+                if remaining:
+                    squares[k] = value
+                    points = self.points(squares, k)
+                    # taboo moves on this square or with this value next to it can no longer be played
+                    new_taboo = frozenset(t for t in taboo if t // N != k and
+                                          not (t % N == value - 1 and t // N in self.peers[k]))
+                    score = points - self.negamax(squares, remaining, new_taboo)[0]
+                    squares[k] = empty
+                else:
+                    # the move is declared taboo: no points, and the opponent moves on the same board
+                    score = -self.negamax(squares, solutions, taboo | {code})[0]
+                if best is None or score > best[0]:
+                    best = (score, k, value)
+        if best is None:
+            # the board is full
+            best = (0, 0, 0)
+        self.table[key] = best
+        return best
+
+
+def write_tablebase(filename, table: Dict[bytes, Tuple[int, int, int]]) -> int:
+    """
+    Writes positions to a table file, as a hash table with a load factor of at most one half.
+
+    :param filename: type str. The table file.
+    :param table: type dict. Maps position keys to (value, square, value of the best move).
+    :return: type int. The number of slots.
+    """
+    slots = 1
+    while slots < 2 * len(table):
+        slots *= 2
+    data = bytearray(HEADER.size + slots * SLOT.size)
+    HEADER.pack_into(data, 0, MAGIC, VERSION, slots)
+    for key, (value, square, move_value) in table.items():
+        h = position_hash(key)
+        slot = h & (slots - 1)
+        while SLOT.unpack_from(data, HEADER.size + slot * SLOT.size)[0] != EMPTY_SLOT:
+            slot = (slot + 1) & (slots - 1)
+        SLOT.pack_into(data, HEADER.size + slot * SLOT.size, h, value, square, move_value)
+    Path(filename).write_bytes(bytes(data))
+    return slots
+
+
+class Tablebase(object):
+    """
+    A memory mapped table file, written by write_tablebase.
+    """
+
+    def __init__(self, filename):
+        """
+        Raises RuntimeError if the file is not a table of the current version.
+        """
+        self.file = open(filename, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # an empty file can not be mapped
+            self.file.close()
+            raise RuntimeError(f'"{filename}" is not a tablebase file')
+        if len(self.data) < HEADER.size:
+            magic, version, self.slots = b'', 0, 0
+        else:
+            magic, version, self.slots = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            self.close()
+            raise RuntimeError(f'"{filename}" is not a tablebase file')
+        if version != VERSION:
+            self.close()
+            raise RuntimeError(f'"{filename}" is a version {version} tablebase, rebuild it for version {VERSION}')
+        if len(self.data) != HEADER.size + self.slots * SLOT.size:
+            self.close()
+            raise RuntimeError(f'"{filename}" is truncated, rebuild it')
+
+    def probe(self, board: SudokuBoard, taboo_moves) -> Optional[Tuple[int, Move]]:
+        """
+        Looks up a position.
+
+        :param board: type SudokuBoard. The current board.
+        :param taboo_moves: type list. The taboo moves of the game, as TabooMove objects.
+        :return: type tuple. (value, best move) for the player to move, or None if the position is not in the table.
+        """
+        h = position_hash(position_key(board.m, board.n, board.squares, relevant_taboo_moves(board, taboo_moves)))
+        slot = h & (self.slots - 1)
+        while True:
+            stored, value, square, move_value = SLOT.unpack_from(self.data, HEADER.size + slot * SLOT.size)
+            if stored == EMPTY_SLOT:
+                return None
+            if stored == h:
+                if move_value == 0:
+                    return None
+                i, j = divmod(square, board.N)
+                return value, Move(i, j, move_value)
+            slot = (slot + 1) & (self.slots - 1)
+
+    def close(self) -> None:
+        self.data.close()
+        self.file.close()
+
+
+_tablebases: Dict[str, Optional[Tablebase]] = {}
+
+
+def load_tablebase(filename=TABLEBASE_FILE) -> Optional[Tablebase]:
+    """
+    :return: type Tablebase. The table, or None if the file does not exist or is not a table of the current version,
+    e.g. one left from an older build; a warning is logged then. The file is opened on the first call and stays open
+    for the rest of the process, so the table must not be closed by the caller.
+    """
+    key = str(Path(filename).resolve())
+    if key not in _tablebases:
+        tablebase = None
+        if Path(filename).exists():
+            try:
+                tablebase = Tablebase(filename)
+            except (OSError, RuntimeError) as error:
+                logger.warning("not using the endgame tablebase: %s", error)
+        _tablebases[key] = tablebase
+    return _tablebases[key]
+
+
+def solve_game_state(game_state: GameState, limit: int, time_manager: TimeManager = None) \
+        -> Optional[Tuple[int, Move]]:
+    """
+    Solves the current position of a game exactly, for the late endgame.
+
+    :param game_state: type GameState.
+    :param limit: type int. The maximum number of solutions of the board, above this the position is not solved.
+    :param time_manager: type TimeManager. If given, SearchTimeout is raised when its hard limit passes.
+    :return: type tuple. (value, best move), or None if the board has too many solutions (or none).
+    """
+    board = game_state.board
+    solutions = enumerate_solutions(board, limit, time_manager)
+    if not solutions:
+        return None
+    value, square, move_value = EndgameSolver(board, solutions, time_manager).solve(
+        taboo_moves=relevant_taboo_moves(board, game_state.taboo_moves))
+    if move_value == 0:
+        return None
+    i, j = divmod(square, board.N)
+    return value, Move(i, j, move_value)
+
+
+def endgame_positions(filename: str, max_empty: int):
+    """
+    Reads the positions to solve from a file.
+
+    :param filename: type str. A board file, or a game record file written by simulate_game.py --record.
+    :param max_empty: type int. The maximum number of empty squares of a position.
+    :return: type generator. Yields (name, GameState) pairs; for a recorded game the first position with at most
+    max_empty empty squares.
+    """
+    with open(filename, 'rb') as f:
+        is_record = f.read(len(RECORD_MAGIC)) == RECORD_MAGIC
+    if not is_record:
+        board = load_sudoku(filename)
+        yield filename, GameState(board, board, [], [], [0, 0])
+        return
+    for game_number, game in enumerate(read_game_records(filename)):
+        for game_state, _ in game.game_states():
+            if game_state.board.squares.count(SudokuBoard.empty) <= max_empty:
+                yield f'{filename}.{game_number}#{len(game_state.moves)}', game_state
+                break
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Build the endgame tablebase of the team5 AI.')
+    subparsers = cmdline_parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='solve positions and write all positions that can be reached from them')
+    build.add_argument('files', nargs='+', help='start positions, or game record files')
+    build.add_argument('--output', default=str(TABLEBASE_FILE), help=f'the table file (default: {TABLEBASE_FILE.name})')
+    build.add_argument('--max-empty', type=int, default=12, help='skip positions with more empty squares (default: 12)')
+    build.add_argument('--max-solutions', type=int, default=1000, help='skip positions with more solutions (default: 1000)')
+    args = cmdline_parser.parse_args()
+
+    table = {}
+    for filename in args.files:
+        for name, game_state in endgame_positions(filename, args.max_empty):
+            board = game_state.board
+            empty = board.squares.count(SudokuBoard.empty)
+            if empty > args.max_empty:
+                print(f'{name}: skipped, {empty} empty squares')
+                continue
+            solutions = enumerate_solutions(board, args.max_solutions)
+            if not solutions:
+                print(f'{name}: skipped, {"no" if solutions is not None else "too many"} solutions')
+                continue
+            solver = EndgameSolver(board, solutions)
+            value, square, move_value = solver.solve(taboo_moves=relevant_taboo_moves(board, game_state.taboo_moves))
+            print(f'{name}: value {value}, best move {Move(*divmod(square, board.N), move_value)}, '
+                  f'{len(solver.table)} positions')
+            table.update(solver.table)
+    slots = write_tablebase(args.output, table)
+    print(f'Wrote {len(table)} positions in {slots} slots to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+An incrementally maintained index of the regions (rows, columns and blocks) that are almost complete.
+
+For every region the index keeps its empty squares and the bit mask of the values that are used in it. The regions
+with one or two empty squares are kept in the sets singles and doubles, so forced moves (the last square of a
+region) and the parity of nearly finished regions are found without scanning the board.
+
+For every region with one empty square c, whose missing value is v, the index also keeps the trap squares: the
+empty squares outside the region that share a row, column or block with c and where v may still be played. Playing
+v on a trap square leaves no value for c, so that move is declared taboo and acts as a pass, which is the plan of
+Endgame.py. The search offers such a pass at every node that has one, see MinimaxTree.smart_add_layer_here.
+
+A change of square k with value v can only change the trap squares of the regions of k, whether k itself is a trap
+square, and whether v is allowed on the peers of k. So put and clear reclassify the three regions of k and look at
+the peers of k; the trap squares of other regions are only touched where k or one of its peers enters or leaves them.
+Per square the index keeps the single regions it is a trap square of, and per value the single regions that miss it,
+so none of these updates has to search the singles.
+
+Squares and regions are numbered as in Geometry.py.
+"""
+
+from typing import Dict, List, Set, Tuple
+
+from competitive_sudoku.sudoku import Move, SudokuBoard
+from .Geometry import geometry
+
+
+class ThreatIndex(object):
+    """
+    The almost complete regions of a board. It is kept up to date by put and clear, which cost O(N) for the three
+    regions and the peers of the square, plus O(N) for each single region that misses the value. All queries are
+    lookups.
+    """
+
+    def __init__(self, board: SudokuBoard):
+        """
+        :param board: type SudokuBoard. The board is copied, so later changes must be made through put and clear.
+        """
+        self.m, self.n, self.N = board.m, board.n, board.N
+        tables = geometry(board.m, board.n)
+        self.region_squares, self.square_regions, self.peers = tables.region_squares, tables.square_regions, tables.peers
+        self.full = (1 << self.N) - 1
+        self.squares = board.squares.copy()
+        self.used = [0] * (3 * self.N)          # per region, bit v - 1 is set if value v is used
+        self.empty = [set() for _ in range(3 * self.N)]
+        self.singles = set()                    # regions with one empty square
+        self.doubles = set()                    # regions with two empty squares
+        self.forced: Dict[int, Tuple[int, int]] = {}    # per single region, its empty square and missing value
+        self.missing_in = [set() for _ in range(self.N + 1)]  # per value, the single regions that miss it
+        self.traps: Dict[int, Set[int]] = {}    # per single region, the trap squares of its missing value
+        self.trapped = [set() for _ in range(self.N * self.N)]  # per square, the single regions it is a trap for
+        for k, value in enumerate(self.squares):
+            for region in self.square_regions[k]:
+                if value == SudokuBoard.empty:
+                    self.empty[region].add(k)
+                else:
+                    self.used[region] |= 1 << (value - 1)
+        for region in range(3 * self.N):
+            self.classify(region)
+
+    def classify(self, region: int) -> None:
+        """
+        Puts a region in singles or doubles by its number of empty squares, and finds the trap squares of a single.
+        """
+        if region in self.singles:
+            self.singles.discard(region)
+            _, value = self.forced.pop(region)
+            self.missing_in[value].discard(region)
+            for k in self.traps.pop(region):
+                self.trapped[k].discard(region)
+        self.doubles.discard(region)
+        count = len(self.empty[region])
+        if count == 1:
+            square = next(iter(self.empty[region]))
+            value = self.missing_values(region)[0]
+            self.singles.add(region)
+            self.forced[region] = (square, value)
+            self.missing_in[value].add(region)
+            self.traps[region] = set()
+            for k in self.peers[square]:
+                if self.is_trap(region, k):
+                    self.add_trap(region, k)
+        elif count == 2:
+            self.doubles.add(region)
+
+    def allowed(self, k: int, value: int) -> bool:
+        """
+        :return: type bool. True if value is not used in the row, column or block of square k.
+        """
+        a, b, c = self.square_regions[k]
+        return not (self.used[a] | self.used[b] | self.used[c]) >> (value - 1) & 1
+
+    def is_trap(self, region: int, k: int) -> bool:
+        """
+        :return: type bool. True if square k is a trap square of the single region.
+        """
+        square, value = self.forced[region]
+        return (self.squares[k] == SudokuBoard.empty and k in self.peers[square] and
+                region not in self.square_regions[k] and self.allowed(k, value))
+
+    def add_trap(self, region: int, k: int) -> None:
+        self.traps[region].add(k)
+        self.trapped[k].add(region)
+
+    def remove_trap(self, region: int, k: int) -> None:
+        self.traps[region].discard(k)
+        self.trapped[k].discard(region)
+
+    def put(self, i: int, j: int, value: int) -> None:
+        """
+        Fills an empty square.
+        """
+        k = i * self.N + j
+        self.squares[k] = value
+        regions = self.square_regions[k]
+        for region in regions:
+            self.empty[region].discard(k)
+            self.used[region] |= 1 << (value - 1)
+        for region in regions:
+            self.classify(region)
+        # k is filled, and the value can not be played on its peers anymore
+        for region in list(self.trapped[k]):
+            self.remove_trap(region, k)
+        for peer in self.peers[k]:
+            for region in [region for region in self.trapped[peer] if self.forced[region][1] == value]:
+                self.remove_trap(region, peer)
+
+    def clear(self, i: int, j: int) -> None:
+        """
+        Empties a filled square, e.g. to undo a put.
+        """
+        k = i * self.N + j
+        value = self.squares[k]
+        self.squares[k] = SudokuBoard.empty
+        regions = self.square_regions[k]
+        for region in regions:
+            self.empty[region].add(k)
+            self.used[region] &= ~(1 << (value - 1))
+        for region in regions:
+            self.classify(region)
+        # k may be a trap square of the singles whose empty square is a peer of k
+        for peer in self.peers[k]:
+            if self.squares[peer] == SudokuBoard.empty:
+                for region in self.square_regions[peer]:
+                    if region in self.singles and self.is_trap(region, k):
+                        self.add_trap(region, k)
+        # the value may be allowed again on the peers of k, which may make them trap squares of singles that miss it
+        for region in self.missing_in[value]:
+            for peer in self.peers[k]:
+                if self.is_trap(region, peer):
+                    self.add_trap(region, peer)
+
+    def missing_mask(self, region: int) -> int:
+        """
+        :return: type int. The bit mask of the values that are not used in the region.
+        """
+        return self.full & ~self.used[region]
+
+    def missing_values(self, region: int) -> List[int]:
+        mask = self.missing_mask(region)
+        return [value for value in range(1, self.N + 1) if mask >> (value - 1) & 1]
+
+    def empty_squares(self, region: int) -> set:
+        return self.empty[region]
+
+    def empty_counts(self) -> List[int]:
+        """
+        :return: type list. The number of empty squares of every region, as MoveGenerator.region_empty_counts.
+        """
+        return [len(squares) for squares in self.empty]
+
+    def forced_moves(self) -> List[Move]:
+        """
+        :return: type list. The last move of every region with one empty square. The value may not be allowed by the
+        other regions of the square, in which case the board can not be completed anymore.
+        """
+        return [Move(square // self.N, square % self.N, value) for square, value in self.forced.values()]
+
+    def trap_moves(self) -> List[Move]:
+        """
+        :return: type list. The moves that take away the last value of a region with one empty square, so they are
+        declared taboo when played, in reading order. A square that is the last one of two regions gives the same
+        moves twice, they are only listed once.
+        """
+        moves = set()
+        for region, squares in self.traps.items():
+            value = self.forced[region][1]
+            moves.update((k, value) for k in squares)
+        return [Move(k // self.N, k % self.N, value) for k, value in sorted(moves)]
@@ -0,0 +1,93 @@
+import os
+import time
+
+# Environment variable that holds the time (in seconds) available for computing a move. It is set by simulate_game.
+MOVE_TIME_VARIABLE = 'SUDOKU_MOVE_TIME'
+# The default --time of simulate_game, used when no budget is known
+DEFAULT_MOVE_TIME = 0.5
+
+
+class SearchTimeout(Exception):
+    """
+    Raised from inside the search when the hard time limit has passed. The layer that was being built is incomplete
+    and its result should not be used.
+    """
+    pass
+
+
+class TimeManager():
+    """
+    Decides whether there is time for another iteration (layer) of the search.
+    The cost of the next iteration is predicted from the timing of the previous iteration and the number of leaves
+    that will be expanded, which is the previous number of leaves times the branching factor.
+    A new iteration is only started before the soft limit, and only when it is predicted to finish before the hard
+    limit. The first iteration is always started. The hard limit is also checked during the search, see check().
+    """
+
+    def __init__(self, budget: float = None, soft_limit: float = 0.5, hard_limit: float = 0.85, margin: float = 0.05):
+        """
+        :param budget: type float. Time in seconds for computing a move. If None, it is read from the SUDOKU_MOVE_TIME
+        environment variable, falling back to DEFAULT_MOVE_TIME.
+        :param soft_limit: type float. Fraction of the budget after which no new iteration is started.
+        :param hard_limit: type float. Fraction of the budget after which a running iteration is aborted.
+        :param margin: type float. Time in seconds kept free before the hard limit, for proposing the move.
+        """
+        if budget is None:
+            budget = float(os.environ.get(MOVE_TIME_VARIABLE, DEFAULT_MOVE_TIME))
+        self.budget = budget
+        self.start = time.perf_counter()
+        self.soft_deadline = self.start + budget * soft_limit
+        self.hard_deadline = self.start + max(budget * hard_limit - margin, 0)
+        self.timings = []             # (duration, leaves expanded) of the completed iterations
+        self.iteration_start = None
+        self.iteration_leaves = 0
+
+    def elapsed(self) -> float:
+        """
+        :return: type float. Seconds since the time manager was created.
+        """
+        return time.perf_counter() - self.start
+
+    def predict_next(self, leaves: int) -> float:
+        """
+        Predicts the duration of the next iteration, which expands the given number of leaves.
+        The cost per leaf is taken from the previous iteration, so the growth of the tree (the branching factor
+        after pruning) is accounted for by the number of leaves.
+
+        :param leaves: type int. The number of leaves the next iteration will expand.
+        :return: type float. The predicted duration in seconds.
+        """
+        if not self.timings:
+            return 0.0
+        duration, previous_leaves = self.timings[-1]
+        return duration / max(previous_leaves, 1) * leaves
+
+    def start_iteration(self, leaves: int) -> bool:
+        """
+        Checks if a new iteration can be started and, if so, starts timing it.
+
+        :param leaves: type int. The number of leaves the next iteration will expand.
+        :return: type bool. True if the iteration should be started.
+        """
+        now = time.perf_counter()
+        # the first iteration is always started, otherwise there would be no move to propose at all
+        if self.timings and (now >= self.soft_deadline or now + self.predict_next(leaves) > self.hard_deadline):
+            return False
+        self.iteration_start = now
+        self.iteration_leaves = leaves
+        return True
+
+    def end_iteration(self) -> None:
+        """
+        Records the duration of the iteration that was started last.
+        """
+        self.timings.append((time.perf_counter() - self.iteration_start, self.iteration_leaves))
+        self.iteration_start = None
+
+    def check(self) -> None:
+        """
+        Raises SearchTimeout if the hard limit has passed. Called from inside the search.
+        The first iteration is never aborted, since it is the only source of a move.
+        """
+        if self.timings and time.perf_counter() > self.hard_deadline:
+            raise SearchTimeout()
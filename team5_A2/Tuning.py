@@ -0,0 +1,164 @@
+"""
+Automatic tuning of the weights in Weights.py with SPSA (simultaneous perturbation stochastic approximation).
+
+Every iteration perturbs all weights at once in a random direction and plays a mini-match between the weights plus
+and the weights minus the perturbation, on the start positions with both players moving first. The result of the
+match estimates the slope of the playing strength in that direction, and the weights take a step up the slope. The
+steps get smaller over the iterations, so the weights settle down.
+
+The games of an iteration are played in parallel in a process pool. A game is played within one process by two
+SudokuAI objects that switch the weights before each move (see Weights.set_weights), and the moves are judged
+in-process by competitive_sudoku.oracle.LocalOracle, so no solve_sudoku program is needed.
+
+Run from the root folder of the archive:
+
+  python -m team5_A2.Tuning --board boards/random-3x3.txt --iterations 100 --games 8 --time 0.2
+  python -m team5_A2.Tuning --board corpus.sdkc --output team5_A2/weights.json
+
+The weights are written to the output file after every iteration, so a run can be stopped at any time. The AI
+reads the file when it starts, see Weights.py.
+"""
+
+import argparse
+import copy
+import multiprocessing
+import random
+from typing import List, Tuple
+
+from competitive_sudoku.matchserver import load_boards
+from competitive_sudoku.oracle import ILLEGAL, INVALID, LocalOracle, TABOO
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, TabooMove
+from .Weights import PARAMETERS, WEIGHTS_FILE, Weights, load_weights, save_weights, set_weights
+from .sudokuai import SudokuAI
+
+# The size of a perturbation of each weight, the weights are tuned in these units
+SCALES = {
+    'position': 0.5,
+    'points': 0.25,
+    'taboo_threshold': 0.05,
+    'parity_even': 0.25,
+    'parity_odd': 0.25,
+    'duplicate_tolerance': 2.0,
+}
+# The range of each weight
+BOUNDS = {
+    'position': (0.0, 10.0),
+    'points': (0.0, 5.0),
+    'taboo_threshold': (0.05, 1.0),
+    'parity_even': (0.0, 5.0),
+    'parity_odd': (0.0, 5.0),
+    'duplicate_tolerance': (0.0, 50.0),
+}
+
+
+def play_game(task: Tuple[SudokuBoard, Weights, Weights, float]) -> int:
+    """
+    Plays a game between two sets of weights.
+
+    :param task: type tuple. The initial board, the weights of the first and of the second player, and the time in
+    seconds for computing a move.
+    :return: type int. The winner (1 or 2), or 0 for a draw.
+    """
+    initial_board, first, second, move_time = task
+    player = SudokuAI(move_time)
+    oracle = LocalOracle()
+    game_state = GameState(initial_board, copy.deepcopy(initial_board), [], [], [0, 0])
+    while SudokuBoard.empty in game_state.board.squares:
+        player_number = 1 if len(game_state.moves) % 2 == 0 else 2
+        set_weights(first if player_number == 1 else second)
+        player.best_move = [0, 0, 0]
+        player.compute_best_move(copy.deepcopy(game_state))
+        move = Move(*player.best_move)
+        if move == Move(0, 0, 0) or TabooMove(move.i, move.j, move.value) in game_state.taboo_moves:
+            return 3 - player_number
+        verdict = oracle.check_move(game_state.board, move)
+        if verdict.status in (INVALID, ILLEGAL):
+            return 3 - player_number
+        if verdict.status == TABOO:
+            game_state.moves.append(TabooMove(move.i, move.j, move.value))
+            game_state.taboo_moves.append(TabooMove(move.i, move.j, move.value))
+        else:
+            game_state.board.put(move.i, move.j, move.value)
+            game_state.moves.append(move)
+        game_state.scores[player_number - 1] += verdict.score
+    scores = game_state.scores
+    return 1 if scores[0] > scores[1] else 2 if scores[0] < scores[1] else 0
+
+
+def clip(vector: List[float]) -> List[float]:
+    """
+    :return: type list. The weights in vector, limited to their BOUNDS.
+    """
+    return [min(max(value, BOUNDS[name][0]), BOUNDS[name][1]) for name, value in zip(PARAMETERS, vector)]
+
+
+def spsa(boards: List[SudokuBoard], start: Weights, iterations: int, games: int, move_time: float, output: str,
+         processes: int = None, seed: int = 0, a: float = 1.0, c: float = 1.0) -> Weights:
+    """
+    Tunes the weights with SPSA.
+
+    :param boards: type list. The start positions, they are used in turn.
+    :param start: type Weights. The initial weights.
+    :param iterations: type int. The number of iterations.
+    :param games: type int. The number of games per iteration, it is rounded up to an even number.
+    :param move_time: type float. The time in seconds for computing a move.
+    :param output: type str. The weights are written to this file after every iteration.
+    :param processes: type int. The size of the process pool, by default the number of processors.
+    :param seed: type int. The seed of the perturbations.
+    :param a: type float. The step size at the start, in units of SCALES per game won on balance.
+    :param c: type float. The size of the perturbation at the start, in units of SCALES.
+    :return: type Weights. The tuned weights.
+    """
+    rng = random.Random(seed)
+    scales = [SCALES[name] for name in PARAMETERS]
+    theta = start.as_vector()
+    stability = 0.1 * iterations  # delays the decrease of the step size, as recommended for SPSA
+    board_index = 0
+    with multiprocessing.Pool(processes) as pool:
+        for k in range(iterations):
+            a_k = a / (k + 1 + stability) ** 0.602
+            c_k = c / (k + 1) ** 0.101
+            delta = [rng.choice((-1, 1)) for _ in PARAMETERS]
+            plus = Weights.from_vector(clip([t + c_k * d * s for t, d, s in zip(theta, delta, scales)]))
+            minus = Weights.from_vector(clip([t - c_k * d * s for t, d, s in zip(theta, delta, scales)]))
+
+            tasks = []
+            for _ in range((games + 1) // 2):
+                board = boards[board_index % len(boards)]
+                board_index += 1
+                tasks.append((board, plus, minus, move_time))
+                tasks.append((board, minus, plus, move_time))
+            balance = 0  # games won by plus minus games won by minus
+            for task, winner in zip(tasks, pool.map(play_game, tasks)):
+                if winner != 0:
+                    balance += 1 if (task[1] is plus) == (winner == 1) else -1
+            result = balance / len(tasks)
+
+            theta = clip([t + a_k * result / (2 * c_k * d) * s for t, d, s in zip(theta, delta, scales)])
+            weights = Weights.from_vector(theta)
+            save_weights(weights, output)
+            print(f'iteration {k + 1}: plus - minus {balance:+d} of {len(tasks)} games, {weights}')
+    return Weights.from_vector(theta)
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Tunes the weights of score_move with SPSA self-play.')
+    cmdline_parser.add_argument('--board', metavar='FILE', type=str, help='a text file containing the start position, or a board corpus file whose positions are used in turn (default: an empty 3x3 board)')
+    cmdline_parser.add_argument('--iterations', help="the number of iterations (default: 50)", type=int, default=50)
+    cmdline_parser.add_argument('--games', help="the number of games per iteration (default: 8)", type=int, default=8)
+    cmdline_parser.add_argument('--time', help="the time (in seconds) for computing a move (default: 0.2)", type=float, default=0.2)
+    cmdline_parser.add_argument('--processes', help="the number of games that are played at the same time (default: the number of processors)", type=int)
+    cmdline_parser.add_argument('--seed', help="the seed of the perturbations (default: 0)", type=int, default=0)
+    cmdline_parser.add_argument('--start', metavar='FILE', type=str, help='the initial weights (default: the weights that the AI loads)')
+    cmdline_parser.add_argument('--output', metavar='FILE', type=str, default=str(WEIGHTS_FILE), help=f'the file for the tuned weights (default: {WEIGHTS_FILE})')
+    args = cmdline_parser.parse_args()
+
+    boards = load_boards(args.board)
+    start = load_weights(args.start)
+    print(f'start: {start}')
+    weights = spsa(boards, start, args.iterations, args.games, args.time, args.output, args.processes, args.seed)
+    print(f'tuned: {weights}')
+
+
+if __name__ == '__main__':
+    main()
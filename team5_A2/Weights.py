@@ -0,0 +1,105 @@
+"""
+The weights of the move evaluation (score_move) and of the duplicate detection in MinimaxTree.
+
+The weights are read once, when the module is imported: from the JSON file named by the TEAM5_WEIGHTS environment
+variable, or else from weights.json next to this module if it exists. Weights that are not in the file keep their
+default value. The defaults are the hand-picked values of the A1 report, with them the search is exactly the same
+as before the weights were made configurable. The file is written by Tuning.py.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import List
+
+from .EvalCache import evaluation_cache
+
+# Environment variable with the location of the weights file
+WEIGHTS_VARIABLE = 'TEAM5_WEIGHTS'
+WEIGHTS_FILE = Path(__file__).resolve().parent / 'weights.json'
+
+# The weights in the order of the parameter vector of Tuning.py
+PARAMETERS = (
+    'position',             # factor of the position heuristic in formula 2 of the report
+    'points',               # factor of the points of the move in formula 2
+    'taboo_threshold',      # a move is expected to be taboo above this taboo probability
+    'parity_even',          # factor of the reward for leaving an even number of empty squares in a region
+    'parity_odd',           # factor of the penalty for leaving an odd number of empty squares in a region
+    'duplicate_tolerance',  # a duplicate board is searched again if its score is at most this much lower
+)
+DEFAULTS = {
+    'position': 2.0,
+    'points': 1.0,
+    'taboo_threshold': 0.8,
+    'parity_even': 1.0,
+    'parity_odd': 1.0,
+    'duplicate_tolerance': 10.0,
+}
+
+
+class Weights(object):
+    """
+    A set of weights, one attribute per name in PARAMETERS.
+    """
+
+    __slots__ = PARAMETERS
+
+    def __init__(self, **values: float):
+        """
+        :param values: type float. The weights by name, the others get their default value.
+        """
+        unknown = set(values) - set(PARAMETERS)
+        if unknown:
+            raise ValueError(f'Unknown weights {sorted(unknown)}, use the names in {PARAMETERS}')
+        for name in PARAMETERS:
+            setattr(self, name, float(values.get(name, DEFAULTS[name])))
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in PARAMETERS}
+
+    def as_vector(self) -> List[float]:
+        """
+        :return: type list. The weights in the order of PARAMETERS.
+        """
+        return [getattr(self, name) for name in PARAMETERS]
+
+    @staticmethod
+    def from_vector(vector: List[float]) -> 'Weights':
+        return Weights(**dict(zip(PARAMETERS, vector)))
+
+    def __str__(self):
+        return ', '.join(f'{name}={value:.4g}' for name, value in self.as_dict().items())
+
+
+def load_weights(filename: str = None) -> Weights:
+    """
+    :param filename: type str. A JSON file with an object of weights. If None, the file of TEAM5_WEIGHTS or
+    weights.json is used, and the defaults if there is no such file.
+    :return: type Weights.
+    """
+    if filename is None:
+        filename = os.environ.get(WEIGHTS_VARIABLE) or WEIGHTS_FILE
+        if not Path(filename).exists():
+            return Weights()
+    with open(filename) as f:
+        return Weights(**json.load(f))
+
+
+def save_weights(weights: Weights, filename: str = WEIGHTS_FILE) -> None:
+    with open(filename, 'w') as f:
+        json.dump(weights.as_dict(), f, indent=2)
+        f.write('\n')
+
+
+def set_weights(new_weights: Weights) -> None:
+    """
+    Changes the weights of this process, e.g. for the games of Tuning.py. The cached move evaluations depend on the
+    weights, so the evaluation cache is cleared.
+    """
+    for name in PARAMETERS:
+        setattr(weights, name, getattr(new_weights, name))
+    evaluation_cache.clear()
+
+
+# The weights of the AI. set_weights changes this object, so modules can import it once.
+weights = load_weights()
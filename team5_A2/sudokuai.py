@@ -2,12 +2,162 @@
 #  Software License, (See accompanying file LICENSE or copy at
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
-from competitive_sudoku.sudoku import GameState, Move, SudokuBoard
+from competitive_sudoku.sudoku import GameState, SudokuBoard
 import competitive_sudoku.sudokuai
-from .MinimaxTree import MinimaxTree
-from .Helper_Functions import moves_left, find_actual_moves
+from .MinimaxTree import DEFAULT_NODE_BUDGET, MinimaxTree
+from .EvalCache import evaluation_cache
+from .Helper_Functions import moves_left, find_actual_moves, find_legal_moves
+from .SearchStats import stats_from_environment
+from .Tablebase import load_tablebase, solve_game_state
+from .TimeManager import SearchTimeout, TimeManager
+from collections import Counter
 import copy
-#import time
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# With at most this many empty squares the position is solved exactly, which takes a fraction of a second
+EXACT_ENDGAME_SQUARES = 10
+# Positions whose board has more solutions are not solved exactly
+EXACT_ENDGAME_SOLUTIONS = 1000
+# Environment variable that selects how the tree is grown: 'layers' (iterative deepening, the default)
+# or 'best-first' (best-first minimax, see MinimaxTree.best_first_expand)
+SEARCH_MODE_VARIABLE = 'TEAM5_SEARCH_MODE'
+SEARCH_MODES = ('layers', 'best-first')
+
+
+def new_search_tree(game_state: GameState, node_budget: int = DEFAULT_NODE_BUDGET) -> MinimaxTree:
+    """
+    Creates the root of a MinimaxTree for game_state, with the moves found by find_actual_moves.
+
+    :param game_state: type GameState. The current game state, it is not changed.
+    :param node_budget: type int. The maximum number of nodes in the tree, None for no limit.
+    :return: type MinimaxTree. The root.
+    """
+    stats = MinimaxTree.stats
+
+    # Create a copy of the game_state instance, this is input for the MinimaxTree
+    board_copy = SudokuBoard(game_state.board.m, game_state.board.n)
+    board_copy.squares = game_state.board.squares.copy()
+    game_copy = GameState(game_state.initial_board, board_copy,
+                          game_state.taboo_moves.copy(), game_state.moves.copy(),
+                          game_state.scores.copy())
+
+    # Check whether we are the first or the second player, also input for the Minimaxtree
+    if len(game_copy.moves) % 2 == 0:
+        player_nr = 1
+    else:
+        player_nr = 2
+
+    if stats is not None:
+        start = time.perf_counter()
+    moves = find_actual_moves(copy.deepcopy(board_copy), game_copy)
+    if stats is not None:
+        stats.find_moves_time += time.perf_counter() - start
+    return MinimaxTree.new_root(game_copy, player_nr, moves, node_budget)
+
+
+def fallback_move(game_state: GameState):
+    """
+    Finds a legal move without searching, to have a move in place before the search starts.
+
+    :param game_state: type GameState. The current game state.
+    :return: type Move. A value that is the only candidate of its square if there is one, since it can not be
+    declared taboo, otherwise the first legal move. None if there are no legal moves.
+    """
+    legal_moves = find_legal_moves(game_state)
+    candidates = Counter((move.i, move.j) for move in legal_moves)
+    for move in legal_moves:
+        if candidates[(move.i, move.j)] == 1:
+            return move
+    return legal_moves[0] if legal_moves else None
+
+
+def iterative_deepening(game_state: GameState, max_depth: int, time_manager: TimeManager = None,
+                        node_budget: int = DEFAULT_NODE_BUDGET):
+    """
+    Builds a MinimaxTree for game_state one layer at a time, as described in the report.
+
+    :param game_state: type GameState. The current game state, it is not changed.
+    :param max_depth: type int. The maximum number of layers.
+    :param time_manager: type TimeManager. Decides when to stop. If None, max_depth layers are built.
+    :param node_budget: type int. The maximum number of nodes in the tree, None for no limit.
+    :return: type generator. Yields (depth, best_move, best_score, root) after each completed layer.
+    """
+    stats = MinimaxTree.stats
+    root = new_search_tree(game_state, node_budget)
+    moves_ahead = 0
+    best_score = None
+    while moves_ahead < max_depth:
+        # prune first, with the previous best score as the centre of the aspiration window,
+        # so the time manager knows how many leaves the next layer has to expand
+        if best_score is not None:
+            if stats is not None:
+                start = time.perf_counter()
+            root.aspiration_search(best_score)
+            if stats is not None:
+                stats.tree_update_time += time.perf_counter() - start
+        # stop when every move of the root has been pruned or found to be a duplicate, there is nothing to deepen
+        if root.pool.child_count[0] and root.best_child()[0] is None:
+            return
+        # keep only the most promising leaves if the next layer would not fit in the node budget
+        if not root.enforce_budget():
+            return
+        # stop when the next layer is not expected to finish in time
+        if time_manager is not None and not time_manager.start_iteration(root.count_active_leaves()):
+            return
+        moves_ahead += 1
+        # repeatedly look further into the future and get the best move found
+        try:
+            root.smart_add_layer({}, time_manager=time_manager, prune=best_score is None)
+        except SearchTimeout:
+            # the layer is only partly built, so only moves from completed layers are used
+            return
+        # root.add_layer()
+        best_move, best_score = root.get_best_move()
+        if best_move is None:
+            # the layer left no active move at the root, so it has no result
+            return
+        if time_manager is not None:
+            time_manager.end_iteration()
+        if stats is not None:
+            stats.depth = moves_ahead
+        yield moves_ahead, best_move, best_score, root
+
+
+def best_first_search(game_state: GameState, max_expansions: int, time_manager: TimeManager = None,
+                      node_budget: int = DEFAULT_NODE_BUDGET):
+    """
+    Grows a MinimaxTree for game_state one leaf at a time with best-first minimax: every expansion is of the
+    leaf at the end of the principal variation, and its new score is backed up along its path only.
+
+    :param game_state: type GameState. The current game state, it is not changed.
+    :param max_expansions: type int. The maximum number of leaves to expand.
+    :param time_manager: type TimeManager. Decides when to stop, every expansion counts as an iteration.
+    If None, max_expansions leaves are expanded.
+    :param node_budget: type int. The maximum number of nodes in the tree, None for no limit.
+    :return: type generator. Yields (expansions, best_move, best_score, root) after each expansion.
+    """
+    root = new_search_tree(game_state, node_budget)
+    # every expansion adds at most one child per move
+    children_per_leaf = len(root.moves)
+    board_states = {}
+    expansions = 0
+    while expansions < max_expansions:
+        if node_budget is not None and len(root.pool) + children_per_leaf > node_budget:
+            return
+        if time_manager is not None and not time_manager.start_iteration(1):
+            return
+        if not root.best_first_expand(board_states):
+            return
+        if time_manager is not None:
+            time_manager.end_iteration()
+        expansions += 1
+        best_move, best_score = root.best_child()
+        yield expansions, best_move, best_score, root
+
 
 class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
     """
@@ -15,49 +165,86 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
     Uses a basic minimax tree.
     """
 
-    def __init__(self):
+    def __init__(self, move_time: float = None, search_mode: str = None):
+        """
+        :param move_time: type float. Time in seconds for computing a move. If None, the SUDOKU_MOVE_TIME environment
+        variable is used (see TimeManager).
+        :param search_mode: type str. One of SEARCH_MODES. If None, the TEAM5_SEARCH_MODE environment variable is
+        used, falling back to 'layers'.
+        """
         super().__init__()
+        self.move_time = move_time
+        if search_mode is None:
+            search_mode = os.environ.get(SEARCH_MODE_VARIABLE, 'layers')
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f'Unknown search mode {search_mode!r}, use one of {SEARCH_MODES}')
+        self.search_mode = search_mode
 
     def compute_best_move(self, game_state: GameState) -> None:
-        
-        # Create a copy of the game_state instance, this is input for the MinimaxTree
-        board_copy = SudokuBoard(game_state.board.m, game_state.board.n)
-        board_copy.squares = game_state.board.squares.copy()
-        game_copy = GameState(game_state.initial_board, board_copy,
-                              game_state.taboo_moves.copy(), game_state.moves.copy(),
-                              game_state.scores.copy())
-        
-        # Check whether we are the first or the second player, also input for the Minimaxtree
-        if len(game_copy.moves) % 2 == 0:
-            player_nr = 1
+        if self.search_mode == 'best-first':
+            # an expansion is short, so there is no need to stop early like between layers
+            time_manager = TimeManager(self.move_time, soft_limit=0.85)
         else:
-            player_nr = 2
+            time_manager = TimeManager(self.move_time)
+        # statistics are only collected when TEAM5_SEARCH_STATS is set
+        stats = stats_from_environment()
+        MinimaxTree.stats = stats
 
+        # propose a legal move right away: finding the moves of the root and building the first layer can take longer
+        # than the time for the move, and without a proposal the game is lost
+        fallback = fallback_move(game_state)
+        if fallback is not None:
+            self.propose_move(fallback)
 
+        moves_tbd = moves_left(game_state.board)
 
-        moves_tbd = moves_left(board_copy)
+        # play perfectly in positions that are in the endgame tablebase
+        tablebase = load_tablebase()
+        if tablebase is not None:
+            hit = tablebase.probe(game_state.board, game_state.taboo_moves)
+            if hit is not None:
+                logger.debug("tablebase: %s with value %d", hit[1], hit[0])
+                self.propose_move(hit[1])
+                return
 
         # if few moves are left, play using endgame mode rather than normal tactics:
         # try to play a taboo move on purpose to get the final move
-        if moves_tbd <= 2*board_copy.N + 1 - board_copy.N**0.5 and moves_tbd >= 3:
-            print(f"this might be the last choice, {moves_tbd} moves left")
+        N = game_state.board.N
+        if moves_tbd <= 2*N + 1 - N**0.5 and moves_tbd >= 3:
+            logger.debug("this might be the last choice, %d moves left", moves_tbd)
             if moves_tbd % 2 == 0:
-                print("and we should taboo")
+                logger.debug("and we should taboo")
 
         # Use the Minimaxtree to get the best move, as described in the report
-        moves = find_actual_moves(copy.deepcopy(board_copy), game_copy)
-        root = MinimaxTree(game_copy, Move(0, 0, 0), 0, player_nr, moves)
-        moves_ahead = 0
-        while moves_ahead < moves_tbd:
-            moves_ahead += 1
-            # repeatedly look further into the future and get the best move found
-            #start = time.time()
-            root.smart_add_layer({})
-            # root.add_layer()
-            best_move, best_score = root.get_best_move()
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if self.search_mode == 'best-first':
+            self.best_first_move(game_state, time_manager, debug)
+            if stats is not None:
+                stats.emit(move=len(game_state.moves), player=game_state.current_player(),
+                           eval_cache=evaluation_cache.counters())
+            return
+        for moves_ahead, best_move, best_score, root in iterative_deepening(game_state, moves_tbd, time_manager):
+            if best_move is None:
+                break
             self.propose_move(best_move)
-            root.print_move_scores()
-            print(f"layer {moves_ahead} added, {best_move}, {best_score}")
+            if debug:
+                root.print_move_scores()
+                logger.debug("layer %d added, %s, %s", moves_ahead, best_move, best_score)
+            # with a move from the tree in place, solve small endgames exactly
+            if moves_tbd <= EXACT_ENDGAME_SQUARES:
+                try:
+                    solved = solve_game_state(game_state, EXACT_ENDGAME_SOLUTIONS, time_manager)
+                except SearchTimeout:
+                    # the move of the tree stays proposed
+                    break
+                if solved is not None:
+                    logger.debug("exact endgame: %s with value %d", solved[1], solved[0])
+                    self.propose_move(solved[1])
+                    break
+
+        if stats is not None:
+            stats.emit(move=len(game_state.moves), player=game_state.current_player(),
+                       eval_cache=evaluation_cache.counters())
 
         #endgame mode: when <x moves left, try to make it so an odd number of moves left in duration of game, if even try to make taboo move
         #last moment with options: when there is still a spot where there are two openings in row, column and block for some row, column and block
@@ -65,4 +252,20 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
         #maximum open: N + 1 per block not on the diagonal + 1
         # minimum blocks on diagonalL sqrt(n*m)
         # max blocks not on it: n*m-sqrt(n*m)
-        #total: sqrt(N) + n*m-sqrt(n*m) + 1
\ No newline at end of file
+        #total: sqrt(N) + n*m-sqrt(n*m) + 1
+
+    def best_first_move(self, game_state: GameState, time_manager: TimeManager, debug: bool) -> None:
+        """
+        Proposes moves from a best-first search until the time is up, see best_first_search.
+        A move is only proposed again when it changes, since proposing it goes through the game's lock.
+        """
+        proposed = None
+        root = None
+        for expansions, best_move, best_score, root in best_first_search(game_state, 10 ** 9, time_manager):
+            if best_move is not None and (proposed is None or best_move != proposed):
+                self.propose_move(best_move)
+                proposed = best_move
+                if debug:
+                    logger.debug("after %d expansions: %s, %s", expansions, best_move, best_score)
+        if debug and root is not None:
+            root.print_move_scores()